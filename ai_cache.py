@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY
+
+
+class AICache:
+    """
+    Disk-backed cache for AI answers, keyed by normalized (kind, artist, title,
+    prompt version, model). Entries are evicted least-recently-used once the
+    cache holds more than max_entries, and expire after ttl seconds if set.
+    """
+
+    def __init__(self, path, max_entries=50000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            # Kept up to date on insert and delete, so a write does not count
+            # the whole table; recounted before evicting, as other processes
+            # may share the file
+            (self.count,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+
+    @staticmethod
+    def make_key(kind, artist, title, prompt_version, model):
+        parts = [
+            kind,
+            " ".join(str(artist).lower().split()),
+            " ".join(str(title).lower().split()),
+            str(prompt_version),
+            model,
+        ]
+        return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached value or None.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                with self.conn:
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.count -= 1
+                row = None
+            if row is None:
+                self.misses += 1
+                REGISTRY.inc("ai_cache", result="miss")
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            REGISTRY.inc("ai_cache", result="hit")
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock, self.conn:
+            exists = self.conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if not exists:
+                self.count += 1
+            if self.count > self.max_entries:
+                (self.count,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if self.count > self.max_entries:
+                deleted = self.conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                    (self.count - self.max_entries,),
+                ).rowcount
+                self.count -= deleted
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.count = 0
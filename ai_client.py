@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute.
+    A limit of 0 disables it. Only used from the AI client's event loop.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount=1):
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)
+        rate = self.capacity / 60.0
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / rate)
+
+
+class AIClient:
+    """
+    Async OpenAI layer shared by AIOptimizer and AIAssistant.
+    Requests run on a background event loop with a concurrency cap, request and
+    token rate limits, and jittered exponential backoff on 429/5xx and
+    connection errors. Blocking callers use complete(); callers that want to
+    keep working meanwhile use submit() and collect the future later.
+    """
+
+    def __init__(self, api_key, base_url=None, max_concurrency=4, rpm=0, tpm=0,
+                 max_retries=5, backoff_base=1.0, backoff_cap=30.0):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        # The openai SDK is slow to import, so the client is built on first request
+        self.client = None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.calls = 0
+        self.retries = 0
+        self.loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self.loop is None:
+                from openai import AsyncOpenAI
+
+                # Retries are ours, so the SDK's own retry loop is turned off
+                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+                self.loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                thread = threading.Thread(target=self.loop.run_forever, name="ai-client", daemon=True)
+                thread.start()
+            return self.loop
+
+    @staticmethod
+    def _estimate_tokens(kwargs):
+        text = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+        return text // 4 + kwargs.get("max_tokens", 0)
+
+    def _retry_delay(self, attempt, error):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after is not None:
+                return float(retry_after)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retryable(error):
+        import openai
+
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    async def acomplete(self, **kwargs):
+        """
+        chat.completions.create with rate limiting and retries.
+        Must run on the client's loop (see submit()).
+        """
+        attempt = 0
+        while True:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(self._estimate_tokens(kwargs))
+            async with self._semaphore:
+                self.calls += 1
+                REGISTRY.inc("ai_calls")
+                try:
+                    return await self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    if not self._retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt, e)
+                    reason = str(e)
+            attempt += 1
+            self.retries += 1
+            REGISTRY.inc("ai_retries")
+            logger.warning(f"AI request failed ({reason}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def submit(self, **kwargs):
+        """
+        Schedules a completion and returns a concurrent.futures.Future.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.acomplete(**kwargs), loop)
+
+    def complete(self, **kwargs):
+        """
+        Blocking completion, safe to call from any thread.
+        """
+        return self.submit(**kwargs).result()
+
+    def stats(self):
+        return {"calls": self.calls, "retries": self.retries}
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_ai_client():
+    """
+    Returns the process-wide AIClient built from Config, or None without an API key.
+    """
+    global _shared_client
+    if not Config.OPENAI_API_KEY:
+        return None
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = AIClient(
+                Config.OPENAI_API_KEY,
+                base_url=Config.OPENAI_BASE_URL,
+                max_concurrency=Config.OPENAI_MAX_CONCURRENCY,
+                rpm=Config.OPENAI_RPM,
+                tpm=Config.OPENAI_TPM,
+                max_retries=Config.OPENAI_MAX_RETRIES,
+            )
+        return _shared_client
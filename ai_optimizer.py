@@ -1,16 +1,54 @@
-from openai import OpenAI
 from config import Config
+from ai_cache import AICache
+from ai_client import get_ai_client
+import json
 import logging
 
+logger = logging.getLogger(__name__)
+
+MODEL = "gpt-3.5-turbo"
+
+GENRES = ["House", "Tech House", "Melodic", "Techno", "Deep House", "Funk", "Trance", "Drum & Bass", "Pop"]
+SET_MOMENTS = ["Warmup", "Build-up", "Peak Time", "Breakdown", "Closing", "Other"]
+
+# Bump a version whenever its prompt changes so old cached answers are not reused.
+# Batch answers come from another prompt, so they are cached under their own kind.
+PROMPT_VERSIONS = {
+    "query": 1,
+    "genre": 1,
+    "set": 1,
+    "genre_batch": 1,
+    "set_batch": 1,
+    "match": 1,
+}
+
 class AIOptimizer:
     def __init__(self):
         if Config.OPENAI_API_KEY:
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+            self.client = get_ai_client()
             self.enabled = True
+            self.cache = AICache(
+                Config.AI_CACHE_PATH,
+                max_entries=Config.AI_CACHE_MAX_ENTRIES,
+                ttl=Config.AI_CACHE_TTL_DAYS * 86400,
+            )
         else:
             self.client = None
             self.enabled = False
-            
+            self.cache = None
+
+    def _cached(self, kind, artist, title):
+        """
+        Returns (key, cached answer or None) for a track.
+        """
+        key = AICache.make_key(kind, artist, title, PROMPT_VERSIONS[kind], MODEL)
+        return key, self.cache.get(key)
+
+    def cache_stats(self):
+        if not self.cache:
+            return {"hits": 0, "misses": 0}
+        return self.cache.stats()
+
     def refine_search_query(self, artist, title):
         """
         Asks ChatGPT for the best search query to find the official audio
@@ -19,6 +57,10 @@ class AIOptimizer:
         if not self.enabled:
             return f"{artist} - {title}"
 
+        key, cached = self._cached("query", artist, title)
+        if cached is not None:
+            return cached
+
         try:
             prompt = (
                 f"I am a DJ downloading songs. I specifically want the 'Extended Mix' or 'Club Mix' if it exists. "
@@ -29,8 +71,8 @@ class AIOptimizer:
                 f"Do not explain."
             )
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.client.complete(
+                model=MODEL,
                 messages=[
                     {"role": "system", "content": "You are a helpful DJ assistant. Output only the best search query."},
                     {"role": "user", "content": prompt}
@@ -38,48 +80,81 @@ class AIOptimizer:
                 max_tokens=20,
                 temperature=0.3,
             )
-            
+
             refined_query = response.choices[0].message.content.strip()
             # Remove quotes if chatgpt added them
             refined_query = refined_query.strip('"').strip("'")
+            self.cache.set(key, refined_query)
             return refined_query
 
         except Exception as e:
-            logging.error(f"AI Error: {e}")
+            logger.error(f"AI Error: {e}")
             return f"{artist} - {title}"
-            
+
     def validate_match(self, song_name, found_title):
         """
         Ask AI if the found YouTube title looks like a bad match (e.g. live version, cover, etc)
         when we wanted the original.
         """
+        return self.validate_matches(song_name, [found_title])[0]
+
+    def validate_matches(self, song_name, found_titles):
+        """
+        Checks several YouTube titles for one track with a single chat
+        completion. Returns one bool per title, in order; titles the AI
+        skipped count as good, like a failed request.
+        """
         if not self.enabled:
-            return True # Assume it's fine
-            
+            return [True] * len(found_titles)
+
+        verdicts = [None] * len(found_titles)
+        pending = []
+        for i, found_title in enumerate(found_titles):
+            key, cached = self._cached("match", song_name, found_title)
+            if cached is not None:
+                verdicts[i] = cached == "YES"
+            else:
+                pending.append((i, key))
+        if not pending:
+            return verdicts
+
         try:
+            listing = "\n".join(f"{n}. {found_titles[i]}" for n, (i, _) in enumerate(pending))
             prompt = (
                 f"I am looking for the original audio of '{song_name}'. \n"
-                f"I found a video titled: '{found_title}'. \n"
-                f"Is this likely a good match for the studio audio? \n"
-                f"If it says 'Live', 'Cover', 'Reaction', 'Teaser', or 'Preview', say NO. \n"
-                f"Otherwise say YES. Answer with only YES or NO."
+                f"I found these videos: \n{listing}\n"
+                f"Which are likely a good match for the studio audio? \n"
+                f"If a title says 'Live', 'Cover', 'Reaction', 'Teaser', or 'Preview', it is not. \n"
+                'Return ONLY a JSON object like {"results": [{"id": 0, "match": true}]} '
+                "with one entry per video id."
             )
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=5,
+
+            response = self.client.complete(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=15 * len(pending) + 20,
                 temperature=0.0,
+                response_format={"type": "json_object"},
             )
-            
-            answer = response.choices[0].message.content.strip().upper()
-            return "YES" in answer
+
+            data = json.loads(response.choices[0].message.content)
+            items = data.get("results", []) if isinstance(data, dict) else data
+            for item in items if isinstance(items, list) else []:
+                if not isinstance(item, dict) or not isinstance(item.get("match"), bool):
+                    continue
+                try:
+                    n = int(item.get("id"))
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= n < len(pending):
+                    i, key = pending[n]
+                    verdicts[i] = item["match"]
+                    self.cache.set(key, "YES" if item["match"] else "NO")
 
         except Exception as e:
-            logging.error(f"AI Verification Error: {e}")
-            return True
+            logger.error(f"AI Verification Error: {e}")
+
+        return [True if verdict is None else verdict for verdict in verdicts]
 
     def detect_genre(self, artist, title):
         """
@@ -88,6 +163,37 @@ class AIOptimizer:
         if not self.enabled:
             return "Unsorted"
 
+        key, cached = self._cached("genre", artist, title)
+        if cached is not None:
+            return cached
+
+        try:
+            prompt = (
+                f"Categorize the song '{artist} - {title}' into ONE of these genres: "
+                f"House, Tech House, Melodic, Techno, Deep House, Funk, Trance, Drum & Bass, Pop, Other. \n"
+                f"Return ONLY the genre name. If unsure, say 'Unsorted'."
+            )
+
+            response = self.client.complete(
+                model=MODEL,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=5,
+                temperature=0.0,
+            )
+
+            genre = response.choices[0].message.content.strip().title()
+
+            if genre not in GENRES:
+                genre = "Other"
+            self.cache.set(key, genre)
+            return genre
+
+        except Exception as e:
+            logger.error(f"AI Genre Error: {e}")
+            return "Unsorted"
+
     def detect_set_moment(self, artist, title):
         """
         Classifica a faixa em um momento do set.
@@ -95,6 +201,10 @@ class AIOptimizer:
         if not self.enabled:
             return "Set"
 
+        key, cached = self._cached("set", artist, title)
+        if cached is not None:
+            return cached
+
         try:
             prompt = (
                 f"Classifique a faixa '{artist} - {title}' em UM destes momentos do set: "
@@ -102,50 +212,125 @@ class AIOptimizer:
                 "Retorne SOMENTE o nome do momento."
             )
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.client.complete(
+                model=MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=5,
                 temperature=0.0,
             )
 
             moment = response.choices[0].message.content.strip().title()
-            valid = ["Warmup", "Build-Up", "Peak Time", "Breakdown", "Closing", "Other"]
 
             # Normalize "Build-up"
             if moment == "Build-Up":
                 moment = "Build-up"
 
-            if moment not in ["Warmup", "Build-up", "Peak Time", "Breakdown", "Closing", "Other"]:
-                return "Other"
+            if moment not in SET_MOMENTS:
+                moment = "Other"
+            self.cache.set(key, moment)
             return moment
 
         except Exception as e:
-            logging.error(f"AI Set Moment Error: {e}")
+            logger.error(f"AI Set Moment Error: {e}")
             return "Set"
+
+    def classify_batch(self, tracks, kind="genre"):
+        """
+        Classifies many (artist, title) tracks with one chat completion per
+        chunk of Config.AI_BATCH_SIZE tracks. kind is "genre" or "set".
+        Returns one label per track, in order. Tracks whose answer is missing or
+        not in the allowed list fall back to the single-track call.
+        """
+        single = self.detect_set_moment if kind == "set" else self.detect_genre
+        if not self.enabled:
+            return [single(artist, title) for artist, title in tracks]
+
+        labels = [None] * len(tracks)
+        pending = []
+        for i, (artist, title) in enumerate(tracks):
+            key, cached = self._cached(f"{kind}_batch", artist, title)
+            if cached is not None:
+                labels[i] = cached
+            else:
+                pending.append((i, key))
+
+        # Chunks go out together; the shared client caps concurrency and rate
+        size = max(1, Config.AI_BATCH_SIZE)
+        requests = []
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            chunk_tracks = [tracks[i] for i, _ in chunk]
+            requests.append((chunk, chunk_tracks, self.client.submit(**self._chunk_request(chunk_tracks, kind))))
+
+        for chunk, chunk_tracks, future in requests:
+            answers = self._parse_chunk(future, chunk_tracks, kind)
+            for n, (i, key) in enumerate(chunk):
+                label = answers.get(n)
+                if label is None:
+                    continue
+                labels[i] = label
+                self.cache.set(key, label)
+
+        for i, label in enumerate(labels):
+            if label is None:
+                artist, title = tracks[i]
+                labels[i] = single(artist, title)
+        return labels
+
+    @staticmethod
+    def _allowed_labels(kind):
+        return SET_MOMENTS if kind == "set" else GENRES + ["Other"]
+
+    def _chunk_request(self, tracks, kind):
+        """
+        Arguments for one JSON-mode completion covering a chunk of tracks.
+        """
+        if kind == "set":
+            task = "the moment of a DJ set where it fits best"
+        else:
+            task = "its broad electronic music genre"
+        allowed = self._allowed_labels(kind)
+
+        listing = "\n".join(f"{n}. {artist} - {title}" for n, (artist, title) in enumerate(tracks))
+        prompt = (
+            f"Classify each track below by {task}. "
+            f"Allowed labels: {', '.join(allowed)}. \n"
+            f"Tracks: \n{listing}\n"
+            'Return ONLY a JSON object like {"results": [{"id": 0, "label": "..."}]} '
+            "with one entry per track id."
+        )
+        return {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 20 * len(tracks) + 20,
+            "temperature": 0.0,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _parse_chunk(self, future, tracks, kind):
+        """
+        Waits for a chunk's completion.
+        Returns {position: label} for the answers that passed validation.
+        """
         try:
-            prompt = (
-                f"Categorize the song '{artist} - {title}' into ONE of these genres: "
-                f"House, Tech House, Melodic, Techno, Deep House, Funk, Trance, Drum & Bass, Pop, Other. \n"
-                f"Return ONLY the genre name. If unsure, say 'Unsorted'."
-            )
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=5,
-                temperature=0.0,
-            )
-            
-            genre = response.choices[0].message.content.strip().title()
-            valid_genres = ["House", "Tech House", "Melodic", "Techno", "Deep House", "Funk", "Trance", "Drum & Bass", "Pop"]
-            
-            if genre not in valid_genres:
-                return "Other"
-            return genre
+            response = future.result()
+            data = json.loads(response.choices[0].message.content)
+            items = data.get("results", []) if isinstance(data, dict) else data
+        except Exception:
+            logger.exception("AI Batch Error")
+            return {}
 
-        except Exception as e:
-            logging.error(f"AI Genre Error: {e}")
-            return "Unsorted"
+        # Match labels case-insensitively, "Build-Up" -> "Build-up"
+        valid = {label.lower(): label for label in self._allowed_labels(kind)}
+        answers = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                n = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            label = valid.get(str(item.get("label", "")).strip().lower())
+            if label and 0 <= n < len(tracks):
+                answers[n] = label
+        return answers
@@ -1,11 +1,11 @@
-from openai import OpenAI
 from config import Config
+from ai_client import get_ai_client
 
 
 class AIAssistant:
     def __init__(self):
         self.enabled = bool(Config.OPENAI_API_KEY)
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY) if self.enabled else None
+        self.client = get_ai_client() if self.enabled else None
         self.history = []
 
     def add_event(self, role, content):
@@ -45,7 +45,7 @@ class AIAssistant:
                 "As opções devem ser: separar por pasta de gênero ou por momentos do SET. "
                 "Responda de forma curta e objetiva."
             )
-            response = self.client.chat.completions.create(
+            response = self.client.complete(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "Você é uma assistente de DJ objetiva."},
@@ -75,7 +75,7 @@ class AIAssistant:
         try:
             messages = [{"role": "system", "content": "Você é uma assistente de DJ objetiva."}]
             messages.extend(self.history)
-            response = self.client.chat.completions.create(
+            response = self.client.complete(
                 model="gpt-3.5-turbo",
                 messages=messages,
                 max_tokens=120,
@@ -0,0 +1,419 @@
+"""
+Local audio analysis for set-moment classification: tempo, loudness and
+brightness measured from the downloaded file instead of guessed from its
+title.
+
+ffmpeg decodes up to MAX_SECONDS of the track to mono float PCM, which is
+read CHUNK_SECONDS at a time, so memory stays bounded on long mixes. Each
+chunk is cut into overlapping frames and analysed with NumPy in one pass:
+RMS energy, spectral centroid and spectral flux (the onset envelope). The
+tempo is the autocorrelation peak of the onset envelope, scored on a fine
+BPM grid over several beat multiples.
+
+The results are written into the file's own tags (plus the standard BPM
+tag), so a file is only analysed once, wherever it is moved. NumPy is an
+optional dependency (pip install numpy); without it nothing is analysed.
+
+    python audio_features.py ~/Music/spot-downloader      # analyse and tag
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 11025
+FRAME = 1024
+HOP = 256
+FRAMES_PER_SECOND = SAMPLE_RATE / HOP
+CHUNK_SECONDS = 10
+MAX_SECONDS = 600
+# Less sound than this gives no reliable tempo
+MIN_SECONDS = 8
+# Tempo search range, and the range DJ tempos are folded into
+MIN_BPM, MAX_BPM = 60, 200
+DJ_BPM = (78, 180)
+
+# Bump when the analysis changes so old tags are recomputed
+FEATURES_VERSION = 1
+TAG_NAME = "SPOTDL_FEATURES"
+MP4_TAG_NAME = "----:com.spot-downloader:features"
+
+AudioFeatures = namedtuple("AudioFeatures", ["bpm", "energy", "dynamics", "brightness", "pulse", "trend"])
+AudioFeatures.__doc__ = """
+bpm: tempo; energy: loudness in dBFS; dynamics: spread of the frame
+loudness in dB; brightness: spectral centroid in Hz; pulse: beat strength
+(0-1); trend: loudness of the last third minus the first third, in dB.
+"""
+
+# Typical features of each set moment, and how far a track may be from them
+# before it counts as far (one unit of distance)
+MOMENT_PROFILES = {
+    "Warmup": {"bpm": 117, "energy": -13.0, "pulse": 0.45, "trend": 0.0},
+    "Build-up": {"bpm": 124, "energy": -10.5, "pulse": 0.55, "trend": 3.0},
+    "Peak Time": {"bpm": 128, "energy": -8.0, "pulse": 0.7, "trend": 0.0},
+    "Breakdown": {"bpm": 120, "energy": -15.0, "pulse": 0.15, "trend": 0.0},
+    "Closing": {"bpm": 120, "energy": -12.0, "pulse": 0.4, "trend": -3.0},
+}
+MOMENT_SCALES = {"bpm": 5.0, "energy": 2.5, "pulse": 0.2, "trend": 2.0}
+# Best two moments closer than this are a tie, for the AI to break
+TIE_MARGIN = 0.25
+
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Accumulator:
+    """
+    Per-frame features of a PCM stream fed in chunks. Frames overlapping
+    two chunks are completed with the next one.
+    """
+
+    def __init__(self, np):
+        self.np = np
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.window = np.hanning(FRAME).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(FRAME, 1 / SAMPLE_RATE).astype(np.float32)
+        self.previous = None
+        self.rms, self.centroid, self.flux = [], [], []
+
+    def feed(self, samples):
+        np = self.np
+        buffer = np.concatenate((self.tail, samples.astype(np.float32, copy=False)))
+        count = (len(buffer) - FRAME) // HOP + 1
+        if count <= 0:
+            self.tail = buffer
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, FRAME)[::HOP][:count]
+        self.tail = buffer[count * HOP:]
+
+        self.rms.append(np.sqrt(np.mean(frames * frames, axis=1)))
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1))
+        self.centroid.append((magnitude @ self.freqs) / (magnitude.sum(axis=1) + 1e-9))
+        compressed = np.log1p(magnitude)
+        previous = compressed[:1] if self.previous is None else self.previous
+        rise = np.diff(np.vstack((previous, compressed)), axis=0)
+        self.flux.append(np.maximum(rise, 0).sum(axis=1))
+        self.previous = compressed[-1:]
+
+    def result(self):
+        np = self.np
+        if not self.rms:
+            return None
+        rms = np.concatenate(self.rms)
+        if len(rms) < MIN_SECONDS * FRAMES_PER_SECOND or rms.max() <= 0:
+            return None
+        # Silence (intros, gaps) would drag every average down
+        loud = rms >= rms.max() / 100
+        db = 20 * np.log10(rms[loud] + 1e-9)
+        third = max(1, len(db) // 3)
+        bpm, pulse = estimate_tempo(np.concatenate(self.flux), np)
+        return AudioFeatures(
+            bpm=round(bpm, 1),
+            energy=round(float(10 * np.log10(np.mean(rms[loud] ** 2) + 1e-12)), 2),
+            dynamics=round(float(np.std(db)), 2),
+            brightness=round(float(np.mean(np.concatenate(self.centroid)[loud])), 1),
+            pulse=round(pulse, 3),
+            trend=round(float(db[-third:].mean() - db[:third].mean()), 2),
+        )
+
+
+def estimate_tempo(onsets, np):
+    """
+    (bpm, pulse) of an onset envelope. pulse is the normalized
+    autocorrelation at the beat period, 0 for no steady beat.
+    """
+    envelope = onsets - np.convolve(onsets, np.ones(16) / 16, mode="same")
+    envelope = np.maximum(envelope, 0)
+    size = len(envelope)
+    spectrum = np.fft.rfft(envelope, 2 * size)
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:size]
+    if autocorrelation[0] <= 0:
+        return 0.0, 0.0
+    autocorrelation = autocorrelation / autocorrelation[0]
+
+    bpms = np.arange(MIN_BPM, MAX_BPM + 0.25, 0.25)
+    lags = FRAMES_PER_SECOND * 60 / bpms
+    positions = np.arange(size)
+    # A steady beat also correlates at two, four and eight beats
+    score = sum(
+        weight * np.interp(lags * multiple, positions, autocorrelation, right=0)
+        for multiple, weight in ((1, 1.0), (2, 0.5), (4, 0.5), (8, 0.5))
+    )
+    # Mild preference for club tempos over their halves and doubles
+    score = score * np.exp(-0.5 * (np.log2(bpms / 122) / 0.9) ** 2)
+    best = int(np.argmax(score))
+    pulse = float(np.clip(np.interp(lags[best], positions, autocorrelation), 0, 1))
+
+    bpm = float(bpms[best])
+    while bpm < DJ_BPM[0]:
+        bpm *= 2
+    while bpm > DJ_BPM[1]:
+        bpm /= 2
+    return bpm, pulse
+
+
+def features_from_chunks(chunks):
+    """
+    AudioFeatures of mono float PCM at SAMPLE_RATE given as NumPy arrays,
+    or None when there is too little sound to analyse.
+    """
+    import numpy as np
+
+    accumulator = _Accumulator(np)
+    for chunk in chunks:
+        accumulator.feed(chunk)
+    return accumulator.result()
+
+
+def _decode(path, np, ffmpeg="ffmpeg"):
+    """
+    Yields the decoded track CHUNK_SECONDS at a time. Raises OSError when
+    ffmpeg fails.
+    """
+    process = subprocess.Popen(
+        [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-t", str(MAX_SECONDS),
+         "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    chunk_bytes = CHUNK_SECONDS * SAMPLE_RATE * 4
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 4 * 4], dtype="<f4")
+    except GeneratorExit:
+        # The caller stopped reading early
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode:
+        raise OSError(f"ffmpeg could not decode {path}")
+
+
+def compute_features(path, ffmpeg="ffmpeg"):
+    """
+    Analyses a file. None when it cannot be decoded or is too short.
+    """
+    import numpy as np
+
+    try:
+        return features_from_chunks(_decode(path, np, ffmpeg))
+    except OSError:
+        return None
+
+
+def _open_tags(path):
+    from mutagen import File
+
+    audio = File(path)
+    if audio is None:
+        return None
+    if audio.tags is None:
+        audio.add_tags()
+    return audio
+
+
+def _tag_kind(tags):
+    from mutagen.id3 import ID3
+    from mutagen.mp4 import MP4Tags
+
+    if isinstance(tags, ID3):
+        return "id3"
+    if isinstance(tags, MP4Tags):
+        return "mp4"
+    # FLAC, Ogg Vorbis and Opus comments
+    return "vorbis"
+
+
+def read_cached(path):
+    """
+    AudioFeatures stored in the file's tags by an earlier analysis, or None.
+    """
+    try:
+        audio = _open_tags(path)
+        if audio is None:
+            return None
+        tags = audio.tags
+        kind = _tag_kind(tags)
+        if kind == "id3":
+            frame = tags.get(f"TXXX:{TAG_NAME}")
+            text = frame.text[0] if frame else None
+        elif kind == "mp4":
+            values = tags.get(MP4_TAG_NAME)
+            text = bytes(values[0]).decode() if values else None
+        else:
+            values = tags.get(TAG_NAME)
+            text = values[0] if values else None
+        if not text:
+            return None
+        data = json.loads(text)
+        if data.pop("version", None) != FEATURES_VERSION:
+            return None
+        return AudioFeatures(**data)
+    except Exception:
+        # Unreadable file, or a tag in a shape we did not write: analyse again
+        logger.debug(f"No cached audio features in {path}", exc_info=True)
+        return None
+
+
+def write_cached(path, features):
+    """
+    Stores the features, and the tempo as the standard BPM tag. Returns
+    False when the file's tags cannot be written.
+    """
+    text = json.dumps({"version": FEATURES_VERSION, **features._asdict()})
+    bpm = round(features.bpm)
+    try:
+        audio = _open_tags(path)
+        if audio is None:
+            return False
+        tags = audio.tags
+        kind = _tag_kind(tags)
+        if kind == "id3":
+            from mutagen.id3 import TBPM, TXXX
+
+            tags.setall(f"TXXX:{TAG_NAME}", [TXXX(encoding=3, desc=TAG_NAME, text=[text])])
+            tags.setall("TBPM", [TBPM(encoding=3, text=[str(bpm)])])
+        elif kind == "mp4":
+            from mutagen.mp4 import MP4FreeForm
+
+            tags[MP4_TAG_NAME] = [MP4FreeForm(text.encode())]
+            tags["tmpo"] = [bpm]
+        else:
+            tags[TAG_NAME] = [text]
+            tags["BPM"] = [str(bpm)]
+        audio.save()
+        return True
+    except Exception:
+        logger.warning(f"Could not store audio features in {path}", exc_info=True)
+        return False
+
+
+def analyze_file(path, ffmpeg="ffmpeg"):
+    """
+    Features from the file's tags, or computed and then stored there.
+    Runs in worker processes, so it only takes and returns plain data.
+    """
+    cached = read_cached(path)
+    if cached is not None:
+        return cached
+    features = compute_features(path, ffmpeg)
+    if features is not None:
+        write_cached(path, features)
+    return features
+
+
+class AudioAnalyzer:
+    """
+    Runs analyze_file on a process pool shared by every caller (workers=1
+    runs in the calling thread). The pool starts with the first file.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers or None)
+        return self._pool
+
+    def analyze(self, path):
+        if self.workers == 1:
+            return analyze_file(path)
+        return self._executor().submit(analyze_file, path).result()
+
+    def analyze_many(self, paths, progress=None):
+        """
+        Features of every path, in order. progress(done, total) follows them.
+        """
+        if self.workers == 1:
+            results = map(analyze_file, paths)
+        else:
+            results = self._executor().map(analyze_file, paths, chunksize=2)
+        found = []
+        for done, features in enumerate(results, 1):
+            found.append(features)
+            if progress:
+                progress(done, len(paths))
+        return found
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def rank_moments(features):
+    """
+    Set moments from nearest to farthest from the track's features, as
+    [(moment, distance), ...].
+    """
+    values = features._asdict()
+    ranked = []
+    for moment, profile in MOMENT_PROFILES.items():
+        distance = sum(
+            ((values[name] - target) / MOMENT_SCALES[name]) ** 2 for name, target in profile.items()
+        ) ** 0.5
+        ranked.append((moment, distance))
+    return sorted(ranked, key=lambda item: item[1])
+
+
+def is_tie(ranked):
+    return ranked[1][1] - ranked[0][1] < TIE_MARGIN
+
+
+def pick_moment(ranked, tiebreak=None):
+    """
+    The nearest moment. On a tie, tiebreak() (the AI's answer) wins when it
+    is one of the two nearest.
+    """
+    if tiebreak is not None and is_tie(ranked):
+        answer = tiebreak()
+        if answer in (ranked[0][0], ranked[1][0]):
+            return answer
+    return ranked[0][0]
+
+
+def describe(features):
+    return f"{features.bpm:.0f} BPM, {features.energy:.1f} dB, pulse {features.pulse:.2f}"
+
+
+def main():
+    from library_index import LibraryIndex
+
+    parser = argparse.ArgumentParser(description="Analyses audio files and stores tempo and energy in their tags.")
+    parser.add_argument("folder", help="output folder to scan")
+    parser.add_argument("--workers", type=int, default=0, help="analysis processes (default: CPU count)")
+    args = parser.parse_args()
+    if not numpy_available():
+        parser.exit(1, "Audio analysis needs NumPy (pip install numpy).\n")
+
+    library = LibraryIndex(args.folder)
+    library.refresh()
+    paths = library.paths()
+    analyzer = AudioAnalyzer(args.workers or None)
+    root = os.path.abspath(args.folder)
+    for path, features in zip(paths, analyzer.analyze_many(paths)):
+        if features is None:
+            print(f"{os.path.relpath(path, root)}: not analysed")
+        else:
+            print(f"{os.path.relpath(path, root)}: {describe(features)} -> {rank_moments(features)[0][0]}")
+    analyzer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Offline benchmarks for the download and organize hot paths.
+
+Spotify, YouTube and OpenAI are replaced by local fakes, so this runs with no
+network and no credentials:
+
+    python benchmark.py                        # everything, default sizes
+    python benchmark.py --only lookup --sizes 1000,10000,100000
+    python benchmark.py --output new.json --compare old.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ai_client
+import downloader as downloader_module
+from config import Config
+from downloader import SpotifyDownloader
+
+FAKE_MP3 = b"ID3" + b"\0" * 4096
+GENRE_FOLDERS = ["House", "Tech House", "Melodic", "Techno", "Deep House", "Unsorted"]
+
+
+# Fakes
+
+class FakeSong:
+    def __init__(self, artist, name, song_id):
+        self.artist = artist
+        self.name = name
+        self.song_id = song_id
+
+    @property
+    def json(self):
+        return {"artist": self.artist, "name": self.name, "song_id": self.song_id}
+
+
+class FakeSpotdl:
+    """
+    Stands in for spotdl.Spotdl. A URL ending in /<name>-<count> expands to
+    `count` songs after `latency` seconds.
+    """
+
+    latency = 0.0
+
+    def __init__(self, client_id=None, client_secret=None, downloader_settings=None, loop=None):
+        pass
+
+    def search(self, query):
+        time.sleep(self.latency)
+        name, count = query[0].rsplit("/", 1)[-1].rsplit("-", 1)
+        return [FakeSong(f"Artist {name}", f"Track {i}", f"{name}{i:08d}") for i in range(int(count))]
+
+
+# song_id -> monotonic time its match started, for per-track latency
+match_started = {}
+
+
+class FakeDownloader:
+    """
+    Stands in for spotdl's Downloader: search and download sleep for the
+    configured latencies, downloads write a small synthetic MP3.
+    """
+
+    match_latency = 0.0
+    download_latency = 0.0
+
+    def __init__(self, settings=None):
+        self.output = settings["output"]
+
+    def search(self, song):
+        match_started[song.song_id] = time.monotonic()
+        time.sleep(self.match_latency)
+        return f"https://music.youtube.com/watch?v={song.song_id}"
+
+    def search_and_download(self, song):
+        time.sleep(self.download_latency)
+        path = self.output.format(artist=song.artist, title=song.name, **{"output-ext": "mp3"})
+        with open(path, "wb") as f:
+            f.write(FAKE_MP3)
+        return song, path
+
+
+class FakeOpenAI:
+    """
+    Local chat completions endpoint. Answers JSON-mode batch requests with a
+    label per listed track and plain requests with "House".
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests += 1
+                time.sleep(fake.latency)
+                content = "House"
+                if body.get("response_format"):
+                    listing = body["messages"][0]["content"].split("Tracks: \n", 1)[1]
+                    count = len([line for line in listing.splitlines() if ". " in line and " - " in line])
+                    content = json.dumps({"results": [{"id": n, "label": "Techno"} for n in range(count)]})
+                payload = json.dumps({
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class BenchApp:
+    """
+    Headless app_instance that timestamps every log line.
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append((time.monotonic(), message))
+
+    def show_playlist(self, songs):
+        pass
+
+    def request_storage_mode(self, total_songs=None):
+        return "genre"
+
+    def download_finished(self):
+        pass
+
+    def organization_finished(self):
+        pass
+
+
+# Helpers
+
+def generate_library(root, size, loose=False, seed=0):
+    """
+    Writes `size` synthetic MP3s under root, spread over genre folders (or
+    all in root when loose). Returns the (artist, title) of every file.
+    """
+    rng = random.Random(seed)
+    tracks = []
+    for i in range(size):
+        artist, title = f"Artist {i % 997}", f"Track {i}"
+        folder = root if loose else os.path.join(root, rng.choice(GENRE_FOLDERS))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"{artist} - {title}.mp3"), "wb") as f:
+            f.write(FAKE_MP3)
+        tracks.append((artist, title))
+    return tracks
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def latency_stats(latencies, elapsed, count=None):
+    count = len(latencies) if count is None else count
+    return {
+        "count": count,
+        "seconds": round(elapsed, 4),
+        "per_second": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Benchmarks
+
+def bench_run(workdir, tracks, use_ai):
+    """
+    SpotifyDownloader.run over a fresh `tracks`-song playlist.
+    Per-track latency is from its match starting to its result being logged.
+    """
+    match_started.clear()
+    output = os.path.join(workdir, "run")
+    dl = SpotifyDownloader()
+    app = BenchApp()
+
+    started = time.monotonic()
+    summary = dl.run(f"https://open.spotify.com/album/bench-{tracks}", output, use_ai, app)
+    elapsed = time.monotonic() - started
+
+    latencies = []
+    for at, message in app.lines:
+        if message.startswith("[") and "] Artist bench - Track " in message:
+            number = int(message.rsplit("Track ", 1)[1])
+            began = match_started.get(f"bench{number:08d}")
+            if began is not None:
+                latencies.append(at - began)
+
+    result = latency_stats(latencies, elapsed, count=tracks)
+    result["use_ai"] = use_ai
+    if summary:
+        result["stage_seconds"] = summary["stage_seconds"]
+        result["tracks_done"] = summary["tracks"].get("done", 0)
+    return result
+
+
+def bench_lookup(workdir, size, lookups):
+    """
+    check_file_exists against a library of `size` files: index build time,
+    then `lookups` lookups, half of them hits.
+    """
+    root = os.path.join(workdir, f"library-{size}")
+    tracks = generate_library(root, size)
+    dl = SpotifyDownloader()
+
+    started = time.monotonic()
+    dl.get_library_index(root)
+    build = time.monotonic() - started
+
+    rng = random.Random(1)
+    latencies = []
+    hits = 0
+    started = time.monotonic()
+    for n in range(lookups):
+        if n % 2 == 0:
+            artist, title = rng.choice(tracks)
+        else:
+            artist, title = "Nobody", f"Missing {n}"
+        began = time.monotonic()
+        found, _ = dl.check_file_exists(root, title, artist)
+        latencies.append(time.monotonic() - began)
+        hits += found
+    elapsed = time.monotonic() - started
+
+    result = latency_stats(latencies, elapsed)
+    result.update({"library_files": size, "index_build_seconds": round(build, 4), "hits": hits})
+    shutil.rmtree(root, ignore_errors=True)
+    return result
+
+
+def bench_organize(workdir, size, use_ai):
+    """
+    organize_existing over `size` loose files in the root folder, split into
+    the plan phase (scan + classification) and the apply phase. Per-file
+    latency is the average within each window between progress lines.
+    """
+    root = os.path.join(workdir, f"loose-{size}")
+    generate_library(root, size, loose=True)
+    dl = SpotifyDownloader()
+    app = BenchApp()
+
+    started = time.monotonic()
+    dl.organize_existing(root, app, use_ai, "genre")
+    elapsed = time.monotonic() - started
+
+    planned = next((at for at, message in app.lines if message.startswith("Plan: ")), started)
+    progress = [(planned, 0)] + [
+        (at, int(message[1:].split("/", 1)[0]))
+        for at, message in app.lines if message.endswith("files organized")
+    ]
+    latencies = []
+    for (a, done_a), (b, done_b) in itertools.pairwise(progress):
+        latencies += [(b - a) / (done_b - done_a)] * (done_b - done_a)
+
+    result = latency_stats(latencies, elapsed, count=size)
+    result.update({
+        "use_ai": use_ai,
+        "plan_seconds": round(planned - started, 4),
+        "apply_seconds": round(progress[-1][0] - planned, 4),
+        "moved": size - len([f for f in os.listdir(root) if f.endswith(".mp3")]),
+    })
+    shutil.rmtree(root, ignore_errors=True)
+    return result
+
+
+def compare(results, previous):
+    """
+    Prints throughput changes against a previous results file.
+    """
+    print(f"\nCompared with {previous.get('revision') or 'previous run'}:")
+    for name, entries in results["results"].items():
+        for key, entry in entries.items():
+            before = previous.get("results", {}).get(name, {}).get(key)
+            if not before or not before.get("per_second"):
+                continue
+            change = entry["per_second"] / before["per_second"] - 1
+            print(f"  {name}[{key}]: {before['per_second']} -> {entry['per_second']} /s ({change:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for spot-downloader.")
+    parser.add_argument("--only", choices=["run", "lookup", "organize"], action="append",
+                        help="benchmarks to run (repeatable, default: all)")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="library sizes for lookup/organize, e.g. 1000,10000,100000")
+    parser.add_argument("--tracks", type=int, default=200, help="playlist size for run")
+    parser.add_argument("--lookups", type=int, default=2000, help="check_file_exists calls per size")
+    parser.add_argument("--spotify-latency", type=float, default=0.2)
+    parser.add_argument("--match-latency", type=float, default=0.05)
+    parser.add_argument("--download-latency", type=float, default=0.2)
+    parser.add_argument("--ai-latency", type=float, default=0.3)
+    parser.add_argument("--no-ai", action="store_true", help="skip the AI variants")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to compare with")
+    args = parser.parse_args()
+
+    only = set(args.only or ["run", "lookup", "organize"])
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    FakeSpotdl.latency = args.spotify_latency
+    FakeDownloader.match_latency = args.match_latency
+    FakeDownloader.download_latency = args.download_latency
+    downloader_module.Spotdl = FakeSpotdl
+    downloader_module.Downloader = FakeDownloader
+
+    workdir = tempfile.mkdtemp(prefix="spot-bench-")
+    openai = FakeOpenAI(latency=args.ai_latency)
+    Config.SPOTIFY_CLIENT_ID = Config.SPOTIFY_CLIENT_ID or "bench"
+    Config.SPOTIFY_CLIENT_SECRET = Config.SPOTIFY_CLIENT_SECRET or "bench"
+    Config.PLAYLIST_CACHE_DIR = os.path.join(workdir, "playlists")
+    Config.OPENAI_BASE_URL = openai.base_url
+
+    def set_ai(enabled):
+        # A fresh cache each time so every AI variant starts cold
+        Config.OPENAI_API_KEY = "bench" if enabled else ""
+        Config.AI_CACHE_PATH = os.path.join(workdir, f"ai-cache-{time.monotonic_ns()}.db")
+        ai_client._shared_client = None
+
+    ai_modes = [False] if args.no_ai else [False, True]
+    results = {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "workers": {
+            stage: getattr(Config, f"{stage.upper()}_WORKERS")
+            for stage in ("metadata", "match", "download", "classify", "organize")
+        },
+        "results": {},
+    }
+
+    try:
+        if "run" in only:
+            entries = results["results"].setdefault("run", {})
+            for use_ai in ai_modes:
+                set_ai(use_ai)
+                key = f"{args.tracks}{'-ai' if use_ai else ''}"
+                entries[key] = bench_run(os.path.join(workdir, key), args.tracks, use_ai)
+                print(f"run[{key}]: {entries[key]}")
+
+        if "lookup" in only:
+            set_ai(False)
+            entries = results["results"].setdefault("check_file_exists", {})
+            for size in sizes:
+                entries[str(size)] = bench_lookup(workdir, size, args.lookups)
+                print(f"check_file_exists[{size}]: {entries[str(size)]}")
+
+        if "organize" in only:
+            entries = results["results"].setdefault("organize_existing", {})
+            for use_ai in ai_modes:
+                set_ai(use_ai)
+                for size in sizes:
+                    key = f"{size}{'-ai' if use_ai else ''}"
+                    entries[key] = bench_organize(workdir, size, use_ai)
+                    print(f"organize_existing[{key}]: {entries[key]}")
+    finally:
+        openai.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
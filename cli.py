@@ -0,0 +1,167 @@
+"""
+Headless batch downloads, for cron jobs and servers.
+
+    python cli.py --storage-mode genre --jobs 4 URL [URL ...]
+    python cli.py --storage-mode set --file playlists.txt --output ~/Music/sets
+
+Every URL (or line of the file; several URLs on one line make one job) runs
+as a job with the given storage mode, so nothing waits for an answer. All
+jobs share one SpotifyDownloader, and with it the Spotify client, library
+index, playlist cache and AI cache. Progress goes to stderr; stdout gets a
+JSON summary. Exit status: 0 when every job is done, 1 when one failed, 130
+when interrupted (running jobs stop after their current tracks and can be
+resumed by running the same URLs again).
+
+With --queue (or TASK_QUEUE_URL) the tracks are not downloaded here but put
+on a shared task queue for distributed.py workers.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from config import Config
+from jobs import STORAGE_MODES, JobScheduler
+
+
+class ConsoleListener:
+    """
+    Prints what the jobs report to stderr, one "[#id]" prefixed line each.
+    """
+
+    def __init__(self, stream=sys.stderr, quiet=False):
+        self.stream = stream
+        self.quiet = quiet
+        self.lock = threading.Lock()
+
+    def _print(self, line):
+        with self.lock:
+            print(line, file=self.stream, flush=True)
+
+    def job_log(self, job, message):
+        if not self.quiet or message.startswith(("[Error]", "[Critical Error]")):
+            self._print(f"[#{job.id}] {message}")
+
+    def job_status(self, job):
+        self._print(f"[#{job.id}] {job.status}: {job.url}")
+
+    def job_playlist(self, job):
+        pass
+
+    def job_playlist_append(self, job, lines):
+        pass
+
+    def job_storage_prompt(self, job, total_songs):
+        pass
+
+
+def read_urls(urls, path=None):
+    """
+    URLs from the command line and, if given, a file with one job per line.
+    Blank lines and lines starting with # are ignored.
+    """
+    found = [url for url in urls if url.strip()]
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    found.append(line)
+    return found
+
+
+def run_batch(urls, output_folder, storage_mode, jobs=2, use_ai=False, runner=None, listener=None,
+              queue_url=None):
+    """
+    Runs every URL as a job on `jobs` workers and waits for all of them.
+    Returns the summary printed by main().
+    """
+    if runner is None:
+        from downloader import SpotifyDownloader
+
+        downloader = SpotifyDownloader()
+        run = downloader.run
+        if queue_url:
+            from distributed import Coordinator
+            from task_queue import open_queue
+
+            run = Coordinator(downloader, open_queue(queue_url, Config.TASK_MAX_ATTEMPTS)).run
+
+        def runner(job):
+            return run(job.url, job.output_folder, job.use_ai, job)
+
+    scheduler = JobScheduler(
+        runner, max_jobs=jobs, listener=listener,
+        log_capacity=Config.WEB_LOG_CAPACITY, keep_finished=len(urls),
+    )
+    started = time.time()
+    submitted = [scheduler.submit(url, output_folder, use_ai, storage_mode) for url in urls]
+    interrupted = False
+    try:
+        for job in submitted:
+            # Short waits so Ctrl+C is handled promptly on every platform
+            while not job.wait(0.5):
+                pass
+    except KeyboardInterrupt:
+        interrupted = True
+        for job in submitted:
+            job.cancel()
+        for job in submitted:
+            job.wait()
+
+    results = [job.summary() for job in submitted]
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {
+        "output_folder": output_folder,
+        "storage_mode": storage_mode,
+        "elapsed_seconds": round(time.time() - started, 3),
+        "interrupted": interrupted,
+        "jobs": counts,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downloads Spotify playlists without the GUI.")
+    parser.add_argument("urls", nargs="*", help="playlist, album or track URLs")
+    parser.add_argument("--file", help="file with one URL per line")
+    parser.add_argument("--storage-mode", choices=STORAGE_MODES, required=True,
+                        help="organize by genre or by set moment")
+    parser.add_argument("--jobs", type=int, default=Config.MAX_JOBS, help="jobs running at the same time")
+    parser.add_argument("--output", default=os.path.expanduser("~/Music/spot-downloader"),
+                        help="output folder shared by every job")
+    parser.add_argument("--no-ai", action="store_true", help="do not use OpenAI even if a key is set")
+    parser.add_argument("--quiet", action="store_true", help="only print errors and job status changes")
+    parser.add_argument("--summary-file", help="also write the JSON summary to this file")
+    parser.add_argument("--queue", default=Config.TASK_QUEUE_URL,
+                        help="hand the tracks to distributed.py workers through this task queue")
+    args = parser.parse_args(argv)
+
+    urls = read_urls(args.urls, args.file)
+    if not urls:
+        parser.error("no URLs given")
+    use_ai = bool(Config.OPENAI_API_KEY) and not args.no_ai
+    output_folder = os.path.abspath(os.path.expanduser(args.output))
+    os.makedirs(output_folder, exist_ok=True)
+
+    summary = run_batch(
+        urls, output_folder, args.storage_mode, jobs=args.jobs, use_ai=use_ai,
+        listener=ConsoleListener(quiet=args.quiet), queue_url=args.queue,
+    )
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.summary_file:
+        with open(args.summary_file, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if summary["interrupted"]:
+        return 130
+    return 0 if summary["jobs"].get("done", 0) == len(urls) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,81 @@ class Config:
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+    # OpenAI Client Settings
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. a local stand-in for tests
+    OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+    OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))  # requests/minute, 0 = unlimited
+    OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))  # tokens/minute, 0 = unlimited
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+    # AI Cache Settings
+    AI_CACHE_PATH = os.getenv("AI_CACHE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "spot-downloader", "ai_cache.db"
+    )
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "50000"))
+    AI_CACHE_TTL_DAYS = float(os.getenv("AI_CACHE_TTL_DAYS", "0"))  # 0 = never expire
+
+    # Tracks classified per chat completion in batch mode
+    AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "40"))
+
+    # Playlist Sync Settings
+    PLAYLIST_CACHE_DIR = os.getenv("PLAYLIST_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "spot-downloader", "playlists"
+    )
+    # Fetch playlists page by page so downloads start with the first page
+    STREAMING_FETCH = os.getenv("STREAMING_FETCH", "false").lower() in ("1", "true", "yes")
+    # Only download tracks added since the last sync of the same playlist
+    INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "false").lower() in ("1", "true", "yes")
+    REPORT_REMOVED_TRACKS = os.getenv("REPORT_REMOVED_TRACKS", "true").lower() in ("1", "true", "yes")
+
+    # Output Settings
+    OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "mp3").lower()  # mp3, m4a, opus, ogg, flac, wav
+    OUTPUT_BITRATE = os.getenv("OUTPUT_BITRATE", "320k")  # e.g. 192k, "auto" = same as the source
+    # Keep the source audio (AAC -> m4a, Opus -> opus) instead of re-encoding it
+    NO_TRANSCODE = os.getenv("NO_TRANSCODE", "false").lower() in ("1", "true", "yes")
+
+    # Skip downloads whose audio is already in the library under another name
+    FINGERPRINT_DEDUP = os.getenv("FINGERPRINT_DEDUP", "false").lower() in ("1", "true", "yes")
+    FINGERPRINT_WORKERS = int(os.getenv("FINGERPRINT_WORKERS", "0"))  # 0 = one per CPU
+
+    # Set moments from tempo/energy analysis of the audio (needs NumPy); AI breaks ties
+    AUDIO_ANALYSIS = os.getenv("AUDIO_ANALYSIS", "false").lower() in ("1", "true", "yes")
+    AUDIO_ANALYSIS_WORKERS = int(os.getenv("AUDIO_ANALYSIS_WORKERS", "0"))  # 0 = one per CPU
+
+    # Rank YouTube candidates locally (rejecting live/cover/...) instead of spotdl's pick
+    MATCH_SCORING = os.getenv("MATCH_SCORING", "false").lower() in ("1", "true", "yes")
+
+    # Download Pipeline Settings (workers per stage)
+    METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "4"))
+    MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "4"))
+    DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+    CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", "2"))
+    ORGANIZE_WORKERS = int(os.getenv("ORGANIZE_WORKERS", "1"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+    PIPELINE_REPORT_SECONDS = float(os.getenv("PIPELINE_REPORT_SECONDS", "15"))
+
+    # Threads moving files when organizing an existing folder
+    ORGANIZE_APPLY_WORKERS = int(os.getenv("ORGANIZE_APPLY_WORKERS", "8"))
+
+    # Jobs the web server runs at the same time; the rest wait in a queue
+    MAX_JOBS = int(os.getenv("MAX_JOBS", "2"))
+
+    # Distributed downloads: shared task queue (sqlite:///path or redis://host)
+    TASK_QUEUE_URL = os.getenv("TASK_QUEUE_URL", "")
+    TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", "120"))
+    TASK_HEARTBEAT_SECONDS = float(os.getenv("TASK_HEARTBEAT_SECONDS", "30"))
+    TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+    # Output folder on a network disk written by several hosts: the library
+    # and fingerprint databases then skip WAL, which is not safe there
+    SHARED_LIBRARY = os.getenv("SHARED_LIBRARY", "false").lower() in ("1", "true", "yes")
+
+    # Log lines kept in memory by the web server (shared view and per job)
+    WEB_LOG_CAPACITY = int(os.getenv("WEB_LOG_CAPACITY", "5000"))
+
+    # GUI log: flushes per second and lines kept in the textbox
+    GUI_LOG_FPS = int(os.getenv("GUI_LOG_FPS", "20"))
+    GUI_LOG_MAX_LINES = int(os.getenv("GUI_LOG_MAX_LINES", "5000"))
+
     # App Settings
     APP_NAME = "Spotify Link to MP3 Downloader"
     APP_SIZE = "800x600"
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+from spotdl.types.song import Song
+
+import downloader as downloader_module
+from config import Config
+
+
+class FakeSong:
+    def __init__(self, artist, name):
+        self.artist = artist
+        self.name = name
+
+    @property
+    def json(self):
+        return {"artist": self.artist, "name": self.name}
+
+
+def make_track(track_id):
+    """
+    A Song with every field the download pipeline reads.
+    """
+    return Song.from_missing_data(
+        name=f"Track {track_id}", artist="Artist", artists=["Artist"], song_id=track_id,
+        url=f"https://open.spotify.com/track/{track_id}", genres=[], disc_count=1,
+        tracks_count=1, track_number=1, album_id="album", album_artist="Artist",
+    )
+
+
+class FakeSpotdl:
+    """
+    Five tracks by "Artist <name>" for any URL ending in /<name>.
+    """
+
+    def __init__(self, client_id, client_secret, downloader_settings=None, loop=None):
+        pass
+
+    def search(self, query):
+        playlist = query[0].rsplit("/", 1)[-1]
+        return [FakeSong(f"Artist {playlist}", f"Track {i}") for i in range(5)]
+
+
+class FakeDownloader:
+    """
+    spotdl's Downloader without the network: every download writes a tiny file.
+    """
+
+    def __init__(self, settings=None):
+        self.output = settings["output"]
+        self.format = settings["format"]
+
+    def search(self, song):
+        return f"https://music.youtube.com/watch?v={song.name}"
+
+    def search_and_download(self, song):
+        path = self.output.format(artist=song.artist, title=song.name, **{"output-ext": self.format})
+        with open(path, "wb") as f:
+            f.write(b"ID3")
+        return song, path
+
+
+class HeadlessApp:
+    def __init__(self):
+        self.lines = []
+        self.finished = threading.Event()
+
+    def log(self, message):
+        self.lines.append(message)
+
+    def show_playlist(self, songs):
+        pass
+
+    def request_storage_mode(self, total_songs=None):
+        return "genre"
+
+    def download_finished(self):
+        self.finished.set()
+
+
+@pytest.fixture
+def fake_spotdl(tmp_path, monkeypatch):
+    """
+    SpotifyDownloader runs against FakeSpotdl and FakeDownloader, with
+    credentials set and the playlist cache under tmp_path. Tests can
+    monkeypatch other fakes over these.
+    """
+    monkeypatch.setattr(downloader_module, "Spotdl", FakeSpotdl)
+    monkeypatch.setattr(downloader_module, "Downloader", FakeDownloader)
+    monkeypatch.setattr(Config, "SPOTIFY_CLIENT_ID", "id")
+    monkeypatch.setattr(Config, "SPOTIFY_CLIENT_SECRET", "secret")
+    monkeypatch.setattr(Config, "PLAYLIST_CACHE_DIR", str(tmp_path / "playlists"))
@@ -0,0 +1,291 @@
+"""
+Downloads spread over several worker processes, possibly on several hosts.
+
+The coordinator (cli.py --queue URL) fetches each playlist, asks nothing
+(the storage mode is given), journals it and puts one task per track on a
+shared queue (task_queue.py). Workers lease tasks, run the same stages as
+the local pipeline (metadata, match, download, classify, organize) and write
+into the output folder, which every worker must see at the same path
+(shared disk, with SHARED_LIBRARY set when it is a network disk used by
+several hosts). The coordinator records the results in the job journal, so
+an interrupted job resumes like a local one.
+
+    python distributed.py --queue sqlite:///shared/queue.db      # one per process
+    python distributed.py --queue redis://queue-host:6379/0 --idle-exit
+"""
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import downloader as downloader_module
+from config import Config
+from downloader import JobContext, TrackJob
+from journal import JobJournal
+from metrics import REGISTRY, Metrics, format_summary
+from task_queue import open_queue
+
+logger = logging.getLogger(__name__)
+
+
+class Coordinator:
+    """
+    Runs a job like SpotifyDownloader.run, with the track pipeline replaced
+    by tasks for remote workers. Same app_instance interface.
+    """
+
+    def __init__(self, downloader, queue, poll_seconds=1.0):
+        self.downloader = downloader
+        self.queue = queue
+        self.poll_seconds = poll_seconds
+
+    def run(self, url, output_folder, use_ai, app_instance):
+        app_instance.log(f"Starting distributed job for: {url}")
+        metrics = Metrics(parent=REGISTRY)
+        summary = None
+
+        if not (Config.SPOTIFY_CLIENT_ID and Config.SPOTIFY_CLIENT_SECRET):
+            app_instance.log(
+                "[Error] Credenciais do Spotify ausentes. "
+                "Preencha SPOTIFY_CLIENT_ID e SPOTIFY_CLIENT_SECRET no .env."
+            )
+            app_instance.download_finished()
+            return
+
+        try:
+            dl = self.downloader
+            spotdl = dl._get_spotdl()
+            output_folder = os.path.abspath(output_folder)
+            os.makedirs(output_folder, exist_ok=True)
+            with metrics.timer("step", step="library_refresh"):
+                dl.get_library_index(output_folder).refresh()
+
+            journal = JobJournal.for_url(output_folder, url)
+            if journal.resumable() and journal.listed:
+                songs, storage_mode = dl._resume_songs(journal, app_instance)
+            else:
+                fetched = dl._fetch_songs(spotdl, url, output_folder, journal, app_instance, metrics)
+                if fetched is None:
+                    app_instance.download_finished()
+                    return
+                songs, storage_mode = fetched
+
+            remaining = set(journal.remaining())
+            tracks = {i: song for i, song in enumerate(songs, 1) if i in remaining}
+            job_id = uuid.uuid4().hex
+            self.queue.put(job_id, [
+                {
+                    "index": index, "song": song.json, "output_folder": output_folder,
+                    "storage_mode": storage_mode, "use_ai": use_ai,
+                }
+                for index, song in tracks.items()
+            ])
+            app_instance.log(f"Queued {len(tracks)} tracks for the workers (job {job_id}).")
+
+            if self._wait(job_id, tracks, len(songs), journal, app_instance, metrics):
+                journal.finish()
+            counts = journal.counts()
+            app_instance.log(
+                f"Job summary: {counts['done']} done, {counts['skipped']} skipped, "
+                f"{counts['failed']} failed."
+            )
+            summary = metrics.summary()
+            for line in format_summary(summary):
+                app_instance.log(line)
+
+        except Exception as main_e:
+            logger.exception("Distributed job failed")
+            app_instance.log(f"[Critical Error] {main_e}")
+
+        app_instance.download_finished()
+        return summary
+
+    def _wait(self, job_id, tracks, total, journal, app_instance, metrics):
+        """
+        Records results as workers finish tasks. Returns False when the job
+        was cancelled; tasks already queued still run, and the unrecorded
+        ones are picked up again (as skips) when the job is resumed.
+        """
+        is_cancelled = getattr(app_instance, "is_cancelled", None)
+        done = total - len(tracks)
+        cursor = 0
+        last_report = time.monotonic()
+        while True:
+            items, cursor = self.queue.finished(job_id, cursor)
+            for _, payload, result in items:
+                index, status = payload["index"], result["status"]
+                metrics.inc("tracks", status=status)
+                if status == "failed":
+                    metrics.inc("failures", reason=result.get("failure") or "unknown")
+                journal.record(index, status, result.get("file_path"))
+                done += 1
+                song = tracks[index]
+                worker = f" ({result['worker']})" if result.get("worker") else ""
+                app_instance.log(f"[{done}/{total}] {song.artist} - {song.name}{worker}")
+                for line in result.get("lines", []):
+                    app_instance.log(line)
+
+            finished, queued = self.queue.progress(job_id)
+            if finished >= queued:
+                return True
+            if is_cancelled and is_cancelled():
+                app_instance.log("Stopped waiting for the workers. Run the same URL again to resume it.")
+                return False
+            if time.monotonic() - last_report >= Config.PIPELINE_REPORT_SECONDS:
+                last_report = time.monotonic()
+                app_instance.log(f"[Queue] {finished}/{queued} tasks finished")
+            time.sleep(self.poll_seconds)
+
+
+class Worker:
+    """
+    Leases tasks and runs the track stages of SpotifyDownloader on them.
+    While a task runs, a heartbeat thread keeps its lease alive; a worker
+    that dies stops the heartbeat and the task is handed to another worker
+    once the lease runs out.
+    """
+
+    def __init__(self, downloader, queue, worker_id=None, lease_seconds=None, heartbeat_seconds=None,
+                 log=print):
+        self.downloader = downloader
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds or Config.TASK_LEASE_SECONDS
+        self.heartbeat_seconds = heartbeat_seconds or Config.TASK_HEARTBEAT_SECONDS
+        self.log = log
+        self.metrics = Metrics(parent=REGISTRY)
+        self._contexts = {}
+        self._spotdl_downloaders = {}
+
+    def run(self, stop=None, idle_exit=False, poll_seconds=1.0):
+        """
+        Processes tasks until `stop` is set, or until the queue is empty with
+        idle_exit. Returns the number of tasks processed.
+        """
+        self.downloader._get_spotdl()
+        processed = 0
+        while stop is None or not stop.is_set():
+            task = self.queue.lease(self.worker_id, self.lease_seconds)
+            if task is None:
+                if idle_exit:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            self.process(task)
+            processed += 1
+        return processed
+
+    def process(self, task):
+        payload = task.payload
+        track = TrackJob(payload["index"], downloader_module.Song.from_dict(payload["song"]))
+        lost = threading.Event()
+        stop_heartbeat = threading.Event()
+
+        def _heartbeat():
+            while not stop_heartbeat.wait(self.heartbeat_seconds):
+                if not self.queue.heartbeat(task.id, self.worker_id, self.lease_seconds):
+                    lost.set()
+                    return
+
+        heartbeat = threading.Thread(target=_heartbeat, name=f"heartbeat-{task.id}", daemon=True)
+        heartbeat.start()
+        try:
+            error = self._run_stages(track, payload)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        if track.status == "pending":
+            track.status = "failed"
+        result = {
+            "status": track.status, "file_path": track.file_path, "failure": track.failure,
+            "lines": track.lines, "worker": self.worker_id,
+        }
+        self.metrics.inc("tracks", status=track.status)
+        # Errors are retried on another lease; skips and misses are final
+        settle = self.queue.fail if error else self.queue.complete
+        if not settle(task.id, self.worker_id, result) or lost.is_set():
+            self.log(f"[{self.worker_id}] Lost the lease of task {task.id}; another worker took it over.")
+        else:
+            self.log(f"[{self.worker_id}] {track.status}: {track.song.artist} - {track.song.name}")
+        return result
+
+    def _run_stages(self, track, payload):
+        """
+        Runs the stages in order until one stops the track. Returns the
+        exception that stopped it, if any.
+        """
+        dl = self.downloader
+        job = self._context(payload)
+        spotdl_downloader = self._spotdl_downloader(job)
+        stages = [
+            ("metadata", lambda: dl._stage_metadata(track)),
+            ("match", lambda: dl._stage_match(track, job, spotdl_downloader)),
+            ("download", lambda: dl._stage_download(track, job, spotdl_downloader)),
+            ("classify", lambda: dl._stage_classify(track, job)),
+            ("organize", lambda: dl._stage_organize(track, job)),
+        ]
+        for name, func in stages:
+            try:
+                with self.metrics.timer("stage", stage=name):
+                    keep_going = func()
+            except Exception as e:
+                logger.debug(f"Stage {name} raised", exc_info=True)
+                track.fail(f"{name}_error", f"  > Failed ({name}) on {self.worker_id}: {e}")
+                return e
+            if not keep_going:
+                break
+        return None
+
+    def _context(self, payload):
+        key = (payload["output_folder"], payload["storage_mode"], payload["use_ai"])
+        if key not in self._contexts:
+            self._contexts[key] = JobContext(
+                payload["output_folder"], payload["storage_mode"], payload["use_ai"], {},
+                self.downloader._downloader_settings(payload["output_folder"]), self.metrics,
+            )
+        return self._contexts[key]
+
+    def _spotdl_downloader(self, job):
+        if job.output_folder not in self._spotdl_downloaders:
+            self._spotdl_downloaders[job.output_folder] = downloader_module.Downloader(
+                settings=job.downloader_settings
+            )
+        return self._spotdl_downloaders[job.output_folder]
+
+
+def main():
+    from downloader import SpotifyDownloader
+
+    parser = argparse.ArgumentParser(description="Download worker fed from a shared task queue.")
+    parser.add_argument("--queue", default=Config.TASK_QUEUE_URL, required=not Config.TASK_QUEUE_URL,
+                        help="sqlite:///path/queue.db or redis://host:port/db (default: TASK_QUEUE_URL)")
+    parser.add_argument("--worker-id", help="name in logs and leases (default: host-pid)")
+    parser.add_argument("--idle-exit", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue, max_attempts=Config.TASK_MAX_ATTEMPTS)
+    worker = Worker(SpotifyDownloader(), queue, worker_id=args.worker_id)
+    if args.queue.startswith("redis") and not Config.SHARED_LIBRARY:
+        print(f"[{worker.worker_id}] [Warning] With workers on several hosts, set SHARED_LIBRARY=true "
+              "on all of them: the library databases are not safe in WAL mode on a network disk.")
+    print(f"[{worker.worker_id}] Waiting for tasks on {args.queue}", flush=True)
+    try:
+        processed = worker.run(idle_exit=args.idle_exit)
+    except KeyboardInterrupt:
+        # The current task's lease runs out and another worker takes it
+        return
+    except Exception as e:
+        logger.exception("Worker stopped")
+        sys.exit(f"[{worker.worker_id}] [Critical Error] {e}")
+    for line in format_summary(worker.metrics.summary()):
+        print(f"[{worker.worker_id}] {line}")
+    print(f"[{worker.worker_id}] {processed} tasks processed.")
+
+
+if __name__ == "__main__":
+    main()
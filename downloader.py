@@ -1,10 +1,186 @@
 import os
 import time
 import asyncio
-from spotdl import Spotdl
-from spotdl.types.song import Song
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-from ai_optimizer import AIOptimizer
+from ai_optimizer import MODEL, PROMPT_VERSIONS, AIOptimizer
+from audio_features import AudioAnalyzer, describe, is_tie, numpy_available, pick_moment, rank_moments
+from fingerprint import FingerprintIndex, fingerprint_file
+from library_index import LibraryIndex
+from match_scorer import pick, rejected_summary, score_candidates
+from journal import FINAL_STATUSES, JobJournal
+from metrics import REGISTRY, Metrics, format_summary
+from organizer import OrganizePlan, parse_filename, scan_loose_files
+from pipeline import Pipeline, Stage
+from playlist_sync import (
+    PlaylistCache, SpotifySource, playlist_id, split_urls, stream_songs, sync_playlist, update_tracklist,
+)
+
+logger = logging.getLogger(__name__)
+
+# spotdl pulls in yt-dlp and takes seconds to import, so these are filled in
+# by _load_spotdl() on first use. Tests replace Spotdl and Downloader with fakes.
+Spotdl = None
+Downloader = None
+Song = None
+reinit_song = None
+
+
+def _load_spotdl():
+    """
+    Imports the spotdl names that are still unset.
+    """
+    global Spotdl, Downloader, Song, reinit_song
+    if Spotdl is None:
+        from spotdl import Spotdl
+    if Downloader is None:
+        from spotdl.download.downloader import Downloader
+    if Song is None:
+        from spotdl.types.song import Song
+    if reinit_song is None:
+        from spotdl.utils.search import reinit_song
+
+
+# Formats YouTube serves natively: spotdl copies or remuxes these (ffmpeg
+# -c:a copy) instead of re-encoding when the bitrate is "disable"
+REMUX_FORMATS = ("m4a", "opus")
+
+# Fields spotdl fills in with a second Spotify lookup when they are missing
+_METADATA_FIELDS = ("genres", "disc_count", "tracks_count", "track_number", "album_id", "album_artist")
+
+
+class TrackJob:
+    """
+    A single track moving through the download pipeline.
+    """
+
+    def __init__(self, index, song):
+        self.index = index
+        self.song = song
+        self.status = "pending"
+        self.file_path = None
+        self.label = None
+        self.failure = None
+        self.lines = []
+
+    def fail(self, reason, line):
+        self.status = "failed"
+        self.failure = reason
+        self.lines.append(line)
+
+
+class JobContext:
+    """
+    Settings shared by every track of one run.
+    """
+
+    def __init__(self, output_folder, storage_mode, use_ai, labels, downloader_settings, metrics,
+                 report=None):
+        self.output_folder = output_folder
+        self.storage_mode = storage_mode
+        self.use_ai = use_ai
+        self.labels = labels
+        self.downloader_settings = downloader_settings
+        self.metrics = metrics
+        # report(track, status) updates the track's row in the UI
+        self.report = report
+
+
+class Listing:
+    """
+    How many songs a job has listed, for the [done/total] progress lines.
+    """
+
+    def __init__(self, total, complete=True):
+        self.total = total
+        self.complete = complete
+
+    def progress_total(self):
+        return str(self.total) if self.complete else f"{self.total}+"
+
+
+class PlaylistStream(Listing):
+    """
+    The songs of a streaming job, arriving page by page. tracks() reads the
+    remaining pages, journals and displays each one and yields its tracks,
+    so the pipeline can download page 1 while page 2 is still loading.
+    """
+
+    def __init__(self, url, pages, journal, app_instance, metrics, songs, tracklist_path,
+                 cache=None, snapshot=None):
+        super().__init__(len(songs), complete=False)
+        self.url = url
+        self.pages = pages
+        self.journal = journal
+        self.app = app_instance
+        self.metrics = metrics
+        self.songs = list(songs)
+        self.known = {getattr(song, "song_id", None) for song in songs}
+        self.tracklist_path = tracklist_path
+        self.cache = cache
+        self.snapshot = snapshot
+        # A page read before tracks() started, still to be added
+        self.pending = []
+
+    def add(self, songs):
+        """
+        Journals and displays the songs not seen yet. Returns their TrackJobs.
+        """
+        new_songs = []
+        for song in songs:
+            song_id = getattr(song, "song_id", None)
+            if song_id is not None:
+                if song_id in self.known:
+                    continue
+                self.known.add(song_id)
+            new_songs.append(song)
+        indexes = self.journal.add_tracks([song.json for song in new_songs])
+        self.songs.extend(new_songs)
+        self.total = len(self.songs)
+        if new_songs:
+            try:
+                if hasattr(self.app, "append_playlist"):
+                    self.app.append_playlist(new_songs)
+                else:
+                    self.app.show_playlist(list(self.songs))
+            except Exception:
+                # Only the display: the tracks are journaled and downloaded anyway
+                logger.warning("Could not show the new playlist page", exc_info=True)
+        return [TrackJob(index, song) for index, song in zip(indexes, new_songs)]
+
+    def tracks(self, on_page=None):
+        """
+        Yields the TrackJobs of every remaining page. on_page(tracks) runs for
+        each page before its tracks are yielded.
+        """
+        try:
+            batch = self.add(self.pending)
+            while True:
+                if batch:
+                    if on_page:
+                        on_page(batch)
+                    yield from batch
+                with self.metrics.timer("step", step="spotify_fetch"):
+                    page = next(self.pages, None)
+                if page is None:
+                    break
+                batch = self.add(page[1])
+        except Exception as e:
+            logger.exception("Fetching a playlist page failed")
+            self.metrics.inc("failures", reason="playlist_fetch")
+            self.app.log(f"[Error] Failed to fetch the next playlist page: {e}")
+            return
+
+        self.complete = True
+        self.journal.mark_listed()
+        update_tracklist(self.tracklist_path, self.url, self.songs)
+        if self.cache is not None:
+            self.cache.save(self.url, self.snapshot, self.songs)
+        self.app.log(f"Playlist fetched: {self.total} songs. Tracklist saved to: {self.tracklist_path}")
+
 
 class SpotifyDownloader:
     def __init__(self):
@@ -13,12 +189,79 @@ class SpotifyDownloader:
         self.client_id = Config.SPOTIFY_CLIENT_ID or ""
         self.client_secret = Config.SPOTIFY_CLIENT_SECRET or ""
         self.ai = AIOptimizer()
+        # spotdl's Spotify client can only be initialized once per process,
+        # so a single Spotdl is shared by every job run through this instance.
+        self._spotdl = None
+        self._spotdl_lock = threading.Lock()
+        # One library index per output folder, shared by the jobs writing to it
+        self._indexes = {}
+        self._fingerprints = {}
+        self._indexes_lock = threading.Lock()
+        self._analyzer = None
+        self.playlist_cache = PlaylistCache(Config.PLAYLIST_CACHE_DIR)
+        self.playlist_source = SpotifySource()
+
+    def _downloader_settings(self, output_folder):
+        """
+        Per-job spotdl settings. The output template is absolute so jobs never
+        depend on the process working directory.
+        """
+        output_format, bitrate = Config.OUTPUT_FORMAT, Config.OUTPUT_BITRATE
+        if Config.NO_TRANSCODE:
+            # Only AAC and Opus sources can be kept as they are
+            if output_format not in REMUX_FORMATS:
+                output_format = "m4a"
+            bitrate = "disable"
+        return {
+            "simple_tui": True,
+            "ffmpeg": "ffmpeg", # assume on path
+            "bitrate": bitrate,
+            "format": output_format,
+            "output": os.path.join(output_folder, "{artist} - {title}.{output-ext}"),
+        }
+
+    def _get_spotdl(self):
+        """
+        Returns the shared Spotdl instance, creating it on first use.
+        """
+        with self._spotdl_lock:
+            if self._spotdl is None:
+                _load_spotdl()
+                # fix: spotdl requires an event loop in the thread
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                self._spotdl = Spotdl(
+                    client_id=self.client_id,
+                    client_secret=self.client_secret,
+                    downloader_settings=self._downloader_settings(os.getcwd()),
+                    loop=loop,
+                )
+            return self._spotdl
+
+    def get_library_index(self, output_folder):
+        """
+        Returns the library index for an output folder, opening and refreshing
+        it on first use.
+        """
+        output_folder = os.path.abspath(output_folder)
+        with self._indexes_lock:
+            index = self._indexes.get(output_folder)
+            if index is None:
+                os.makedirs(output_folder, exist_ok=True)
+                index = LibraryIndex(output_folder)
+                index.refresh()
+                self._indexes[output_folder] = index
+            return index
 
     def run(self, url, output_folder, use_ai, app_instance):
         """
         Main execution flow.
+        Returns the job's metrics summary (see Metrics.summary), or None when
+        the job stopped before processing any track.
         """
         app_instance.log(f"Starting process for: {url}")
+        metrics = Metrics(parent=REGISTRY)
+        summary = None
 
         if not (Config.SPOTIFY_CLIENT_ID and Config.SPOTIFY_CLIENT_SECRET):
             app_instance.log(
@@ -28,212 +271,759 @@ class SpotifyDownloader:
             app_instance.download_finished()
             return
         
-        # fix: spotdl requires an event loop in the thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Initialize spotdl with optimal settings for audio INSIDE the thread loop
-        spotdl = Spotdl(
-            client_id=self.client_id,
-            client_secret=self.client_secret,
-            downloader_settings={
-                "simple_tui": True,
-                "ffmpeg": "ffmpeg", # assume on path
-                "bitrate": "320k",
-                "format": "mp3",
-            }
-        )
-        
         try:
-            # 0. Change working directory or setup output path
+            spotdl = self._get_spotdl()
+
+            # 0. Setup output path
+            output_folder = os.path.abspath(output_folder)
             if not os.path.exists(output_folder):
                 os.makedirs(output_folder)
-            
-            # 1. Fetch Songs
-            app_instance.log("Fetching song metadata from Spotify...")
-            try:
-                songs = spotdl.search([url])
-            except Exception as e:
-                app_instance.log(f"[Error] Failed to fetch playlist: {e}")
-                app_instance.download_finished()
-                return
 
-            app_instance.log(f"Found {len(songs)} songs.")
-            try:
-                app_instance.show_playlist(songs)
-            except Exception:
-                pass
-
-            # 2. Ask storage mode (AI assistant prompt handled by UI)
-            storage_mode = app_instance.request_storage_mode(len(songs))
-            app_instance.log(f"Storage mode selected: {storage_mode}")
-
-            # 3. Save Tracklist
-            tracklist_path = os.path.join(output_folder, "tracklist.txt")
-            with open(tracklist_path, "w", encoding="utf-8") as f:
-                f.write(f"Source: {url}\n")
-                f.write("-" * 30 + "\n")
-                for i, song in enumerate(songs, 1):
-                    f.write(f"{i}. {song.artist} - {song.name}\n")
-            app_instance.log(f"Tracklist saved to: {tracklist_path}")
-
-            # 4. Download Loop
-            spotdl.downloader.output = os.path.join(output_folder, "{artist} - {title}.{output-ext}")
+            # Pick up anything added or removed since the last job
+            with metrics.timer("step", step="library_refresh"):
+                self.get_library_index(output_folder).refresh()
+            if Config.FINGERPRINT_DEDUP:
+                with metrics.timer("step", step="fingerprint_refresh"):
+                    self._refresh_fingerprints(output_folder, app_instance)
             
+            # 1. Resume an interrupted job for this URL, or fetch the songs
+            journal = JobJournal.for_url(output_folder, url)
+            stream = None
+            if journal.resumable() and journal.listed:
+                songs, storage_mode = self._resume_songs(journal, app_instance)
+            elif self._should_stream(url, journal):
+                # Songs arrive page by page; downloads start with the first page
+                stream = self._open_stream(spotdl, url, output_folder, journal, app_instance, metrics)
+                if stream is None:
+                    app_instance.download_finished()
+                    return
+                songs, storage_mode = list(stream.songs), journal.storage_mode
+            else:
+                fetched = self._fetch_songs(spotdl, url, output_folder, journal, app_instance, metrics)
+                if fetched is None:
+                    app_instance.download_finished()
+                    return
+                songs, storage_mode = fetched
+
+            cache_before = self.ai.cache_stats()
+            ai_before = self._ai_client_stats()
+            # Only the tracks not already done or skipped in the journal
+            remaining = set(journal.remaining())
+            tracks = [TrackJob(i, song) for i, song in enumerate(songs, 1) if i in remaining]
+
+            track_status = getattr(app_instance, "track_status", None)
+
+            def _report(track, status):
+                if track_status:
+                    try:
+                        track_status(track.song, status)
+                    except Exception:
+                        # Only the display: the track itself carries on
+                        logger.warning(f"Could not show status {status}", exc_info=True)
+
+            # Tracks a resumed job already finished keep their status in the list
             for i, song in enumerate(songs, 1):
-                display_name = f"{song.artist} - {song.name}"
-                app_instance.log(f"[{i}/{len(songs)}] Processing: {display_name}")
-
-                try:
-                    # AI OPTIMIZATION
-                    if use_ai and self.ai.enabled:
-                        app_instance.log(f"  > Asking AI for best audio version...")
-                        search_query = self.ai.refine_search_query(song.artist, song.name)
-                        
-                        if search_query != display_name:
-                            app_instance.log(f"  > AI suggested searching for: '{search_query}'")
-                            
-                        # Manually search using the new query to find the download link
-                        # spotdl.search returns a list of Songs, but we need to re-match this song object 
-                        # to a specific URL if we want to change the query.
-                        # However, spotdl's `download` function usually takes Song objects.
-                        # We will update the song object's search query if possible or re-search found youtube result.
-                        
-                        # A better approach with spotdl library:
-                        # SpotDL finds the download url internally. We can override the download_url if we find a better one.
-                        # Or simpler: let spotdl find what it finds, then ASK AI if it's bad.
-                        
-                        # Let's try the validation approach first as it's safer than overriding spotdl internals manually 
-                        # without deeper integration.
-                        # Wait, user wants "best version".
-                        
-                        # Re-assigning the search query in the song object might work if spotdl hasn't searched yet.
-                        # But spotdl searches on download.
-                        
-                        # We can use spotdl's functionality to search for the song on YouTube with our custom query
-                        # But song object is from Spotify.
-                        
-                        # Strategy: valid_match logic
-                        # 1. Let spotdl find a url.
-                        # 2. Check title.
-                        # 3. If bad, search manually? That's complex.
-                        
-                        # Simpler Strategy for this MVP:
-                        # Use the AI refined query to specificy what we want, but SpotDL is designed to take Spotify Metadata.
-                        # We will trust SpotDL's matching for now but use AI to VALIDATE.
-                        # Actually, we can just update the song.name to include searching params? No that ruins tags.
-                        pass
-
-                    # Step: Download
-                    # we download one by one to allow logging
-                    # spotdl returns (song, path) or None
-                    
-                    # We can pass the song object directly.
-                    # To effectively use the AI query, we would need to manually search yt-dlp.
-                    # BUT `spotdl` is good. Let's rely on it, possibly verifying the filename/title.
-                    
-                        
-                    # Step: Deduplication Check
-                    exists, existing_path = self.check_file_exists(output_folder, song.name, song.artist)
-                    if exists:
-                        app_instance.log(f"  > Skipped: Already exists at {os.path.basename(os.path.dirname(existing_path))}/{os.path.basename(existing_path)}")
-                        continue
-
-                    # Step: Download
-                    app_instance.log("  > Downloading...")
-                    
-                    # spotdl.download_song returns match_url usually
-                    # ensure we are in the right directory
-                    original_cwd = os.getcwd()
-                    os.chdir(output_folder)
-                    
-                    results = spotdl.download_songs([song])
-                    download_result = results[0] if results else None
-                    
-                    os.chdir(original_cwd)
-                    
-                    
-                    if download_result:
-                        # spotdl returns (song, path)
-                        _, path_obj = download_result
-                        file_path = str(path_obj)
-                        # Ensure we have the full path since we changed directory back
-                        if not os.path.isabs(file_path):
-                            file_path = os.path.join(output_folder, file_path)
-                    
-                        filename = os.path.basename(file_path)
-                        app_instance.log(f"  > Downloaded: {filename}")
-                        
-                        # ORGANIZING
-                        if storage_mode == "set":
-                            moment = "Set"
-                            if use_ai and self.ai.enabled:
-                                app_instance.log("  > AI identifying set moment...")
-                                moment = self.ai.detect_set_moment(song.artist, song.name)
-                                app_instance.log(f"  > Set moment detected: {moment}")
-
-                            target_folder = os.path.join(output_folder, moment)
-                        else:
-                            genre = "Unsorted"
-                            if use_ai and self.ai.enabled:
-                                app_instance.log("  > AI identifying genre...")
-                                genre = self.ai.detect_genre(song.artist, song.name)
-                                app_instance.log(f"  > Genre detected: {genre}")
-
-                            target_folder = os.path.join(output_folder, genre)
-
-                        if not os.path.exists(target_folder):
-                            os.makedirs(target_folder)
-                            
-                        # Move File
-                        new_path = os.path.join(target_folder, filename)
-                        try:
-                            # If file exists, rename
-                            if os.path.exists(new_path):
-                                base, ext = os.path.splitext(filename)
-                                new_path = os.path.join(target_folder, f"{base}_{int(time.time())}{ext}")
-                                
-                            os.rename(file_path, new_path)
-                            folder_name = os.path.basename(target_folder)
-                            app_instance.log(f"  > Organized to: {folder_name}/{os.path.basename(new_path)}")
-                        except Exception as move_err:
-                            app_instance.log(f"  > Failed to move file: {move_err}")
-
-                    else:
-                        app_instance.log(f"  > Skipped (already exists).")
-                        
-                except Exception as e:
-                    app_instance.log(f"  > Failed: {e}")
+                if i not in remaining and journal.statuses.get(i):
+                    _report(TrackJob(i, song), journal.statuses[i])
+
+            # 4. Classify the tracks we still need, many per AI request.
+            # This runs in the background so downloads start right away; workers
+            # only wait for it when they are ready to organize a file.
+            labels = {}
+            classifier = None
+            analyze = storage_mode == "set" and self._audio_analysis(app_instance)
+            # Set moments come from the audio then; the AI only breaks ties
+            if use_ai and self.ai.enabled and not analyze:
+                classifier = ThreadPoolExecutor(max_workers=1)
+
+            def _classify(batch):
+                if classifier is None:
+                    return
+                with metrics.timer("step", step="dedup"):
+                    pending = [
+                        track for track in batch
+                        if not self.check_file_exists(
+                            output_folder, track.song.name, track.song.artist,
+                            getattr(track.song, "song_id", None),
+                        )[0]
+                    ]
+                if pending:
+                    app_instance.log(f"AI classifying {len(pending)} tracks in batches...")
+                    future = classifier.submit(
+                        metrics.timed("step", self._classify_tracks, step="ai_batch_classify"),
+                        pending, storage_mode,
+                    )
+                    for track in pending:
+                        labels[track.index] = future
+
+            _classify(tracks)
+
+            # 5. Track Pipeline
+            # metadata -> match -> download -> classify -> organize, each stage with
+            # its own workers and a bounded queue in front of it.
+            job = JobContext(
+                output_folder, storage_mode, use_ai, labels,
+                self._downloader_settings(output_folder), metrics, _report,
+            )
+            listing = stream or Listing(len(songs))
+            done = [len(songs) - len(tracks)]
+            done_lock = threading.Lock()
+
+            def _on_done(track):
+                if track.status == "pending":
+                    if pipeline.cancelled.is_set():
+                        # Never started; stays pending in the journal for a resume
+                        return
+                    track.status = "failed"
+                metrics.inc("tracks", status=track.status)
+                if track.status == "failed":
+                    metrics.inc("failures", reason=track.failure or "unknown")
+                # Keep each track's lines together in the log
+                journal.record(track.index, track.status, track.file_path)
+                _report(track, track.status)
+                with done_lock:
+                    done[0] += 1
+                    app_instance.log(f"[{done[0]}/{listing.progress_total()}] {track.song.artist} - {track.song.name}")
+                    for line in track.lines:
+                        app_instance.log(line)
+
+            def _on_error(stage, track, error):
+                track.fail(f"{stage.name}_error", f"  > Failed ({stage.name}): {error}")
+
+            pipeline = self._build_pipeline(job, _on_done, _on_error)
+            app_instance.log(
+                "Pipeline workers: "
+                + ", ".join(f"{stage.name}={stage.workers}" for stage in pipeline.stages)
+            )
+            if stream is None:
+                pipeline.start(iter(tracks))
+            else:
+                pipeline.start(itertools.chain(tracks, stream.tracks(_classify)))
+            is_cancelled = getattr(app_instance, "is_cancelled", None)
+            last_report = time.monotonic()
+            while not pipeline.wait(1):
+                if is_cancelled and is_cancelled() and not pipeline.cancelled.is_set():
+                    app_instance.log("Cancelling: finishing the tracks already in progress...")
+                    pipeline.cancel()
+                if time.monotonic() - last_report >= Config.PIPELINE_REPORT_SECONDS:
+                    last_report = time.monotonic()
+                    app_instance.log(f"[Pipeline] {pipeline.format_stats()}")
+            app_instance.log(f"[Pipeline] {pipeline.format_stats()}")
+
+            if classifier is not None:
+                classifier.shutdown(wait=False)
+            if pipeline.cancelled.is_set():
+                app_instance.log("Job cancelled. Run the same URL again to resume it.")
+            elif not journal.listed:
+                app_instance.log("The playlist was not fetched completely. Run the same URL again to resume it.")
+            else:
+                journal.finish()
+            # Failed tracks stay pending in the playlist cache for the next sync
+            self.playlist_cache.mark_downloaded(url, [
+                journal.tracks[index].get("song_id") for index, status in journal.statuses.items()
+                if status in FINAL_STATUSES
+            ])
+            counts = journal.counts()
+            app_instance.log(
+                f"Job summary: {counts['done']} done, {counts['skipped']} skipped, "
+                f"{counts['failed']} failed."
+            )
+
+            self._record_ai_stats(metrics, cache_before, ai_before)
+            summary = metrics.summary()
+            for line in format_summary(summary):
+                app_instance.log(line)
 
         except Exception as main_e:
             app_instance.log(f"[Critical Error] {main_e}")
         
         app_instance.download_finished()
+        return summary
+
+    def _should_stream(self, url, journal):
+        """
+        Streams a partly fetched streaming job (to fetch the rest) and, with
+        STREAMING_FETCH on, URL sets and playlists that are not cached yet.
+        The journal given here is never a resumable, fully listed one.
+        """
+        if journal.resumable():
+            return True
+        if not Config.STREAMING_FETCH:
+            return False
+        return len(split_urls(url)) > 1 or not self.playlist_cache.has(url)
+
+    def _resume_songs(self, journal, app_instance):
+        """
+        Songs and storage mode of an interrupted, fully listed job.
+        """
+        songs = [Song.from_dict(data) for _, data in sorted(journal.tracks.items())]
+        counts = journal.counts()
+        app_instance.log(
+            f"Resuming previous job: {len(journal.remaining())} of {len(songs)} tracks left "
+            f"({counts['done']} done, {counts['skipped']} skipped, {counts['failed']} failed)."
+        )
+        try:
+            app_instance.show_playlist(songs)
+        except Exception:
+            logger.warning("Could not show the resumed playlist", exc_info=True)
+        app_instance.log(f"Storage mode: {journal.storage_mode}")
+        return songs, journal.storage_mode
+
+    def _fetch_songs(self, spotdl, url, output_folder, journal, app_instance, metrics):
+        """
+        Fetches the whole playlist, asks the storage mode, saves the tracklist
+        and starts the journal. Returns (songs to process, storage mode), or
+        None when there is nothing to do.
+        """
+        app_instance.log("Fetching song metadata from Spotify...")
+        try:
+            with metrics.timer("step", step="spotify_fetch"):
+                sync = sync_playlist(spotdl, url, self.playlist_cache, self.playlist_source)
+        except Exception as e:
+            logger.exception("Fetching the playlist failed")
+            metrics.inc("failures", reason="playlist_fetch")
+            app_instance.log(f"[Error] Failed to fetch playlist: {e}")
+            return None
+
+        app_instance.log(f"Found {len(sync.songs)} songs.")
+        if sync.snapshot_unchanged:
+            app_instance.log("Playlist unchanged since the last sync, using cached metadata.")
+        elif sync.cached:
+            app_instance.log(f"{len(sync.new_songs)} new since the last sync.")
+        if sync.retry_songs:
+            app_instance.log(f"{len(sync.retry_songs)} not downloaded by the last sync, trying them again.")
+        if sync.removed_songs and Config.REPORT_REMOVED_TRACKS:
+            app_instance.log(f"{len(sync.removed_songs)} removed from the playlist since the last sync:")
+            for song in sync.removed_songs:
+                app_instance.log(f"  - {song.artist} - {song.name}")
+        try:
+            app_instance.show_playlist(sync.songs)
+        except Exception:
+            logger.warning("Could not show the playlist", exc_info=True)
+
+        # Incremental sync only processes what was added since last time,
+        # plus what the last sync failed to download
+        incremental = Config.INCREMENTAL_SYNC and sync.cached
+        songs = sync.retry_songs + sync.new_songs if incremental else sync.songs
+        if incremental and not songs:
+            app_instance.log("Playlist is up to date, nothing new to download.")
+            return None
+
+        # Ask storage mode (AI assistant prompt handled by UI)
+        storage_mode = app_instance.request_storage_mode(len(songs))
+        if storage_mode is None:
+            app_instance.log("Job cancelled before a storage mode was chosen.")
+            return None
+        app_instance.log(f"Storage mode selected: {storage_mode}")
+
+        # Save Tracklist
+        tracklist_path = os.path.join(output_folder, "tracklist.txt")
+        update_tracklist(
+            tracklist_path, url, sync.songs,
+            new_songs=sync.new_songs if incremental else None,
+            removed_songs=sync.removed_songs if Config.REPORT_REMOVED_TRACKS else None,
+        )
+        app_instance.log(f"Tracklist saved to: {tracklist_path}")
+
+        journal.start(url, storage_mode, [song.json for song in songs])
+        return songs, storage_mode
+
+    def _open_stream(self, spotdl, url, output_folder, journal, app_instance, metrics):
+        """
+        Starts a streaming fetch: reads the first page, asks the storage mode
+        and starts the journal with it (or picks up a partly fetched journal).
+        Returns a PlaylistStream, or None when there is nothing to download.
+        """
+        urls = split_urls(url)
+        single_playlist = len(urls) == 1 and playlist_id(urls[0])
+        app_instance.log("Fetching song metadata from Spotify page by page...")
+        try:
+            with metrics.timer("step", step="spotify_fetch"):
+                snapshot = self.playlist_source.snapshot(url) if single_playlist else None
+                pages = stream_songs(spotdl, urls, self.playlist_source)
+                first = next(pages, None)
+        except Exception as e:
+            logger.exception("Fetching the first playlist page failed")
+            metrics.inc("failures", reason="playlist_fetch")
+            app_instance.log(f"[Error] Failed to fetch playlist: {e}")
+            return None
+
+        songs = [Song.from_dict(data) for _, data in sorted(journal.tracks.items())]
+        stream = PlaylistStream(
+            url, pages, journal, app_instance, metrics, songs,
+            os.path.join(output_folder, "tracklist.txt"),
+            cache=self.playlist_cache if single_playlist else None, snapshot=snapshot,
+        )
+        first_songs = first[1] if first else []
+
+        if journal.resumable():
+            app_instance.log(
+                f"Resuming previous job: {len(journal.remaining())} of {len(songs)} listed tracks left, "
+                "fetching the rest of the playlist."
+            )
+            try:
+                app_instance.show_playlist(songs)
+            except Exception:
+                logger.warning("Could not show the resumed playlist", exc_info=True)
+            app_instance.log(f"Storage mode: {journal.storage_mode}")
+            stream.pending = first_songs
+            return stream
+
+        if not first_songs:
+            app_instance.log("No songs found.")
+            return None
+
+        try:
+            app_instance.show_playlist(first_songs)
+        except Exception:
+            logger.warning("Could not show the first playlist page", exc_info=True)
+        storage_mode = app_instance.request_storage_mode(first[2] if len(urls) == 1 else None)
+        if storage_mode is None:
+            app_instance.log("Job cancelled before a storage mode was chosen.")
+            return None
+        app_instance.log(f"Storage mode selected: {storage_mode}")
+        journal.start(url, storage_mode, [], streaming=True)
+        # Already on screen, so journal the first page without displaying it again
+        indexes = journal.add_tracks([song.json for song in first_songs])
+        stream.songs = list(first_songs)
+        stream.known = {getattr(song, "song_id", None) for song in first_songs}
+        stream.total = len(indexes)
+        return stream
 
-    def check_file_exists(self, output_folder, song_name, artist):
+    def _classify_tracks(self, tracks, storage_mode):
         """
-        Recursively checks if a song already exists in the output folder or any subfolder.
+        Batch-classifies tracks. Returns {track.index: label}.
+        """
+        found = self.ai.classify_batch([(t.song.artist, t.song.name) for t in tracks], kind=storage_mode)
+        return {track.index: label for track, label in zip(tracks, found)}
+
+    def _build_pipeline(self, job, on_done, on_error):
+        """
+        Wires the per-track stages for one job. Match and download workers each
+        own a spotdl Downloader (and event loop) built with the job's settings.
+        """
+        local = threading.local()
+
+        def _init_downloader():
+            local.downloader = Downloader(settings=job.downloader_settings)
+
+        stages = [
+            Stage("metadata", self._stage_metadata, Config.METADATA_WORKERS),
+            Stage("match", lambda track: self._stage_match(track, job, local.downloader),
+                  Config.MATCH_WORKERS, _init_downloader),
+            Stage("download", lambda track: self._stage_download(track, job, local.downloader),
+                  Config.DOWNLOAD_WORKERS, _init_downloader),
+            Stage("classify", lambda track: self._stage_classify(track, job), Config.CLASSIFY_WORKERS),
+            Stage("organize", lambda track: self._stage_organize(track, job), Config.ORGANIZE_WORKERS),
+        ]
+        for stage in stages:
+            stage.func = job.metrics.timed("stage", stage.func, stage=stage.name)
+        return Pipeline(stages, on_done, on_error, queue_size=Config.PIPELINE_QUEUE_SIZE)
+
+    def _stage_metadata(self, track):
+        """
+        Completes partial Spotify metadata (playlist entries lack album details)
+        so the download stage does not have to.
+        """
+        song = track.song
+        if getattr(song, "url", None) and any(
+            getattr(song, field, None) is None for field in _METADATA_FIELDS
+        ):
+            track.song = reinit_song(song)
+        return True
+
+    def _stage_match(self, track, job, downloader):
+        """
+        Dedup check, then finds the download URL for the track.
+        """
+        song = track.song
+        display_name = f"{song.artist} - {song.name}"
+
+        # AI OPTIMIZATION
+        # spotdl does its own matching from the Spotify metadata, so for now the
+        # refined query is only reported; MATCH_SCORING checks the candidates instead.
+        if job.use_ai and self.ai.enabled:
+            with job.metrics.timer("step", step="ai_refine"):
+                search_query = self.ai.refine_search_query(song.artist, song.name)
+            if search_query != display_name:
+                track.lines.append(f"  > AI suggested searching for: '{search_query}'")
+
+        # Step: Deduplication Check
+        with job.metrics.timer("step", step="dedup"):
+            exists, existing_path = self.check_file_exists(
+                job.output_folder, song.name, song.artist, getattr(song, "song_id", None)
+            )
+        if exists:
+            track.status = "skipped"
+            track.lines.append(f"  > Skipped: Already exists at {os.path.basename(os.path.dirname(existing_path))}/{os.path.basename(existing_path)}")
+            return False
+
+        if getattr(song, "download_url", None) is None:
+            if Config.MATCH_SCORING:
+                return self._match_by_score(track, job, downloader)
+            with job.metrics.timer("step", step="youtube_search"):
+                song.download_url = downloader.search(song)
+        return True
+
+    def _match_candidates(self, downloader, song):
+        """
+        Results of spotdl's first audio provider for the track: the ISRC
+        lookup and the title searches spotdl's own matching runs. Empty when
+        the downloader has no providers to ask.
+        """
+        providers = getattr(downloader, "audio_providers", None)
+        if not providers:
+            return []
+        provider = providers[0]
+        found = []
+        if getattr(song, "isrc", None) and provider.SUPPORTS_ISRC:
+            found.extend(provider.get_results(song.isrc))
+        artists = getattr(song, "artists", None) or [song.artist]
+        query = f"{', '.join(artists)} - {song.name}".lower()
+        for options in provider.GET_RESULTS_OPTS:
+            found.extend(provider.get_results(query, **options))
+
+        candidates, seen = [], set()
+        for result in found:
+            if result.url not in seen:
+                seen.add(result.url)
+                candidates.append(result)
+        return candidates
+
+    def _match_by_score(self, track, job, downloader):
+        """
+        Picks the download URL with match_scorer. A clear winner is taken,
+        ambiguous candidates go to the AI in one call, and a track whose
+        candidates are all rejected fails rather than downloading the wrong
+        version. Without candidates, spotdl's own search decides.
+        """
+        song = track.song
+        with job.metrics.timer("step", step="youtube_search"):
+            candidates = self._match_candidates(downloader, song)
+            if not candidates:
+                song.download_url = downloader.search(song)
+                return True
+
+        with job.metrics.timer("step", step="match_scoring"):
+            matches = score_candidates(
+                song.name, getattr(song, "artists", None) or [song.artist], getattr(song, "duration", None),
+                candidates,
+            )
+            verdict, picked = pick(matches)
+        rejected = rejected_summary(matches)
+        if rejected:
+            track.lines.append(f"  > Rejected candidates: {rejected}")
+        if verdict == "none":
+            track.fail("no_match", "  > No match: no candidate looks like the original.")
+            return False
+
+        if verdict == "ambiguous":
+            if job.use_ai and self.ai.enabled:
+                with job.metrics.timer("step", step="ai_validate"):
+                    approved = self.ai.validate_matches(
+                        f"{song.artist} - {song.name}", [match.candidate.name for match in picked]
+                    )
+                picked = [match for match, ok in zip(picked, approved) if ok]
+                if not picked:
+                    track.fail("no_match", "  > No match: the AI rejected every close candidate.")
+                    return False
+            picked = picked[0]
+        song.download_url = picked.candidate.url
+        track.lines.append(f"  > Match: {picked.candidate.name} (score {picked.score:.2f})")
+        return True
+
+    def _stage_download(self, track, job, downloader):
+        # spotdl returns (song, path), path is None when nothing was downloaded.
+        # The time includes spotdl's ffmpeg transcode, which it runs internally.
+        if job.report:
+            job.report(track, "downloading")
+        with job.metrics.timer("step", step="download_transcode"):
+            _, path_obj = downloader.search_and_download(track.song)
+        if not path_obj:
+            # Nothing downloaded (no match, provider error...), retried on resume
+            track.fail("no_file", "  > Download failed: no file was produced.")
+            return False
+
+        file_path = str(path_obj)
+        if not os.path.isabs(file_path):
+            file_path = os.path.join(job.output_folder, file_path)
+        track.file_path = file_path
+        try:
+            job.metrics.inc("downloaded_bytes", os.path.getsize(file_path))
+        except OSError:
+            pass
+        track.lines.append(f"  > Downloaded: {os.path.basename(file_path)}")
+
+        if Config.FINGERPRINT_DEDUP:
+            # Same recording already in the library under another name
+            fingerprints = self.get_fingerprint_index(job.output_folder)
+            with job.metrics.timer("step", step="fingerprint"):
+                fp = fingerprint_file(file_path)
+            duplicate = fp and fingerprints.find_duplicate(fp, exclude=[file_path])
+            if duplicate:
+                # Left in the output folder instead of organized, in case the
+                # match is wrong; organize leaves it there too
+                duplicate = os.path.relpath(duplicate, job.output_folder)
+                logger.info(f"Not organizing {file_path}: same recording as {duplicate}")
+                track.status = "skipped"
+                track.lines.append(
+                    f"  > Skipped: same recording as {duplicate}, left unorganized as "
+                    f"{os.path.basename(file_path)}"
+                )
+                return False
+            fingerprints.add(file_path, fp)
+        return True
+
+    def _stage_classify(self, track, job):
+        """
+        Picks the genre / set moment folder, preferring the batch answer.
+        """
+        song = track.song
+        label = None
+        future = job.labels.get(track.index)
+        if future is not None:
+            try:
+                label = future.result().get(track.index)
+            except Exception as e:
+                logger.warning("Batch classification failed for %s - %s", song.artist, song.name, exc_info=True)
+                track.lines.append(f"  > Batch classification failed: {e}")
+
+        if job.storage_mode == "set":
+            features = None
+            if self._audio_analysis():
+                with job.metrics.timer("step", step="audio_analysis"):
+                    features = self.get_audio_analyzer().analyze(track.file_path)
+                self._keep_fingerprint(job.output_folder, track.file_path)
+            if features is not None:
+                tiebreak = None
+                if job.use_ai and self.ai.enabled:
+                    def tiebreak():
+                        with job.metrics.timer("step", step="ai_classify"):
+                            return self.ai.detect_set_moment(song.artist, song.name)
+                track.label = pick_moment(rank_moments(features), tiebreak)
+                track.lines.append(f"  > Set moment from audio ({describe(features)}): {track.label}")
+                return True
+
+            track.label = label or "Set"
+            if job.use_ai and self.ai.enabled:
+                if not label:
+                    with job.metrics.timer("step", step="ai_classify"):
+                        track.label = self.ai.detect_set_moment(song.artist, song.name)
+                track.lines.append(f"  > Set moment detected: {track.label}")
+        else:
+            track.label = label or "Unsorted"
+            if job.use_ai and self.ai.enabled:
+                if not label:
+                    with job.metrics.timer("step", step="ai_classify"):
+                        track.label = self.ai.detect_genre(song.artist, song.name)
+                track.lines.append(f"  > Genre detected: {track.label}")
+        return True
+
+    def _stage_organize(self, track, job):
+        song = track.song
+        filename = os.path.basename(track.file_path)
+        target_folder = os.path.join(job.output_folder, track.label)
+        os.makedirs(target_folder, exist_ok=True)
+
+        # Move File
+        new_path = os.path.join(target_folder, filename)
+        try:
+            # If file exists, rename
+            if os.path.exists(new_path):
+                base, ext = os.path.splitext(filename)
+                new_path = os.path.join(target_folder, f"{base}_{int(time.time())}{ext}")
+
+            os.rename(track.file_path, new_path)
+            if Config.FINGERPRINT_DEDUP:
+                self.get_fingerprint_index(job.output_folder).move(track.file_path, new_path)
+            track.file_path = new_path
+            self.get_library_index(job.output_folder).add(
+                new_path, song.artist, song.name, getattr(song, "song_id", None)
+            )
+            track.status = "done"
+            track.lines.append(f"  > Organized to: {track.label}/{os.path.basename(new_path)}")
+        except Exception as move_err:
+            logger.warning(f"Could not organize {track.file_path}", exc_info=True)
+            track.fail("move", f"  > Failed to move file: {move_err}")
+        return True
+
+    def _ai_client_stats(self):
+        if not self.ai.enabled or self.ai.client is None:
+            return {"calls": 0, "retries": 0}
+        return self.ai.client.stats()
+
+    def _record_ai_stats(self, metrics, cache_before, ai_before):
+        """
+        Adds the AI requests and cache lookups made since the *_before
+        snapshots to the job's summary. The client and cache are shared, so
+        concurrent jobs count each other's calls; REGISTRY gets the exact
+        totals from the client and cache themselves, so this stays local.
+        """
+        cache_after = self.ai.cache_stats()
+        ai_after = self._ai_client_stats()
+        metrics.inc_local("ai_calls", ai_after["calls"] - ai_before["calls"])
+        metrics.inc_local("ai_retries", ai_after["retries"] - ai_before["retries"])
+        metrics.inc_local("ai_cache", cache_after["hits"] - cache_before["hits"], result="hit")
+        metrics.inc_local("ai_cache", cache_after["misses"] - cache_before["misses"], result="miss")
+
+    def _log_cache_stats(self, app_instance, before):
+        if not self.ai.enabled:
+            return
+        after = self.ai.cache_stats()
+        hits = after["hits"] - before["hits"]
+        misses = after["misses"] - before["misses"]
+        app_instance.log(f"AI cache: {hits} hits, {misses} misses.")
+
+    def get_fingerprint_index(self, output_folder):
+        output_folder = os.path.abspath(output_folder)
+        with self._indexes_lock:
+            index = self._fingerprints.get(output_folder)
+            if index is None:
+                os.makedirs(output_folder, exist_ok=True)
+                index = FingerprintIndex(output_folder)
+                self._fingerprints[output_folder] = index
+            return index
+
+    def _refresh_fingerprints(self, output_folder, app_instance):
+        """
+        Fingerprints the library files that are new or changed since the last
+        job (all of them the first time), on a process pool.
+        """
+        paths = self.get_library_index(output_folder).paths()
+        step = max(1, len(paths) // 10)
+
+        def _progress(done, total):
+            if done % step == 0 or done == total:
+                app_instance.log(f"[{done}/{total}] library files fingerprinted")
+
+        return self.get_fingerprint_index(output_folder).update(
+            paths, Config.FINGERPRINT_WORKERS or None, _progress
+        )
+
+    def _audio_analysis(self, app_instance=None):
+        """
+        True when set moments should come from audio analysis. Warns through
+        app_instance when it is enabled but NumPy is missing.
+        """
+        if not Config.AUDIO_ANALYSIS:
+            return False
+        if numpy_available():
+            return True
+        if app_instance is not None:
+            app_instance.log("[Warning] AUDIO_ANALYSIS needs NumPy (pip install numpy); classifying by name.")
+        return False
+
+    def get_audio_analyzer(self):
+        """
+        Returns the audio analysis process pool shared by every job.
+        """
+        with self._indexes_lock:
+            if self._analyzer is None:
+                self._analyzer = AudioAnalyzer(Config.AUDIO_ANALYSIS_WORKERS or None)
+            return self._analyzer
+
+    def _keep_fingerprint(self, output_folder, path):
+        """
+        Analysis writes tags, which changes the file's size and mtime; this
+        keeps its fingerprint from being recomputed on the next refresh.
+        """
+        if Config.FINGERPRINT_DEDUP:
+            fingerprints = self.get_fingerprint_index(output_folder)
+            fingerprints.add(path, fingerprints.get(path))
+
+    def _set_moments_from_audio(self, output_folder, files, tracks, use_ai, app_instance):
+        """
+        Set moments of loose files from their audio, analysed on the process
+        pool. Ties, and files that could not be analysed, go to the AI in
+        batches. Returns one label per file.
+        """
+        paths = [os.path.join(output_folder, filename) for filename in files]
+        step = max(1, len(paths) // 10)
+
+        def _progress(done, total):
+            if done % step == 0 or done == total:
+                app_instance.log(f"[{done}/{total}] files analysed")
+
+        app_instance.log("Analysing the audio of the tracks...")
+        found = self.get_audio_analyzer().analyze_many(paths, _progress)
+        for path in paths:
+            self._keep_fingerprint(output_folder, path)
+
+        ranked = [rank_moments(features) if features else None for features in found]
+        ask = []
+        if use_ai and self.ai.enabled:
+            ask = [i for i, ranking in enumerate(ranked) if ranking is None or is_tie(ranking)]
+        answers = {}
+        if ask:
+            app_instance.log(f"AI classifying {len(ask)} undecided tracks in batches...")
+            answers = dict(zip(ask, self.ai.classify_batch([tracks[i] for i in ask], kind="set")))
+
+        labels = []
+        for i, ranking in enumerate(ranked):
+            if ranking is None:
+                labels.append(answers.get(i, "Set"))
+            else:
+                labels.append(pick_moment(ranking, (lambda i=i: answers[i]) if i in answers else None))
+        return labels
+
+    def _drop_library_duplicates(self, output_folder, files, app_instance):
+        """
+        Loose files whose recording is already organized somewhere in the
+        library are left where they are and not planned. Returns the rest.
+        """
+        self.get_library_index(output_folder).refresh()
+        self._refresh_fingerprints(output_folder, app_instance)
+        fingerprints = self.get_fingerprint_index(output_folder)
+        loose = [os.path.join(output_folder, filename) for filename in files]
+
+        kept = []
+        for filename, path in zip(files, loose):
+            fp = fingerprints.get(path)
+            duplicate = fp and fingerprints.find_duplicate(fp, exclude=loose)
+            if duplicate:
+                app_instance.log(
+                    f"  > Left in place, same recording as {os.path.relpath(duplicate, output_folder)}: {filename}"
+                )
+            else:
+                kept.append(filename)
+        if len(kept) < len(files):
+            app_instance.log(f"{len(files) - len(kept)} loose files are already in the library.")
+        if not kept:
+            app_instance.log("Nothing left to organize.")
+        return kept
+
+    def check_file_exists(self, output_folder, song_name, artist, track_id=None):
+        """
+        Checks if a song already exists in the output folder or any subfolder.
         Returns (True, Path) or (False, None).
-        We check for the song name in the filename.
+        Looks the song up in the library index by Spotify track ID or by its
+        normalized "Artist - Name", instead of walking the folder tree.
         """
-        # Clean inputs slightly for search
-        # This is a basic check.
-        search_term = f"{artist} - {song_name}"
-        search_term = search_term.replace("/", "").replace("\\", "") # Remove path chars
-        
-        for root, dirs, files in os.walk(output_folder):
-            for file in files:
-                if file.lower().endswith(".mp3"):
-                    # Check if filename contains the song info
-                    # We compare checking if the file starts with the artist and contains the title
-                    # Or just fuzzy match the provided "Artist - Name" string
-                    if search_term.lower() in file.lower():
-                        return True, os.path.join(root, file)
+        index = self.get_library_index(output_folder)
+        path = index.lookup(artist, song_name, track_id)
+        if path:
+            return True, path
         return False, None
 
-    def organize_existing(self, output_folder, app_instance, use_ai, storage_mode="genre"):
+    def _organize_labeling(self, storage_mode, use_ai):
+        """
+        How organize_existing decides the labels with these settings, saved
+        with its plan.
+        """
+        labeling = {"use_ai": bool(use_ai and self.ai.enabled)}
+        if storage_mode == "set":
+            labeling["audio"] = self._audio_analysis()
+        if labeling["use_ai"]:
+            labeling["model"] = MODEL
+            labeling["prompt_version"] = PROMPT_VERSIONS[f"{storage_mode}_batch"]
+        return labeling
+
+    def organize_existing(self, output_folder, app_instance, use_ai, storage_mode="genre", dry_run=False):
         """
-        Scans the root output folder for MP3s and moves them to genre folders.
+        Moves the loose audio files in the root output folder into genre / set
+        moment folders, in two phases: build a move plan (one directory scan,
+        batched classification) and save it, then apply it with a worker pool.
+        An interrupted apply resumes from the saved plan. dry_run only shows it.
         """
         app_instance.log("Starting organization of existing files...")
         
@@ -242,62 +1032,98 @@ class SpotifyDownloader:
             app_instance.organization_finished()
             return
 
-        files = [f for f in os.listdir(output_folder) if f.lower().endswith(".mp3")]
-        total = len(files)
-        
-        if total == 0:
-            app_instance.log("No loose MP3 files found in the root folder.")
-            app_instance.organization_finished()
-            return
-            
-        app_instance.log(f"Found {total} files to organize.")
-        
-        for i, filename in enumerate(files, 1):
-            file_path = os.path.join(output_folder, filename)
-            
-            # Skip directories just in case
-            if not os.path.isfile(file_path):
-                continue
-                
-            app_instance.log(f"[{i}/{total}] Organizing: {filename}")
-            
-            # Guess Artist - Title from filename
-            # Standard format: Artist - Title.mp3
-            name_part = os.path.splitext(filename)[0]
-            if " - " in name_part:
-                artist, title = name_part.split(" - ", 1)
+        output_folder = os.path.abspath(output_folder)
+        cache_before = self.ai.cache_stats()
+        files = scan_loose_files(output_folder)
+        labeling = self._organize_labeling(storage_mode, use_ai)
+        plan = OrganizePlan.load(output_folder)
+        if plan and plan.storage_mode == storage_mode and plan.moves:
+            unplanned = plan.unplanned(files)
+            if plan.labeling != labeling:
+                app_instance.log("The saved plan was made with other classification settings, planning again.")
+                plan = None
+            elif unplanned:
+                app_instance.log(f"The saved plan leaves out {len(unplanned)} new files, planning again.")
+                plan = None
             else:
-                artist = "Unknown"
-                title = name_part
-                
-            # Detect Genre
-            if storage_mode == "set":
-                moment = "Set"
-                if use_ai and self.ai.enabled:
-                    moment = self.ai.detect_set_moment(artist, title)
-                target_folder = os.path.join(output_folder, moment)
+                app_instance.log(
+                    f"Using the saved plan from {time.strftime('%Y-%m-%d %H:%M', time.localtime(plan.created))} "
+                    f"({len(plan.moves)} files)."
+                )
+        else:
+            plan = None
+
+        if plan is None:
+            # Phase 1: plan
+            total = len(files)
+            if total == 0:
+                app_instance.log("No loose audio files found in the root folder.")
+                app_instance.organization_finished()
+                return
+
+            skipped = []
+            if Config.FINGERPRINT_DEDUP:
+                kept = self._drop_library_duplicates(output_folder, files, app_instance)
+                skipped = sorted(set(files) - set(kept))
+                files = kept
+                total = len(files)
+                if total == 0:
+                    app_instance.organization_finished()
+                    return
+
+            app_instance.log(f"Found {total} files to organize.")
+            tracks = [parse_filename(filename) for filename in files]
+
+            # Classify everything up front, many tracks per AI request
+            if storage_mode == "set" and self._audio_analysis(app_instance):
+                labels = self._set_moments_from_audio(output_folder, files, tracks, use_ai, app_instance)
+            elif use_ai and self.ai.enabled:
+                app_instance.log("AI classifying tracks in batches...")
+                labels = self.ai.classify_batch(tracks, kind=storage_mode)
             else:
-                genre = "Unsorted"
-                if use_ai and self.ai.enabled:
-                    genre = self.ai.detect_genre(artist, title)
-                target_folder = os.path.join(output_folder, genre)
-
-            # Move
-            if not os.path.exists(target_folder):
-                os.makedirs(target_folder)
-                
-            new_path = os.path.join(target_folder, filename)
-            
-            try:
-                if os.path.exists(new_path):
-                    # Handle Duplicate
-                    base, ext = os.path.splitext(filename)
-                    new_path = os.path.join(target_folder, f"{base}_{int(time.time())}{ext}")
-                    
-                os.rename(file_path, new_path)
-                app_instance.log(f"  > Moved to: {os.path.basename(target_folder)}/")
-            except Exception as e:
-                app_instance.log(f"  > Failed to move: {e}")
-                
+                labels = ["Set" if storage_mode == "set" else "Unsorted"] * total
+
+            plan = OrganizePlan.build(output_folder, storage_mode, files, labels, skipped, labeling)
+            plan.save()
+
+        app_instance.log(
+            "Plan: " + ", ".join(f"{label} {count}" for label, count in plan.folders().items())
+        )
+        if dry_run:
+            for move in plan.moves:
+                app_instance.log(f"  {move['src']} -> {move['dst']}")
+            app_instance.log("Dry run: nothing was moved. Organize again without dry run to apply this plan.")
+            self._log_cache_stats(app_instance, cache_before)
+            app_instance.organization_finished()
+            return
+
+        # Phase 2: apply
+        index = self.get_library_index(output_folder)
+        index.refresh()
+        step = max(1, len(plan.moves) // 20)
+
+        def _progress(done, total):
+            if done % step == 0 or done == total:
+                app_instance.log(f"[{done}/{total}] files organized")
+
+        counts = plan.apply(index, Config.ORGANIZE_APPLY_WORKERS, _progress)
+        if Config.FINGERPRINT_DEDUP:
+            # Only files now at their target: failed and missing moves keep
+            # their fingerprint where it was
+            fingerprints = self.get_fingerprint_index(output_folder)
+            for src, dst in counts["placed"]:
+                fingerprints.move(src, dst)
+        for src, error in counts["failures"]:
+            app_instance.log(f"  > Failed to move {src}: {error}")
+        app_instance.log(
+            f"Moved {counts['moved']}, already in place {counts['already']}, "
+            f"missing {counts['missing']}, failed {counts['failed']}."
+        )
+        if counts["failed"]:
+            app_instance.log("The plan was kept; organize again to retry the failed moves.")
+        else:
+            plan.discard()
+
+        self._log_cache_stats(app_instance, cache_before)
         app_instance.log("Organization Complete.")
         app_instance.organization_finished()
@@ -0,0 +1,344 @@
+"""
+Audio fingerprints for finding the same recording under different file names
+("feat." spellings, remix-name variants, "_1700000000" collision copies).
+
+The fingerprint is deliberately coarse: a WINDOW_SECONDS window at each of
+WINDOW_POSITIONS through the track is decoded with ffmpeg to mono 8 kHz PCM,
+cut into 250 ms frames, and every bit says whether a frame is louder than
+the one before. Re-encodes and volume changes keep that contour; different
+recordings share about half of the bits. Windows spread over the track tell
+apart versions that share an intro (radio edit, extended mix, remix). Two
+tracks are duplicates when their lengths are within DURATION_TOLERANCE
+seconds and at most MAX_DISTANCE of the bits differ in every window.
+
+    python fingerprint.py ~/Music/spot-downloader        # duplicate report
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise
+
+from library_index import STATE_DIR, connect_state_db
+
+SAMPLE_RATE = 8000
+FRAME = SAMPLE_RATE // 4
+WINDOW_SECONDS = 30
+# Centres of the decoded windows, as fractions of the track length
+WINDOW_POSITIONS = (0.2, 0.5, 0.8)
+# Bumped when the fingerprint changes, so stored ones are computed again
+FINGERPRINT_VERSION = "2"
+DURATION_TOLERANCE = 3.0
+MAX_DISTANCE = 0.15
+# Fewer bits than this (10 s of sound) is not enough to call two windows equal
+MIN_BITS = 40
+# Frames compared with an offset, for copies with slightly different silence
+# (the windows of a copy that is a little longer sit a little later)
+MAX_SHIFT = 4
+
+Fingerprint = namedtuple("Fingerprint", ["duration", "bits"])
+Fingerprint.__doc__ = """
+duration in seconds and the bit strings of the windows, separated by spaces.
+"""
+
+
+def signature_from_pcm(pcm):
+    """
+    Bit string ("0110...") of a signed 16-bit mono PCM buffer, leading
+    silence skipped.
+    """
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) // 2 * 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    energies = [
+        sum(s * s for s in samples[i:i + FRAME])
+        for i in range(0, len(samples) - FRAME + 1, FRAME)
+    ]
+    if not energies:
+        return ""
+    threshold = max(energies) / 100
+    start = next(i for i, energy in enumerate(energies) if energy >= threshold)
+    energies = energies[start:]
+    return "".join("1" if b > a else "0" for a, b in pairwise(energies))
+
+
+def audio_duration(path):
+    try:
+        from mutagen import File, MutagenError
+    except ImportError:
+        return None
+    try:
+        audio = File(path)
+    except (MutagenError, OSError):
+        return None
+    if audio is None or not getattr(audio.info, "length", None):
+        return None
+    return float(audio.info.length)
+
+
+def window_starts(duration):
+    """
+    Start of each window in seconds, kept inside the track. Starts are
+    whole frames, so copies whose lengths differ a little are a whole
+    number of frames apart, which distance() shifts over.
+    """
+    step = FRAME / SAMPLE_RATE
+    latest = max(0.0, duration - WINDOW_SECONDS)
+    return [int(min(latest, max(0.0, duration * position - WINDOW_SECONDS / 2)) / step) * step
+            for position in WINDOW_POSITIONS]
+
+
+def decode_window(path, start, ffmpeg="ffmpeg"):
+    """
+    Mono 16-bit PCM of WINDOW_SECONDS from `start`, or None.
+    """
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-nostdin", "-ss", str(start), "-i", path, "-t", str(WINDOW_SECONDS),
+             "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+            capture_output=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def fingerprint_file(path, ffmpeg="ffmpeg"):
+    """
+    Returns a Fingerprint, or None when the file cannot be decoded or has a
+    window with too little sound. Runs in worker processes, so it only
+    takes and returns plain data.
+    """
+    duration = audio_duration(path)
+    if duration is None:
+        return None
+    windows = []
+    for start in window_starts(duration):
+        pcm = decode_window(path, start, ffmpeg)
+        bits = signature_from_pcm(pcm) if pcm else ""
+        if len(bits) < MIN_BITS:
+            return None
+        windows.append(bits)
+    return Fingerprint(duration, " ".join(windows))
+
+
+def _window_distance(a, b):
+    best = 1.0
+    for shift in range(-MAX_SHIFT, MAX_SHIFT + 1):
+        x, y = (a[shift:], b) if shift >= 0 else (a, b[-shift:])
+        n = min(len(x), len(y))
+        if n < MIN_BITS:
+            continue
+        differing = (int(x[:n], 2) ^ int(y[:n], 2)).bit_count()
+        best = min(best, differing / n)
+    return best
+
+
+def distance(a, b):
+    """
+    Share of differing bits between two signatures in their least similar
+    window, each window at the best of a few frame offsets. 1.0 when they
+    are too short to compare or have different windows.
+    """
+    windows_a, windows_b = a.split(), b.split()
+    if not windows_a or len(windows_a) != len(windows_b):
+        return 1.0
+    return max(_window_distance(x, y) for x, y in zip(windows_a, windows_b))
+
+
+def same_recording(a, b):
+    return abs(a.duration - b.duration) <= DURATION_TOLERANCE and distance(a.bits, b.bits) <= MAX_DISTANCE
+
+
+class FingerprintIndex:
+    """
+    Fingerprints of the audio files under an output folder, kept in SQLite in
+    the state dir. A file is only decoded again when its size or mtime
+    changes; files that could not be decoded are remembered too (empty bits).
+    """
+
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(root)
+        if db_path is None:
+            state_dir = os.path.join(self.root, STATE_DIR)
+            os.makedirs(state_dir, exist_ok=True)
+            db_path = os.path.join(state_dir, "fingerprints.db")
+        self.lock = threading.Lock()
+        self.conn = connect_state_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, "
+                "duration REAL, bits TEXT NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS fingerprints_duration ON fingerprints (duration)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if not row or row[0] != FINGERPRINT_VERSION:
+                # Taken another way: every file is decoded again on the next update
+                self.conn.execute("DELETE FROM fingerprints")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (FINGERPRINT_VERSION,)
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def update(self, paths, workers=None, progress=None):
+        """
+        Fingerprints the files of `paths` that are new or changed, with a
+        process pool (workers=1 runs in this process), and forgets the rows
+        of files not in `paths`. progress(done, total) follows the decoding.
+        Returns the number of files decoded.
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        with self.lock:
+            known = {
+                path: (size, mtime)
+                for path, size, mtime in self.conn.execute("SELECT path, size, mtime FROM fingerprints")
+            }
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) != (stat.st_size, stat.st_mtime):
+                stale.append((path, stat.st_size, stat.st_mtime))
+
+        gone = set(known) - set(paths)
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM fingerprints WHERE path = ?", [(p,) for p in gone])
+        if not stale:
+            return 0
+
+        def _results():
+            if workers == 1:
+                yield from map(fingerprint_file, (path for path, _, _ in stale))
+                return
+            with ProcessPoolExecutor(max_workers=workers or None) as pool:
+                yield from pool.map(fingerprint_file, [path for path, _, _ in stale], chunksize=4)
+
+        for done, ((path, size, mtime), fp) in enumerate(zip(stale, _results()), 1):
+            self._store(path, size, mtime, fp)
+            if progress:
+                progress(done, len(stale))
+        return len(stale)
+
+    def add(self, path, fp):
+        """
+        Records the fingerprint of a file we just wrote or moved.
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self._store(path, stat.st_size, stat.st_mtime, fp)
+
+    def move(self, old_path, new_path):
+        """
+        Keeps the fingerprint of a renamed file (a rename keeps size and mtime).
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE OR REPLACE fingerprints SET path = ? WHERE path = ?",
+                (os.path.abspath(new_path), os.path.abspath(old_path)),
+            )
+
+    def _store(self, path, size, mtime, fp):
+        duration, bits = fp if fp else (None, "")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, size, mtime, duration, bits) VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime, duration, bits),
+            )
+
+    def get(self, path):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT duration, bits FROM fingerprints WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return Fingerprint(*row) if row and row[1] else None
+
+    def find_duplicate(self, fp, exclude=()):
+        """
+        Path of an existing file with the same recording as fp, or None.
+        """
+        exclude = {os.path.abspath(p) for p in exclude}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, duration, bits FROM fingerprints "
+                "WHERE bits != '' AND duration BETWEEN ? AND ?",
+                (fp.duration - DURATION_TOLERANCE, fp.duration + DURATION_TOLERANCE),
+            ).fetchall()
+        for path, duration, bits in rows:
+            if path in exclude or not os.path.exists(path):
+                continue
+            if same_recording(fp, Fingerprint(duration, bits)):
+                return path
+        return None
+
+    def clusters(self):
+        """
+        Groups of two or more files holding the same recording, each sorted
+        by path, largest groups first.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, duration, bits FROM fingerprints WHERE bits != '' ORDER BY duration"
+            ).fetchall()
+
+        parent = list(range(len(rows)))
+
+        def _find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # Rows are sorted by duration, so only a small window needs comparing
+        for i, (_, duration, bits) in enumerate(rows):
+            fp = Fingerprint(duration, bits)
+            for j in range(i + 1, len(rows)):
+                if rows[j][1] - duration > DURATION_TOLERANCE:
+                    break
+                if same_recording(fp, Fingerprint(rows[j][1], rows[j][2])):
+                    parent[_find(j)] = _find(i)
+
+        groups = {}
+        for i, (path, _, _) in enumerate(rows):
+            groups.setdefault(_find(i), []).append(path)
+        clusters = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+        return sorted(clusters, key=lambda paths: (-len(paths), paths[0]))
+
+
+def main():
+    from library_index import LibraryIndex
+
+    parser = argparse.ArgumentParser(description="Lists audio files that hold the same recording.")
+    parser.add_argument("folder", help="output folder to scan")
+    parser.add_argument("--workers", type=int, default=0, help="decoding processes (default: CPU count)")
+    args = parser.parse_args()
+
+    library = LibraryIndex(args.folder)
+    library.refresh()
+    index = FingerprintIndex(args.folder)
+    decoded = index.update(library.paths(), workers=args.workers or None)
+    clusters = index.clusters()
+    print(f"{decoded} files fingerprinted, {len(clusters)} duplicate groups.")
+    root = os.path.abspath(args.folder)
+    for paths in clusters:
+        print()
+        for path in paths:
+            print(f"  {os.path.relpath(path, root)}")
+
+
+if __name__ == "__main__":
+    main()
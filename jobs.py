@@ -0,0 +1,268 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from log_buffer import LogBuffer
+
+logger = logging.getLogger(__name__)
+
+STORAGE_MODES = ("genre", "set")
+
+
+class Job:
+    """
+    One download job with its own log, playlist and storage mode. It is the
+    app_instance handed to SpotifyDownloader.run, so everything the job
+    reports lands here and is forwarded to the scheduler's listener.
+    """
+
+    def __init__(self, job_id, url, output_folder, use_ai, storage_mode=None,
+                 log_capacity=5000, listener=None):
+        self.id = job_id
+        self.url = url
+        self.output_folder = output_folder
+        self.use_ai = use_ai
+        self.storage_mode = storage_mode if storage_mode in STORAGE_MODES else None
+        self.listener = listener
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # What the runner returned (SpotifyDownloader.run: the metrics summary)
+        self.result = None
+        self.lock = threading.Lock()
+        self.logs = LogBuffer(log_capacity)
+        self.playlist = []
+        self.storage_event = threading.Event()
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    # app_instance interface
+
+    def log(self, message):
+        with self.lock:
+            self.logs.append(message)
+            if message.startswith(("[Error]", "[Critical Error]")):
+                self.error = message
+        if self.listener:
+            self.listener.job_log(self, message)
+
+    def ai_message(self, message):
+        self.log(f"[AI] {message}")
+
+    def show_playlist(self, songs):
+        with self.lock:
+            self.playlist = [f"{s.artist} - {s.name}" for s in songs]
+        if self.listener:
+            self.listener.job_playlist(self)
+
+    def append_playlist(self, songs):
+        lines = [f"{s.artist} - {s.name}" for s in songs]
+        with self.lock:
+            self.playlist.extend(lines)
+        if self.listener:
+            self.listener.job_playlist_append(self, lines)
+
+    def request_storage_mode(self, total_songs=None):
+        """
+        Waits for the storage mode. Returns None when the job is cancelled
+        at the prompt, so the runner stops before downloading anything.
+        """
+        if self.storage_mode:
+            return self.storage_mode
+        self._set_status("awaiting_storage")
+        if self.listener:
+            self.listener.job_storage_prompt(self, total_songs)
+        while not self.storage_event.wait(0.5):
+            if self.cancel_event.is_set():
+                return None
+        self._set_status("running")
+        return self.storage_mode or "genre"
+
+    def download_finished(self):
+        self._finish()
+
+    def organization_finished(self):
+        self._finish()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    # Scheduler side
+
+    def choose_storage_mode(self, mode):
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode: {mode}")
+        self.storage_mode = mode
+        self.storage_event.set()
+
+    def cancel(self):
+        """
+        Asks the job to stop. A queued job never starts; a running one stops
+        feeding new tracks and finishes the ones in progress.
+        """
+        self.cancel_event.set()
+        with self.lock:
+            if self.status == "queued":
+                self.status = "cancelled"
+                self.finished = time.time()
+                self.done_event.set()
+
+    def _set_status(self, status):
+        with self.lock:
+            self.status = status
+        if self.listener:
+            self.listener.job_status(self)
+
+    def _finish(self):
+        with self.lock:
+            if self.cancel_event.is_set():
+                self.status = "cancelled"
+            elif self.error:
+                self.status = "failed"
+            else:
+                self.status = "done"
+            self.finished = time.time()
+        if self.listener:
+            self.listener.job_status(self)
+
+    def wait(self, timeout=None):
+        """
+        Waits until the job is done, failed or cancelled. Returns False on timeout.
+        """
+        return self.done_event.wait(timeout)
+
+    def summary(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "url": self.url,
+                "output_folder": self.output_folder,
+                "status": self.status,
+                "storage_mode": self.storage_mode,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "tracks": len(self.playlist),
+                "metrics": self.result,
+            }
+
+    def details(self, since=0):
+        """
+        summary() plus the log lines after `since` and the playlist.
+        """
+        data = self.summary()
+        with self.lock:
+            lines, gap = self.logs.since(since)
+            data.update({
+                "logs": lines,
+                "next": self.logs.next_seq,
+                "gap": gap,
+                "playlist": list(self.playlist),
+            })
+        return data
+
+
+class JobScheduler:
+    """
+    Runs jobs from a FIFO queue on `max_jobs` worker threads.
+    runner(job) does the work; it normally is SpotifyDownloader.run with the
+    job as app_instance. Finished jobs are kept (up to `keep_finished`) so
+    they can still be inspected.
+    """
+
+    def __init__(self, runner, max_jobs=2, listener=None, log_capacity=5000, keep_finished=100):
+        self.runner = runner
+        self.max_jobs = max(1, max_jobs)
+        self.listener = listener
+        self.log_capacity = log_capacity
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Started lazily so importing the web app does not spawn threads
+        if self._workers:
+            return
+        for n in range(self.max_jobs):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, url, output_folder, use_ai, storage_mode=None):
+        with self.lock:
+            job = Job(
+                str(next(self._ids)), url, output_folder, use_ai,
+                storage_mode=storage_mode, log_capacity=self.log_capacity, listener=self.listener,
+            )
+            self.jobs[job.id] = job
+            self._prune()
+            self._ensure_workers()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.summary() for job in jobs]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.cancel()
+        return job
+
+    def queue_position(self, job):
+        """
+        1-based place among the jobs still waiting to start, or 0.
+        """
+        with self.lock:
+            waiting = [j for j in self.jobs.values() if j.status == "queued"]
+        return waiting.index(job) + 1 if job in waiting else 0
+
+    def awaiting_storage(self):
+        """
+        The oldest job waiting for a storage mode answer, if any.
+        """
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return next((job for job in jobs if job.status == "awaiting_storage"), None)
+
+    def _prune(self):
+        finished = [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in ("done", "failed", "cancelled")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job.cancel_event.is_set():
+                continue
+            with job.lock:
+                job.status = "running"
+                job.started = time.time()
+            if self.listener:
+                self.listener.job_status(job)
+            try:
+                job.result = self.runner(job)
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed")
+                job.log(f"[Critical Error] {e}")
+            if job.finished is None:
+                # runner returned without calling download_finished
+                job._finish()
+            job.done_event.set()
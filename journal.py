@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from library_index import STATE_DIR
+
+# Statuses that do not need another attempt on resume
+FINAL_STATUSES = ("done", "skipped")
+
+
+class JobJournal:
+    """
+    Append-only JSON-lines journal for one playlist job, kept in the output
+    folder. It stores the track metadata when the job starts and one line per
+    finished track, so a rerun of the same URL can skip the Spotify fetch and
+    only process what is left. A streamed job adds its tracks page by page and
+    is only `listed` once the whole playlist was fetched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.url = None
+        self.storage_mode = None
+        self.tracks = {}
+        self.statuses = {}
+        self.paths = {}
+        self.listed = True
+        self.finished = False
+        self._torn = False
+        self._load()
+
+    @classmethod
+    def for_url(cls, output_folder, url):
+        folder = os.path.join(output_folder, STATE_DIR, "jobs")
+        os.makedirs(folder, exist_ok=True)
+        name = hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(folder, f"{name}.jsonl"))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from a crash
+                    continue
+                kind = record.get("type")
+                if kind == "job":
+                    self.url = record["url"]
+                    self.storage_mode = record["storage_mode"]
+                    self.listed = not record.get("streaming", False)
+                elif kind == "listed":
+                    self.listed = True
+                elif kind == "track":
+                    self.tracks[record["index"]] = record["song"]
+                elif kind == "status":
+                    self.statuses[record["index"]] = record["status"]
+                    self.paths[record["index"]] = record.get("path")
+                elif kind == "finished":
+                    self.finished = True
+
+    def resumable(self):
+        return bool(self.tracks) and not self.finished
+
+    def remaining(self):
+        """
+        Indexes of the tracks that are pending or failed.
+        """
+        return [
+            index for index in sorted(self.tracks)
+            if self.statuses.get(index) not in FINAL_STATUSES
+        ]
+
+    def counts(self):
+        counts = {"pending": 0, "done": 0, "skipped": 0, "failed": 0}
+        for index in self.tracks:
+            counts[self.statuses.get(index, "pending")] += 1
+        return counts
+
+    def start(self, url, storage_mode, songs, streaming=False):
+        """
+        Starts a fresh journal for a job. songs is a list of dicts (Song.json).
+        A streaming journal gets the rest of its tracks through add_tracks()
+        and is completed by mark_listed().
+        """
+        with self.lock:
+            self.url = url
+            self.storage_mode = storage_mode
+            self.tracks = {index: song for index, song in enumerate(songs, 1)}
+            self.statuses = {}
+            self.paths = {}
+            self.listed = not streaming
+            self.finished = False
+            self._torn = False
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "type": "job", "url": url, "storage_mode": storage_mode,
+                    "streaming": streaming, "created": time.time(),
+                }) + "\n")
+                f.writelines(json.dumps({"type": "track", "index": index, "song": song}) + "\n"
+                             for index, song in self.tracks.items())
+
+    def add_tracks(self, songs):
+        """
+        Appends tracks to a streaming journal. Returns their indexes.
+        """
+        with self.lock:
+            start = max(self.tracks, default=0) + 1
+            indexes = list(range(start, start + len(songs)))
+            with open(self.path, "a", encoding="utf-8") as f:
+                if self._torn:
+                    f.write("\n")
+                    self._torn = False
+                for index, song in zip(indexes, songs):
+                    self.tracks[index] = song
+                    f.write(json.dumps({"type": "track", "index": index, "song": song}) + "\n")
+            return indexes
+
+    def mark_listed(self):
+        with self.lock:
+            self.listed = True
+            self._append({"type": "listed"})
+
+    def record(self, index, status, path=None):
+        with self.lock:
+            self.statuses[index] = status
+            self.paths[index] = path
+            self._append({"type": "status", "index": index, "status": status, "path": path})
+
+    def finish(self):
+        with self.lock:
+            self.finished = True
+            self._append({"type": "finished", "at": time.time()})
+
+    def _append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._torn:
+                # Never glue a record onto a line cut short by a crash
+                f.write("\n")
+                self._torn = False
+            f.write(json.dumps(record) + "\n")
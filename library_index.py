@@ -0,0 +1,240 @@
+import os
+import re
+import sqlite3
+import threading
+
+from config import Config
+
+# Hidden folder inside the output folder where we keep our own state files
+STATE_DIR = ".spot-downloader"
+# Every format spotdl can write (see Config.OUTPUT_FORMAT)
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus", ".ogg", ".flac", ".wav")
+
+# Bump when normalize_key changes so stored keys are rebuilt
+KEY_VERSION = "2"
+
+# "_1700000000" suffix added by the rename fallback when a name collides
+_COLLISION_SUFFIX = re.compile(r"_\d{9,}$")
+
+
+def connect_state_db(path):
+    """
+    Opens one of the SQLite files in the state dir. WAL needs memory shared
+    between the processes using the file, which a network disk does not
+    give hosts, so a SHARED_LIBRARY uses the rollback journal instead.
+    """
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    with conn:
+        conn.execute(f"PRAGMA journal_mode={'DELETE' if Config.SHARED_LIBRARY else 'WAL'}")
+    return conn
+
+
+def sanitize(text):
+    """
+    What spotdl's sanitize_string does to each field of a file name: drops
+    /?\\*|<> and turns " into ' and : into -.
+    """
+    text = "".join(char for char in text if char not in "/?\\*|<>")
+    return text.replace('"', "'").replace(":", "-")
+
+
+def normalize_key(artist, title):
+    """
+    Builds the lookup key for a track: lowercased "artist - title" sanitized
+    like spotdl's file names and with collapsed whitespace, so it equals the
+    key of the file spotdl writes for it.
+    """
+    text = f"{sanitize(str(artist))} - {sanitize(str(title))}"
+    return " ".join(text.lower().split())
+
+
+def key_from_filename(filename):
+    """
+    Lookup key for a file named "Artist - Title.<ext>" (or a collision copy of it).
+    """
+    stem = _COLLISION_SUFFIX.sub("", os.path.splitext(filename)[0])
+    return " ".join(stem.lower().split())
+
+
+class LibraryIndex:
+    """
+    On-disk index of the audio files under an output folder, keyed by normalized
+    artist/title and Spotify track ID. Kept in SQLite inside the output folder and
+    refreshed incrementally: only directories whose mtime changed are re-listed.
+    """
+
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(root)
+        if db_path is None:
+            state_dir = os.path.join(self.root, STATE_DIR)
+            os.makedirs(state_dir, exist_ok=True)
+            db_path = os.path.join(state_dir, "library.db")
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = connect_state_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, dir TEXT NOT NULL, key TEXT NOT NULL, track_id TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS files_key ON files (key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS files_track ON files (track_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS files_dir ON files (dir)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                "path TEXT PRIMARY KEY, parent TEXT, mtime REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            extensions = ",".join(AUDIO_EXTENSIONS)
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'extensions'").fetchone()
+            if not row or row[0] != extensions:
+                # Built when other extensions were indexed: re-list every directory
+                self.conn.execute("DELETE FROM dirs")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('extensions', ?)", (extensions,)
+                )
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'key_version'").fetchone()
+            if not row or row[0] != KEY_VERSION:
+                # Keys of files added from metadata followed older rules: take them from the names
+                rows = self.conn.execute("SELECT path FROM files").fetchall()
+                self.conn.executemany(
+                    "UPDATE files SET key = ? WHERE path = ?",
+                    [(key_from_filename(os.path.basename(path)), path) for (path,) in rows],
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('key_version', ?)", (KEY_VERSION,)
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def refresh(self):
+        """
+        Brings the index up to date with the disk. Returns the number of
+        directories that had to be re-listed.
+        """
+        with self.lock, self.conn:
+            return self._refresh_dir(self.root, None)
+
+    def _refresh_dir(self, path, parent):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._forget_dir(path)
+            return 0
+
+        row = self.conn.execute("SELECT mtime FROM dirs WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == mtime:
+            # Nothing was added or removed here, recurse into the known children
+            rescanned = 0
+            children = self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall()
+            for (child,) in children:
+                rescanned += self._refresh_dir(child, path)
+            return rescanned
+
+        files = {}
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    files[entry.path] = key_from_filename(entry.name)
+
+        # Drop vanished files and dirs, keep rows (and their track IDs) for the rest
+        known = self.conn.execute("SELECT path FROM files WHERE dir = ?", (path,)).fetchall()
+        gone = [(p,) for (p,) in known if p not in files]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", gone)
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO files (path, dir, key) VALUES (?, ?, ?)",
+            [(p, path, key) for p, key in files.items()],
+        )
+        known_dirs = self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall()
+        for (child,) in known_dirs:
+            if child not in subdirs:
+                self._forget_dir(child)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, parent, mtime) VALUES (?, ?, ?)",
+            (path, parent, mtime),
+        )
+        rescanned = 1
+        for child in subdirs:
+            rescanned += self._refresh_dir(child, path)
+        return rescanned
+
+    def _forget_dir(self, path):
+        children = self.conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall()
+        for (child,) in children:
+            self._forget_dir(child)
+        self.conn.execute("DELETE FROM files WHERE dir = ?", (path,))
+        self.conn.execute("DELETE FROM dirs WHERE path = ?", (path,))
+
+    def lookup(self, artist, title, track_id=None):
+        """
+        Returns the path of an indexed file for the track, or None.
+        The Spotify track ID wins over the artist/title key when both are known.
+        """
+        with self.lock:
+            rows = []
+            if track_id:
+                rows = self.conn.execute(
+                    "SELECT path FROM files WHERE track_id = ?", (track_id,)
+                ).fetchall()
+            if not rows:
+                rows = self.conn.execute(
+                    "SELECT path FROM files WHERE key = ?", (normalize_key(artist, title),)
+                ).fetchall()
+            for (path,) in rows:
+                if os.path.exists(path):
+                    return path
+                # Removed behind our back since the last refresh
+                with self.conn:
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        return None
+
+    def add(self, path, artist=None, title=None, track_id=None):
+        """
+        Records a file we just wrote.
+        """
+        path = os.path.abspath(path)
+        if artist is not None and title is not None:
+            key = normalize_key(artist, title)
+        else:
+            key = key_from_filename(os.path.basename(path))
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, dir, key, track_id) VALUES (?, ?, ?, ?)",
+                (path, os.path.dirname(path), key, track_id),
+            )
+
+    def move(self, old_path, new_path):
+        """
+        Records a rename, keeping the key and track ID of the original entry.
+        """
+        old_path = os.path.abspath(old_path)
+        new_path = os.path.abspath(new_path)
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT key, track_id FROM files WHERE path = ?", (old_path,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM files WHERE path = ?", (old_path,))
+            key, track_id = row if row else (key_from_filename(os.path.basename(new_path)), None)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, dir, key, track_id) VALUES (?, ?, ?, ?)",
+                (new_path, os.path.dirname(new_path), key, track_id),
+            )
+
+    def paths(self):
+        """
+        Every indexed audio file, as absolute paths.
+        """
+        with self.lock:
+            return [path for (path,) in self.conn.execute("SELECT path FROM files")]
+
+    def remove(self, path):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
@@ -0,0 +1,34 @@
+import itertools
+from collections import deque
+
+
+class LogBuffer:
+    """
+    Fixed-capacity ring buffer of log lines with monotonically increasing
+    sequence numbers. Not thread-safe on its own; callers hold their lock.
+    """
+
+    def __init__(self, capacity=5000):
+        self.lines = deque(maxlen=max(1, capacity))
+        self.next_seq = 0
+
+    @property
+    def first_seq(self):
+        return self.next_seq - len(self.lines)
+
+    def append(self, line):
+        self.lines.append(line)
+        self.next_seq += 1
+
+    def since(self, seq):
+        """
+        Returns (lines after seq, gap). gap is how many lines the caller missed
+        because they were already dropped from the buffer.
+        """
+        if seq > self.next_seq:
+            # Cursor from before a server restart, start over
+            seq = 0
+        seq = max(0, seq)
+        gap = max(0, self.first_seq - seq)
+        start = max(seq, self.first_seq) - self.first_seq
+        return list(itertools.islice(self.lines, start, None)), gap
@@ -1,5 +1,4 @@
 from ui import App
-from downloader import SpotifyDownloader
 from config import Config
 from assistant import AIAssistant
 
@@ -10,6 +9,8 @@ assistant = AIAssistant()
 def get_downloader():
     global downloader
     if downloader is None:
+        # Imported here: the download stack is not needed to draw the window
+        from downloader import SpotifyDownloader
         downloader = SpotifyDownloader()
     return downloader
 
@@ -28,7 +29,7 @@ def start_download_bridge(url, folder, use_ai, app_instance):
     dl = get_downloader()
     dl.run(url, folder, use_ai, app_instance)
 
-def start_organize_bridge(folder, use_ai, app_instance):
+def start_organize_bridge(folder, use_ai, app_instance, dry_run=False):
     """
     Bridge function to run organization.
     """
@@ -41,7 +42,7 @@ def start_organize_bridge(folder, use_ai, app_instance):
             
     dl = get_downloader()
     storage_mode = app_instance.request_storage_mode(None)
-    dl.organize_existing(folder, app_instance, use_ai, storage_mode)
+    dl.organize_existing(folder, app_instance, use_ai, storage_mode, dry_run=dry_run)
 
 if __name__ == "__main__":
     app = App(start_download_bridge, start_organize_bridge, assistant=assistant)
@@ -0,0 +1,170 @@
+"""
+Local ranking of YouTube candidates for a Spotify track, before anything is
+downloaded.
+
+Every candidate of a track is scored in one pass against trigram sets and
+a duration computed once for the track:
+- title: trigram similarity (Dice) of the normalized titles
+- artist: share of the artist's trigrams found in the candidate's title,
+  channel and artist fields
+- duration: 1 within DURATION_EXACT seconds of the Spotify duration,
+  falling to 0 at DURATION_WINDOW
+
+Candidates whose title says "live", "cover", "reaction", "preview" or
+"teaser" when the Spotify title does not, whose length is off by more than
+MAX_DURATION_DELTA, or whose title is too far from the Spotify one are
+rejected. A best score of ACCEPT_SCORE or more is taken as is; below it,
+the plausible candidates are ambiguous and can be checked by the AI in one
+batched call.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+ACCEPT_SCORE = 0.8
+MIN_SCORE = 0.45
+# Ambiguous candidates sent to the AI for one track
+MAX_AI_CANDIDATES = 5
+DURATION_EXACT = 3.0
+DURATION_WINDOW = 30.0
+MAX_DURATION_DELTA = 60.0
+# Below this title similarity it is another song, however well the rest fits
+MIN_TITLE_SIMILARITY = 0.3
+WEIGHTS = {"title": 0.45, "artist": 0.25, "duration": 0.3}
+# Bonus for results found by the track's ISRC, which are almost always right
+ISRC_BONUS = 0.1
+
+REJECT_WORDS = ("live", "cover", "reaction", "preview", "teaser")
+# Upload decorations that say nothing about which recording it is
+_NOISE = re.compile(
+    r"\b(official|music|lyric|lyrics|video|audio|visualizer|hd|hq|4k|topic|explicit|clean)\b"
+)
+_FEAT = re.compile(r"\b(feat|ft|featuring)\b\.?")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+Match = namedtuple("Match", ["candidate", "score", "rejected"])
+Match.__doc__ = """
+A scored candidate. rejected names the rule that dropped it ("live",
+"duration"...), with score 0, or is None.
+"""
+
+
+def normalize(text):
+    """
+    Lowercase ASCII words of a title, without accents, punctuation,
+    "feat." markers and upload decorations.
+    """
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    text = text.replace("&", " and ")
+    text = _FEAT.sub(" ", text)
+    text = _NON_WORD.sub(" ", text)
+    text = _NOISE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _containment(needle, haystack):
+    if not needle:
+        return 0.0
+    return len(needle & haystack) / len(needle)
+
+
+def _rejection(words, allowed, delta):
+    for word in REJECT_WORDS:
+        if word in words and word not in allowed:
+            return word
+    if delta is not None and delta > MAX_DURATION_DELTA:
+        return "duration"
+    return None
+
+
+def score_candidates(name, artists, duration, candidates):
+    """
+    Scores spotdl Results (or anything with name, author, duration and
+    optionally artists, isrc_search) for the track. Returns Matches from
+    best to worst, rejected ones last.
+    """
+    title = normalize(name)
+    title_grams = trigrams(title)
+    allowed = set(title.split())
+    artist_grams = [trigrams(normalize(artist)) for artist in artists if normalize(artist)]
+
+    matches = []
+    for candidate in candidates:
+        candidate_title = normalize(candidate.name)
+        credits = " ".join([candidate_title, normalize(getattr(candidate, "author", ""))]
+                           + [normalize(artist) for artist in getattr(candidate, "artists", None) or ()])
+        delta = None
+        if duration and getattr(candidate, "duration", None):
+            delta = abs(float(candidate.duration) - float(duration))
+
+        rejected = _rejection(set(candidate_title.split()), allowed, delta)
+        if rejected:
+            matches.append(Match(candidate, 0.0, rejected))
+            continue
+
+        # The artist is often only in the title ("Artist - Song"), so compare
+        # the Spotify title with what is left of it as well
+        similarity = max(_dice(title_grams, trigrams(candidate_title)),
+                         _dice(title_grams, trigrams(_strip_artists(candidate_title, artists))))
+        if similarity < MIN_TITLE_SIMILARITY:
+            matches.append(Match(candidate, 0.0, "other title"))
+            continue
+
+        credit_grams = trigrams(credits)
+        artist = max((_containment(grams, credit_grams) for grams in artist_grams), default=1.0)
+        if delta is None:
+            timing = 0.5
+        else:
+            timing = min(1.0, max(0.0, (DURATION_WINDOW - delta) / (DURATION_WINDOW - DURATION_EXACT)))
+        score = (WEIGHTS["title"] * similarity + WEIGHTS["artist"] * artist
+                 + WEIGHTS["duration"] * timing)
+        if getattr(candidate, "isrc_search", False):
+            score = min(1.0, score + ISRC_BONUS)
+        matches.append(Match(candidate, round(score, 4), None))
+
+    return sorted(matches, key=lambda match: (match.rejected is not None, -match.score))
+
+
+def _strip_artists(candidate_title, artists):
+    text = f" {candidate_title} "
+    for artist in artists:
+        artist = normalize(artist)
+        if artist:
+            text = text.replace(f" {artist} ", " ")
+    return " ".join(text.split())
+
+
+def pick(matches):
+    """
+    ("accept", match) when the best candidate is clearly right,
+    ("ambiguous", [matches]) with the plausible ones, best first, or
+    ("none", None) when every candidate was rejected or scored too low.
+    """
+    viable = [match for match in matches if match.rejected is None and match.score >= MIN_SCORE]
+    if not viable:
+        return "none", None
+    if viable[0].score >= ACCEPT_SCORE:
+        return "accept", viable[0]
+    return "ambiguous", viable[:MAX_AI_CANDIDATES]
+
+
+def rejected_summary(matches):
+    """
+    "2 live, 1 cover" for the rejected candidates, or "".
+    """
+    counts = {}
+    for match in matches:
+        if match.rejected:
+            counts[match.rejected] = counts.get(match.rejected, 0) + 1
+    return ", ".join(f"{count} {reason}" for reason, count in counts.items())
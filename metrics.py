@@ -0,0 +1,185 @@
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "spot_downloader"
+
+
+class Metrics:
+    """
+    Thread-safe counters and timers, each identified by a name plus labels.
+    A job's Metrics forwards everything to its parent as well, so the
+    process-wide REGISTRY adds up every job for the /metrics endpoint.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.counters = {}
+        # key -> [count, total seconds]
+        self.timers = {}
+        self.started = time.monotonic()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        self.inc_local(name, amount, **labels)
+        if self.parent:
+            self.parent.inc(name, amount, **labels)
+
+    def inc_local(self, name, amount=1, **labels):
+        """
+        Counts in this Metrics only, for values its parent already counts
+        at the source.
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            timer = self.timers.setdefault(key, [0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+        if self.parent:
+            self.parent.observe(name, seconds, **labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def timed(self, name, func, **labels):
+        """
+        Wraps func so every call is timed under name/labels.
+        """
+        def wrapper(*args, **kwargs):
+            with self.timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def by_label(self, name, label, timers=False):
+        """
+        {label value: count} for a counter, or {label value: seconds} for a timer.
+        """
+        source = self.timers if timers else self.counters
+        result = {}
+        with self.lock:
+            for (metric, labels), value in source.items():
+                if metric != name:
+                    continue
+                value = value[1] if timers else value
+                key = dict(labels).get(label)
+                result[key] = result.get(key, 0) + value
+        return result
+
+    def summary(self):
+        """
+        Plain-dict view of the job: elapsed time, throughput and the
+        per-stage, per-step and failure breakdowns.
+        """
+        elapsed = time.monotonic() - self.started
+        tracks = self.by_label("tracks", "status")
+        finished = tracks.get("done", 0)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "tracks": tracks,
+            "tracks_per_second": round(finished / elapsed, 3) if elapsed > 0 else 0.0,
+            "bytes_downloaded": self.counter("downloaded_bytes"),
+            "stage_seconds": {k: round(v, 3) for k, v in self.by_label("stage", "stage", timers=True).items()},
+            "step_seconds": {k: round(v, 3) for k, v in self.by_label("step", "step", timers=True).items()},
+            "failures": self.by_label("failures", "reason"),
+            "ai_calls": self.counter("ai_calls"),
+            "ai_retries": self.counter("ai_retries"),
+            "ai_cache_hits": self.counter("ai_cache", result="hit"),
+            "ai_cache_misses": self.counter("ai_cache", result="miss"),
+        }
+
+    def render(self, gauges=None):
+        """
+        Prometheus text exposition. Counters get a _total suffix, timers are
+        exported as summaries (_seconds_count / _seconds_sum). gauges is an
+        optional {name: value} or {name: {label value tuple: value}} of
+        point-in-time values added by the caller.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            timers = sorted(self.timers.items())
+
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+        for (name, labels), (count, total) in timers:
+            metric = f"{PREFIX}_{name}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total:.6f}")
+
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    lines.append(f"{metric}{_labels(labels)} {item}")
+            else:
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def format_summary(summary):
+    """
+    Log lines for a job summary produced by Metrics.summary().
+    """
+    mb = summary["bytes_downloaded"] / (1024 * 1024)
+    lines = [(
+        f"Job metrics: {summary['elapsed_seconds']:.1f}s, "
+        f"{summary['tracks_per_second']:.2f} tracks/s, {mb:.1f} MB downloaded."
+    )]
+    for title, key in (("Stage time", "stage_seconds"), ("Step time", "step_seconds")):
+        if summary[key]:
+            lines.append(
+                f"{title} (summed over workers): "
+                + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in summary[key].items())
+            )
+    if summary["failures"]:
+        lines.append(
+            "Failures: " + ", ".join(f"{reason}={count}" for reason, count in sorted(summary["failures"].items()))
+        )
+    if summary["ai_calls"] or summary["ai_cache_hits"] or summary["ai_cache_misses"]:
+        lines.append(
+            f"AI: {summary['ai_calls']} requests ({summary['ai_retries']} retries), "
+            f"cache {summary['ai_cache_hits']} hits, {summary['ai_cache_misses']} misses."
+        )
+    return lines
+
+
+# Process-wide totals, exported by the web server's /metrics
+REGISTRY = Metrics()
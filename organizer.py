@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from library_index import AUDIO_EXTENSIONS, STATE_DIR
+
+PLAN_FILE = "organize-plan.json"
+
+
+def scan_loose_files(root):
+    """
+    Audio files directly inside root, from a single directory scan.
+    """
+    with os.scandir(root) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file(follow_symlinks=False)
+        )
+
+
+def parse_filename(filename):
+    """
+    Guesses (artist, title) from "Artist - Title.<ext>".
+    """
+    name_part = os.path.splitext(filename)[0]
+    if " - " in name_part:
+        artist, title = name_part.split(" - ", 1)
+        return artist, title
+    return "Unknown", name_part
+
+
+class OrganizePlan:
+    """
+    The moves organize_existing is going to make, saved in the output folder's
+    state dir before anything is touched. Paths are relative to root. Applying
+    is idempotent: a move whose source is gone and whose target exists counts
+    as already done, so an interrupted apply can simply be run again.
+    skipped lists the loose files deliberately left where they are. labeling
+    describes how the labels were decided (AI on or off, model, prompt version),
+    so a plan made with other settings is not reused.
+    """
+
+    def __init__(self, root, storage_mode, moves, created=None, skipped=(), labeling=None):
+        self.root = os.path.abspath(root)
+        self.storage_mode = storage_mode
+        self.moves = moves
+        self.created = created or time.time()
+        self.skipped = list(skipped)
+        self.labeling = labeling
+
+    @staticmethod
+    def path_for(root):
+        return os.path.join(root, STATE_DIR, PLAN_FILE)
+
+    @classmethod
+    def load(cls, root):
+        try:
+            with open(cls.path_for(root), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(root, data["storage_mode"], data["moves"], data.get("created"), data.get("skipped", ()),
+                   data.get("labeling"))
+
+    @classmethod
+    def build(cls, root, storage_mode, files, labels, skipped=(), labeling=None):
+        """
+        Plans one move per file into its label folder. Name clashes, with
+        files already there or with other planned moves, get the same
+        "_<number>" suffix the download pipeline uses.
+        """
+        moves = []
+        taken = set()
+        stamp = int(time.time())
+        for filename, label in zip(files, labels):
+            target = os.path.join(label, filename)
+            base, ext = os.path.splitext(filename)
+            while target in taken or os.path.exists(os.path.join(root, target)):
+                target = os.path.join(label, f"{base}_{stamp}{ext}")
+                stamp += 1
+            taken.add(target)
+            moves.append({"src": filename, "dst": target, "label": label})
+        return cls(root, storage_mode, moves, skipped=skipped, labeling=labeling)
+
+    def save(self):
+        path = self.path_for(self.root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"storage_mode": self.storage_mode, "created": self.created, "moves": self.moves,
+                       "skipped": self.skipped, "labeling": self.labeling}, f)
+        os.replace(tmp_path, path)
+
+    def discard(self):
+        try:
+            os.remove(self.path_for(self.root))
+        except OSError:
+            pass
+
+    def unplanned(self, files):
+        """
+        The loose files of a newer scan that the plan neither moves nor skips.
+        """
+        known = {move["src"] for move in self.moves}.union(self.skipped)
+        return [filename for filename in files if filename not in known]
+
+    def folders(self):
+        """
+        {label: number of planned moves}, in order of first appearance.
+        """
+        counts = {}
+        for move in self.moves:
+            counts[move["label"]] = counts.get(move["label"], 0) + 1
+        return counts
+
+    def apply(self, index=None, workers=8, progress=None):
+        """
+        Applies the moves with a thread pool. progress(done, total) is called
+        after every move. Returns {status: count} with the statuses "moved",
+        "already", "missing" and "failed", plus a "failures" list of
+        (src, error) pairs and a "placed" list of the (src, dst) absolute
+        paths of the files now at their target, moved or already there.
+        """
+        for label in self.folders():
+            os.makedirs(os.path.join(self.root, label), exist_ok=True)
+
+        counts = {"moved": 0, "already": 0, "missing": 0, "failed": 0, "failures": [], "placed": []}
+        lock = threading.Lock()
+        total = len(self.moves)
+
+        def _apply(move):
+            try:
+                status, dst = self._apply_move(move, index)
+                error = None
+            except OSError as e:
+                status, dst, error = "failed", None, e
+            with lock:
+                counts[status] += 1
+                if error is not None:
+                    counts["failures"].append((move["src"], str(error)))
+                if status in ("moved", "already"):
+                    counts["placed"].append((os.path.join(self.root, move["src"]), dst))
+                done = counts["moved"] + counts["already"] + counts["missing"] + counts["failed"]
+                if progress:
+                    progress(done, total)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(_apply, self.moves))
+        return counts
+
+    def _apply_move(self, move, index):
+        src = os.path.join(self.root, move["src"])
+        dst = os.path.join(self.root, move["dst"])
+        if not os.path.exists(src):
+            return ("already" if os.path.exists(dst) else "missing"), dst
+        if os.path.exists(dst):
+            # Something took the name after the plan was made
+            base, ext = os.path.splitext(dst)
+            dst = f"{base}_{int(time.time())}{ext}"
+        os.rename(src, dst)
+        if index is not None:
+            index.move(src, dst)
+        return "moved", dst
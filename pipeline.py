@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the input for a stage's workers
+_END = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline. func(item) runs on one of `workers` threads and
+    returns True to hand the item to the next stage, or False when the item
+    is finished early (skipped, failed, ...).
+    """
+
+    def __init__(self, name, func, workers=1, initializer=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues. A full queue blocks the stage feeding
+    it, so a slow stage holds back the ones before it instead of piling up work.
+    Every item ends up in on_done(item) exactly once, from a worker thread.
+    on_error(stage, item, error) is called when a stage raises; the item is
+    then finished. A worker whose initializer raises fails every item it
+    takes the same way, so the run still ends.
+    """
+
+    def __init__(self, stages, on_done, on_error=None, queue_size=32):
+        self.stages = stages
+        self.on_done = on_done
+        self.on_error = on_error
+        self.queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+        self.threads = []
+        self.started = None
+        self.fed = 0
+        self.cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._remaining = {}
+
+    def start(self, items):
+        """
+        Starts the workers and a feeder thread that pushes `items` (any iterable,
+        consumed lazily) into the first stage.
+        """
+        self.started = time.monotonic()
+        for i, stage in enumerate(self.stages):
+            self._remaining[i] = stage.workers
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(i,), name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+        feeder = threading.Thread(target=self._feed, args=(items,), name="feeder", daemon=True)
+        feeder.start()
+        self.threads.append(feeder)
+
+    def cancel(self):
+        """
+        Stops feeding new items. Items still waiting in a queue are handed to
+        on_done untouched; items a worker is busy with run to the end of
+        their current stage.
+        """
+        self.cancelled.set()
+
+    def wait(self, timeout=None):
+        """
+        Waits until every item is done. Returns False on timeout.
+        """
+        return self._finished.wait(timeout)
+
+    def _feed(self, items):
+        try:
+            for item in items:
+                if self.cancelled.is_set():
+                    break
+                self.queues[0].put(item)
+                self.fed += 1
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(_END)
+
+    def _work(self, i):
+        stage = self.stages[i]
+        inbox = self.queues[i]
+        outbox = self.queues[i + 1] if i + 1 < len(self.stages) else None
+        try:
+            try:
+                if stage.initializer:
+                    stage.initializer()
+            except Exception as e:
+                logger.exception(f"Initializer of stage {stage.name} failed")
+                self._drain(stage, inbox, e)
+            else:
+                self._process(stage, inbox, outbox)
+        finally:
+            # The last worker out closes the next stage
+            with stage.lock:
+                self._remaining[i] -= 1
+                last = self._remaining[i] == 0
+            if last:
+                if outbox is not None:
+                    for _ in range(self.stages[i + 1].workers):
+                        outbox.put(_END)
+                else:
+                    self._finished.set()
+
+    def _process(self, stage, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is _END:
+                return
+            if self.cancelled.is_set():
+                self._done(item)
+                continue
+
+            started = time.monotonic()
+            try:
+                keep_going = stage.func(item)
+            except Exception as e:
+                logger.debug(f"Stage {stage.name} raised", exc_info=True)
+                keep_going = False
+                self._error(stage, item, e)
+            with stage.lock:
+                stage.processed += 1
+                stage.busy += time.monotonic() - started
+
+            if keep_going and outbox is not None:
+                outbox.put(item)
+            else:
+                self._done(item)
+
+    def _drain(self, stage, inbox, error):
+        """
+        Finishes every item of a worker that could not start.
+        """
+        while True:
+            item = inbox.get()
+            if item is _END:
+                return
+            self._error(stage, item, error)
+            self._done(item)
+
+    def _error(self, stage, item, error):
+        with stage.lock:
+            stage.failed += 1
+        if self.on_error:
+            try:
+                self.on_error(stage, item, error)
+            except Exception:
+                logger.exception(f"on_error failed in stage {stage.name}")
+
+    def _done(self, item):
+        # A failing callback must not kill the worker, or the stages after
+        # it would never be closed and wait() would hang
+        try:
+            self.on_done(item)
+        except Exception:
+            logger.exception("on_done failed")
+
+    def stats(self):
+        """
+        Per-stage readout: items processed, failures, queue depth in front of
+        the stage, throughput and how busy its workers were.
+        """
+        elapsed = max(time.monotonic() - (self.started or time.monotonic()), 1e-6)
+        readout = []
+        for stage, inbox in zip(self.stages, self.queues):
+            with stage.lock:
+                readout.append({
+                    "stage": stage.name,
+                    "workers": stage.workers,
+                    "processed": stage.processed,
+                    "failed": stage.failed,
+                    "queued": inbox.qsize(),
+                    "per_second": stage.processed / elapsed,
+                    "utilization": stage.busy / (elapsed * stage.workers),
+                })
+        return readout
+
+    def format_stats(self):
+        return " | ".join(
+            f"{s['stage']}: {s['processed']} done, {s['queued']} queued, "
+            f"{s['per_second']:.2f}/s, {s['utilization']:.0%} busy"
+            for s in self.stats()
+        )
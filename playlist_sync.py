@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import re
+
+_PLAYLIST_URL = re.compile(r"open\.spotify\.com/(?:.*/)?playlist/([A-Za-z0-9]+)")
+_SPOTIFY_URL = re.compile(r"https?://open\.spotify\.com/[^\s,]+")
+TRACK_URL = "https://open.spotify.com/track/{}"
+
+
+def split_urls(text):
+    """
+    The Spotify URLs in a text (several may be given, separated by spaces,
+    commas or new lines). Text without any is returned as the only entry.
+    """
+    return _SPOTIFY_URL.findall(text) or [text.strip()]
+
+
+def playlist_id(url):
+    """
+    Spotify playlist ID from a playlist URL, or None for other URLs.
+    """
+    match = _PLAYLIST_URL.search(url)
+    return match.group(1) if match else None
+
+
+class SpotifySource:
+    """
+    Cheap Spotify lookups used to decide what has to be fetched in full.
+    """
+
+    def snapshot(self, url):
+        from spotdl.utils.spotify import SpotifyClient
+
+        playlist = SpotifyClient().playlist(playlist_id(url), fields="snapshot_id")
+        return playlist.get("snapshot_id") if playlist else None
+
+    def track_ids(self, url):
+        """
+        Current track IDs of the playlist, in order, without full metadata.
+        """
+        from spotdl.utils.spotify import SpotifyClient
+
+        ids = []
+        client = SpotifyClient()
+        response = client.playlist_items(
+            playlist_id(url), fields="items(track(id,type,is_local)),next", limit=100
+        )
+        while response:
+            for item in response.get("items", []):
+                track = (item or {}).get("track") or {}
+                if track.get("id") and track.get("type") == "track" and not track.get("is_local"):
+                    ids.append(track["id"])
+            response = client.next(response) if response.get("next") else None
+        return ids
+
+    def playlist_pages(self, url):
+        """
+        Yields (songs, total) for each page of a playlist as soon as the API
+        returns it. The songs have the metadata that comes with a playlist
+        page; the download pipeline's metadata stage fills in the rest.
+        """
+        from spotdl.utils.spotify import SpotifyClient
+
+        client = SpotifyClient()
+        response = client.playlist_items(playlist_id(url), limit=100)
+        position = 0
+        while response:
+            songs = []
+            for item in response.get("items", []):
+                position += 1
+                song = song_from_track((item or {}).get("track") or (item or {}).get("item"), position)
+                if song is not None:
+                    songs.append(song)
+            yield songs, response.get("total")
+            response = client.next(response) if response.get("next") else None
+
+
+def song_from_track(track, position=None):
+    """
+    Builds a Song from a Spotify track object the way spotdl does for playlist
+    entries. Returns None for local files, episodes and unavailable tracks.
+    """
+    from spotdl.types.song import Song
+
+    if not isinstance(track, dict) or track.get("is_local") or track.get("type") != "track":
+        return None
+    if track.get("id") is None or track.get("duration_ms") == 0:
+        return None
+
+    album = track.get("album") or {}
+    release_date = album.get("release_date")
+    artists = [artist["name"] for artist in track.get("artists", [])]
+    images = album.get("images") or []
+    return Song.from_missing_data(
+        name=track["name"],
+        artists=artists,
+        artist=artists[0] if artists else None,
+        album_id=album.get("id"),
+        album_name=album.get("name"),
+        album_artist=album["artists"][0]["name"] if album.get("artists") else None,
+        album_type=album.get("album_type"),
+        disc_number=track.get("disc_number"),
+        duration=int(track.get("duration_ms", 0) / 1000),
+        year=release_date[:4] if release_date else None,
+        date=release_date,
+        track_number=track.get("track_number"),
+        tracks_count=album.get("total_tracks"),
+        song_id=track["id"],
+        explicit=track.get("explicit"),
+        url=track.get("external_urls", {}).get("spotify") or TRACK_URL.format(track["id"]),
+        isrc=track.get("external_ids", {}).get("isrc"),
+        cover_url=max(images, key=lambda i: (i.get("width") or 0) * (i.get("height") or 0))["url"] if images else None,
+        list_position=position,
+    )
+
+
+def stream_songs(spotdl, urls, source=None):
+    """
+    Yields (url, songs, total) page by page for a list of URLs: playlists one
+    API page at a time, anything else (albums, tracks, ...) in one go through
+    spotdl.search. total is the size of that URL's listing when known.
+    """
+    source = source or SpotifySource()
+    for url in urls:
+        if playlist_id(url):
+            for songs, total in source.playlist_pages(url):
+                yield url, songs, total
+        else:
+            songs = spotdl.search([url])
+            yield url, songs, len(songs)
+
+
+class PlaylistCache:
+    """
+    Playlist metadata cached on disk per URL, together with the playlist's
+    snapshot ID so we know when it is still current, and the IDs of the
+    tracks that were listed but not downloaded yet.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, url):
+        name = hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.folder, f"{name}.json")
+
+    def has(self, url):
+        return os.path.exists(self._path(url))
+
+    def load(self, url):
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url, snapshot_id, songs, pending=None):
+        """
+        pending lists the track IDs still to download; by default all of them.
+        """
+        if pending is None:
+            pending = [song.song_id for song in songs]
+        self._write(url, {
+            "url": url, "snapshot_id": snapshot_id,
+            "tracks": [song.json for song in songs], "pending": list(pending),
+        })
+
+    def mark_downloaded(self, url, track_ids):
+        """
+        Drops the given track IDs from the cached playlist's pending list.
+        """
+        cached = self.load(url)
+        if cached is None:
+            return
+        done = set(track_ids)
+        pending = [track_id for track_id in cached.get("pending", []) if track_id not in done]
+        if len(pending) != len(cached.get("pending", [])):
+            cached["pending"] = pending
+            self._write(url, cached)
+
+    def _write(self, url, data):
+        path = self._path(url)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+class SyncResult:
+    """
+    Outcome of a playlist sync. new_songs and removed_songs are relative to
+    the cached copy; without one, every song counts as new. retry_songs were
+    listed by an earlier sync but never downloaded.
+    """
+
+    def __init__(self, songs, new_songs, removed_songs, cached, snapshot_unchanged=False,
+                 retry_songs=()):
+        self.songs = songs
+        self.new_songs = new_songs
+        self.retry_songs = list(retry_songs)
+        self.removed_songs = removed_songs
+        self.cached = cached
+        self.snapshot_unchanged = snapshot_unchanged
+
+
+def sync_playlist(spotdl, url, cache, source=None):
+    """
+    Fetches the songs for a URL, using the cache as much as possible:
+    an unchanged snapshot costs one small request, a changed one costs a
+    track ID listing plus full metadata for the new tracks only.
+    Non-playlist URLs, and texts with several URLs, are always fetched with
+    spotdl.search.
+    """
+    urls = split_urls(url)
+    if len(urls) > 1 or not playlist_id(url):
+        songs = spotdl.search(urls)
+        return SyncResult(songs, songs, [], cached=False)
+
+    source = source or SpotifySource()
+    snapshot = source.snapshot(url)
+    cached = cache.load(url)
+
+    if cached is None:
+        songs = spotdl.search([url])
+        cache.save(url, snapshot, songs)
+        return SyncResult(songs, songs, [], cached=False)
+
+    from spotdl.types.song import Song
+
+    cached_songs = [Song.from_dict(data) for data in cached["tracks"]]
+    pending = set(cached.get("pending", []))
+    if snapshot and snapshot == cached.get("snapshot_id"):
+        retry_songs = [song for song in cached_songs if song.song_id in pending]
+        return SyncResult(cached_songs, [], [], cached=True, snapshot_unchanged=True,
+                          retry_songs=retry_songs)
+
+    by_id = {song.song_id: song for song in cached_songs}
+    current_ids = source.track_ids(url)
+    new_ids = [track_id for track_id in current_ids if track_id not in by_id]
+    fetched = {}
+    if new_ids:
+        for song in spotdl.search([TRACK_URL.format(track_id) for track_id in new_ids]):
+            fetched[song.song_id] = song
+
+    current = set(current_ids)
+    songs = [by_id.get(track_id) or fetched.get(track_id) for track_id in current_ids]
+    songs = [song for song in songs if song is not None]
+    new_songs = [fetched[track_id] for track_id in new_ids if track_id in fetched]
+    removed_songs = [song for song in cached_songs if song.song_id not in current]
+    retry_songs = [
+        by_id[track_id] for track_id in current_ids if track_id in by_id and track_id in pending
+    ]
+
+    cache.save(url, snapshot, songs, [song.song_id for song in retry_songs + new_songs])
+    return SyncResult(songs, new_songs, removed_songs, cached=True, retry_songs=retry_songs)
+
+
+def _tracklist_line(song):
+    return f"{song.artist} - {song.name}"
+
+
+def update_tracklist(path, url, songs, new_songs=None, removed_songs=None):
+    """
+    Writes tracklist.txt. When the file already exists and new_songs is given,
+    it is updated in place: existing lines keep their numbers, new songs are
+    appended and removed songs are marked.
+    """
+    if new_songs is None or not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Source: {url}\n")
+            f.write("-" * 30 + "\n")
+            f.writelines(f"{i}. {_tracklist_line(song)}\n" for i, song in enumerate(songs, 1))
+        return
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    removed = {_tracklist_line(song) for song in removed_songs or []}
+    count = 0
+    for n, line in enumerate(lines):
+        match = re.match(r"^(\d+)\. (.*?)( \(removed\))?$", line)
+        if not match:
+            continue
+        count = max(count, int(match.group(1)))
+        if match.group(2) in removed and not match.group(3):
+            lines[n] = f"{line} (removed)"
+
+    for song in new_songs:
+        count += 1
+        lines.append(f"{count}. {_tracklist_line(song)}")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,214 @@
+import tkinter as tk
+
+import customtkinter as ctk
+
+# status -> (marker, color) shown in front of each track
+STATUS_STYLES = {
+    "queued": ("·", "#8a8a8a"),
+    "downloading": ("↓", "#e0b341"),
+    "done": ("✓", "#4caf50"),
+    "skipped": ("↷", "#5c9bd1"),
+    "failed": ("✗", "#e05252"),
+}
+
+
+def song_key(song):
+    return getattr(song, "song_id", None) or f"{song.artist} - {song.name}"
+
+
+class PlaylistModel:
+    """
+    The rows of the playlist panel, independent of Tk. Statuses are looked up
+    by song key, so a status change costs one dict lookup no matter how long
+    the playlist is. A song listed more than once has a row for each.
+    `visible` holds the row numbers matching the search filter (None when
+    there is no filter).
+    """
+
+    def __init__(self):
+        self.titles = []
+        self.search_keys = []
+        self.statuses = []
+        self.rows_by_key = {}
+        self.query = ""
+        self.visible = None
+
+    def __len__(self):
+        """
+        Rows in view, after the filter.
+        """
+        return len(self.titles) if self.visible is None else len(self.visible)
+
+    @property
+    def total(self):
+        return len(self.titles)
+
+    def row_at(self, position):
+        return position if self.visible is None else self.visible[position]
+
+    def set_songs(self, songs):
+        self.titles = []
+        self.search_keys = []
+        self.statuses = []
+        self.rows_by_key = {}
+        self.append_songs(songs)
+        self.set_filter(self.query)
+
+    def append_songs(self, songs):
+        for song in songs:
+            row = len(self.titles)
+            title = f"{song.artist} - {song.name}"
+            self.titles.append(title)
+            self.search_keys.append(title.lower())
+            self.statuses.append("queued")
+            self.rows_by_key.setdefault(song_key(song), []).append(row)
+            if self.visible is not None and self.query in self.search_keys[row]:
+                self.visible.append(row)
+
+    def set_status(self, song, status):
+        """
+        Returns the rows that changed, empty for a song not in the list.
+        """
+        rows = self.rows_by_key.get(song_key(song), [])
+        if status not in STATUS_STYLES:
+            return []
+        for row in rows:
+            self.statuses[row] = status
+        return rows
+
+    def set_filter(self, query):
+        self.query = query.strip().lower()
+        if not self.query:
+            self.visible = None
+        else:
+            self.visible = [row for row, key in enumerate(self.search_keys) if self.query in key]
+
+    def counts(self):
+        counts = dict.fromkeys(STATUS_STYLES, 0)
+        for status in self.statuses:
+            counts[status] += 1
+        return counts
+
+
+class PlaylistView(ctk.CTkFrame):
+    """
+    Playlist panel that only draws the rows on screen, so showing or filtering
+    a playlist of tens of thousands of tracks does not freeze the window.
+    Must be used from the Tk thread.
+    """
+
+    def __init__(self, master, font=("Consolas", 12), row_height=20, **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = PlaylistModel()
+        self.font = font
+        self.row_height = row_height
+        self.top = 0
+        self.drawn = set()
+        self._redraw_job = None
+        self._filter_job = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.entry_search = ctk.CTkEntry(self, placeholder_text="Buscar na playlist...")
+        self.entry_search.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 6))
+        self.entry_search.bind("<KeyRelease>", self._on_search)
+
+        theme = ctk.ThemeManager.theme["CTkTextbox"]
+        self.text_color = self._apply_appearance_mode(theme["text_color"])
+        self.canvas = tk.Canvas(
+            self, highlightthickness=0, bd=0, bg=self._apply_appearance_mode(theme["fg_color"])
+        )
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.canvas.bind("<Configure>", lambda _e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda _e: self.scroll(-3))
+        self.canvas.bind("<Button-5>", lambda _e: self.scroll(3))
+        self.redraw()
+
+    # Data
+
+    def set_songs(self, songs):
+        self.model.set_songs(songs)
+        self.top = 0
+        self.redraw()
+
+    def append_songs(self, songs):
+        self.model.append_songs(songs)
+        self.redraw()
+
+    def set_status(self, song, status):
+        rows = self.model.set_status(song, status)
+        if not self.drawn.isdisjoint(rows):
+            self.redraw()
+
+    # Drawing
+
+    def page_size(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def redraw(self):
+        """
+        Schedules a redraw; many changes in one frame are drawn once.
+        """
+        if self._redraw_job is None:
+            self._redraw_job = self.after_idle(self._draw)
+
+    def _draw(self):
+        self._redraw_job = None
+        model = self.model
+        self.canvas.delete("all")
+        self.drawn = set()
+
+        size = len(model)
+        page = self.page_size()
+        self.top = max(0, min(self.top, size - page))
+        if not size:
+            text = "Nenhuma música encontrada." if model.total else "Aguardando playlist..."
+            self.canvas.create_text(6, 4, anchor="nw", text=text, fill=self.text_color, font=self.font)
+            self.scrollbar.set(0, 1)
+            return
+
+        for offset, position in enumerate(range(self.top, min(size, self.top + page + 1))):
+            row = model.row_at(position)
+            marker, color = STATUS_STYLES[model.statuses[row]]
+            y = 4 + offset * self.row_height
+            self.canvas.create_text(6, y, anchor="nw", text=marker, fill=color, font=self.font)
+            self.canvas.create_text(
+                24, y, anchor="nw", text=f"{row + 1}. {model.titles[row]}",
+                fill=self.text_color, font=self.font,
+            )
+            self.drawn.add(row)
+        self.scrollbar.set(self.top / size, min(1.0, (self.top + page) / size))
+
+    # Scrolling and search
+
+    def scroll(self, rows):
+        self.top += rows
+        self.redraw()
+
+    def _on_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.top = int(float(args[0]) * len(self.model))
+            self.redraw()
+        elif action == "scroll":
+            amount = int(args[0])
+            self.scroll(amount * (self.page_size() - 1) if args[1] == "pages" else amount)
+
+    def _on_search(self, _event=None):
+        # Wait for a pause in typing before filtering
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.model.set_filter(self.entry_search.get())
+        self.top = 0
+        self.redraw()
@@ -0,0 +1,81 @@
+"""
+Cold-start import profile for the GUI and the web worker.
+
+Each target is imported in a fresh interpreter with `python -X importtime`;
+the script prints its total import time and its heaviest imports, and exits
+with status 1 when a target is over its budget:
+
+    python profile_imports.py
+    python profile_imports.py --budget-ms main=300 --budget-ms webapp=600 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Module imported at startup -> budget in milliseconds
+DEFAULT_BUDGETS = {
+    "main": 400,
+    "webapp": 800,
+}
+
+
+def import_times(module):
+    """
+    Imports `module` in a fresh interpreter. Returns a list of
+    (depth, name, self_us, cumulative_us) in the order Python reports them.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=False,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(module, budget_ms, top):
+    rows = import_times(module)
+    total_ms = next(
+        (cumulative for depth, name, _, cumulative in reversed(rows) if depth == 0 and name == module), 0
+    ) / 1000
+    status = "ok" if total_ms <= budget_ms else "OVER BUDGET"
+    print(f"{module}: {total_ms:.0f} ms (budget {budget_ms} ms) {status}")
+
+    # Heaviest imports made directly by the target
+    direct = sorted((row for row in rows if row[0] == 1), key=lambda row: row[3], reverse=True)
+    for _, name, _, cumulative in direct[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    return total_ms <= budget_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile with a cold start budget.")
+    parser.add_argument("modules", nargs="*", help="modules to profile (default: main webapp)")
+    parser.add_argument("--budget-ms", action="append", default=[], metavar="MODULE=MS",
+                        help="override a budget, e.g. webapp=600")
+    parser.add_argument("--top", type=int, default=10, help="direct imports to list per module")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in args.budget_ms:
+        module, _, ms = item.partition("=")
+        budgets[module] = int(ms)
+
+    ok = True
+    for module in args.modules or list(DEFAULT_BUDGETS):
+        ok = profile(module, budgets.get(module, max(DEFAULT_BUDGETS.values())), args.top) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
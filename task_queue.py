@@ -0,0 +1,310 @@
+"""
+Shared per-track task queue for distributed downloads (see distributed.py).
+
+Two backends with the same interface:
+- SQLiteTaskQueue: one database file, for worker processes on the same host
+  (or a shared disk with working file locks).
+- RedisTaskQueue: any client with the redis-py command subset used below,
+  for workers on several hosts.
+
+A worker leases a task for `lease_seconds` and keeps the lease alive with
+heartbeat(). A task whose lease runs out (the worker died or hung) goes back
+to the queue the next time anyone leases, until it has been handed out
+`max_attempts` times; after that it is finished as failed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Task = namedtuple("Task", ["id", "job", "payload", "attempts"])
+
+
+def _expired_result(attempts):
+    return {"status": "failed", "failure": "lease_expired",
+            "lines": [f"  > Failed: no worker finished it after {attempts} attempts"]}
+
+
+def open_queue(url, max_attempts=3):
+    """
+    "sqlite:///path/queue.db" (or a plain path) or "redis://host:port/db".
+    """
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("A redis:// task queue needs the redis package (pip install redis).")
+        return RedisTaskQueue(redis.Redis.from_url(url), max_attempts=max_attempts)
+    path = url.removeprefix("sqlite:///")
+    return SQLiteTaskQueue(os.path.expanduser(path), max_attempts=max_attempts)
+
+
+class SQLiteTaskQueue:
+    def __init__(self, path, max_attempts=3):
+        self.max_attempts = max(1, max_attempts)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        # Autocommit; writes that must be atomic use BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, job TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job)")
+        # Order in which tasks finished, read by the coordinator with a cursor
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS finished (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "job TEXT NOT NULL, task_id INTEGER NOT NULL)"
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _transaction(self, func):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func()
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def _finish(self, task_id, job, status, result):
+        self.conn.execute(
+            "UPDATE tasks SET status = ?, owner = NULL, lease_expires = NULL, result = ? WHERE id = ?",
+            (status, json.dumps(result), task_id),
+        )
+        self.conn.execute("INSERT INTO finished (job, task_id) VALUES (?, ?)", (job, task_id))
+
+    def put(self, job, payloads):
+        def _put():
+            ids = []
+            for payload in payloads:
+                cursor = self.conn.execute(
+                    "INSERT INTO tasks (job, payload, status) VALUES (?, ?, 'ready')", (job, json.dumps(payload))
+                )
+                ids.append(cursor.lastrowid)
+            return ids
+        return self._transaction(_put)
+
+    def lease(self, worker_id, lease_seconds):
+        def _lease():
+            now = time.time()
+            expired = self.conn.execute(
+                "SELECT id, job, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).fetchall()
+            for task_id, job, attempts in expired:
+                if attempts >= self.max_attempts:
+                    self._finish(task_id, job, "failed", _expired_result(attempts))
+                else:
+                    self.conn.execute(
+                        "UPDATE tasks SET status = 'ready', owner = NULL, lease_expires = NULL WHERE id = ?",
+                        (task_id,),
+                    )
+            row = self.conn.execute(
+                "SELECT id, job, payload, attempts FROM tasks WHERE status = 'ready' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, job, payload, attempts = row
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, attempts = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, attempts + 1, task_id),
+            )
+            return Task(task_id, job, json.loads(payload), attempts + 1)
+        return self._transaction(_lease)
+
+    def heartbeat(self, task_id, worker_id, lease_seconds):
+        """
+        Extends the lease. False when the worker no longer holds it.
+        """
+        def _heartbeat():
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                (time.time() + lease_seconds, task_id, worker_id),
+            )
+            return cursor.rowcount == 1
+        return self._transaction(_heartbeat)
+
+    def complete(self, task_id, worker_id, result):
+        return self._settle(task_id, worker_id, "done", result)
+
+    def fail(self, task_id, worker_id, result):
+        """
+        Gives a task back after an error. It is handed out again until it has
+        had max_attempts tries, then finished as failed with `result`.
+        """
+        return self._settle(task_id, worker_id, "failed", result)
+
+    def _settle(self, task_id, worker_id, status, result):
+        def _settle():
+            row = self.conn.execute(
+                "SELECT job, attempts FROM tasks WHERE id = ? AND owner = ? AND status = 'leased'",
+                (task_id, worker_id),
+            ).fetchone()
+            if row is None:
+                return False
+            job, attempts = row
+            if status == "failed" and attempts < self.max_attempts:
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'ready', owner = NULL, lease_expires = NULL WHERE id = ?",
+                    (task_id,),
+                )
+            else:
+                self._finish(task_id, job, status, result)
+            return True
+        return self._transaction(_settle)
+
+    def finished(self, job, cursor=0):
+        """
+        Returns ([(task_id, payload, result), ...], cursor) for the tasks of
+        `job` finished after `cursor`.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT finished.seq, tasks.id, tasks.payload, tasks.result FROM finished "
+                "JOIN tasks ON tasks.id = finished.task_id "
+                "WHERE finished.job = ? AND finished.seq > ? ORDER BY finished.seq",
+                (job, cursor),
+            ).fetchall()
+        items = [(task_id, json.loads(payload), json.loads(result)) for _, task_id, payload, result in rows]
+        return items, rows[-1][0] if rows else cursor
+
+    def progress(self, job):
+        """
+        (finished, total) task counts of a job.
+        """
+        with self.lock:
+            finished, total = self.conn.execute(
+                "SELECT SUM(status IN ('done', 'failed')), COUNT(*) FROM tasks WHERE job = ?", (job,)
+            ).fetchone()
+        return finished or 0, total
+
+
+class RedisTaskQueue:
+    """
+    Keys, under `prefix`:
+      next_id          task id counter
+      task:<id>        hash: job, payload, status, owner, attempts, result
+      ready            list of task ids waiting for a worker
+      leases           sorted set of leased task ids by lease expiry
+      finished:<job>   list of finished task ids, in finishing order
+      settled:<job>    set of the task ids already in finished:<job>
+      total:<job>      number of tasks put for the job
+    Settling and requeueing an expired lease both start by removing the task
+    from `leases`, and only the one whose ZREM succeeds goes on, so a task
+    is never both finished and put back on `ready`. SADD on settled:<job>
+    lets a task into finished:<job> once, so progress() never passes total.
+    A task can still run on two workers when a lease expires while its
+    worker is busy; the late worker's complete() returns False, and the
+    library dedup turns the other run into a skip.
+    """
+
+    def __init__(self, client, prefix="spot-downloader", max_attempts=3):
+        self.redis = client
+        self.prefix = prefix
+        self.max_attempts = max(1, max_attempts)
+
+    def _key(self, *parts):
+        return ":".join((self.prefix,) + tuple(str(part) for part in parts))
+
+    def _get(self, task_id, field):
+        value = self.redis.hget(self._key("task", task_id), field)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def _finish(self, task_id, status, result):
+        job = self._get(task_id, "job")
+        if not self.redis.sadd(self._key("settled", job), task_id):
+            return
+        self.redis.hset(self._key("task", task_id), mapping={
+            "status": status, "owner": "", "result": json.dumps(result),
+        })
+        self.redis.rpush(self._key("finished", job), task_id)
+
+    def put(self, job, payloads):
+        ids = []
+        for payload in payloads:
+            task_id = self.redis.incr(self._key("next_id"))
+            self.redis.hset(self._key("task", task_id), mapping={
+                "job": job, "payload": json.dumps(payload), "status": "ready", "owner": "", "attempts": 0,
+            })
+            self.redis.incrby(self._key("total", job), 1)
+            self.redis.lpush(self._key("ready"), task_id)
+            ids.append(task_id)
+        return ids
+
+    def _requeue_expired(self):
+        for member in self.redis.zrangebyscore(self._key("leases"), "-inf", time.time()):
+            task_id = int(member)
+            # Whoever removes it from the lease set handles it
+            if not self.redis.zrem(self._key("leases"), member):
+                continue
+            attempts = int(self._get(task_id, "attempts") or 0)
+            if attempts >= self.max_attempts:
+                self._finish(task_id, "failed", _expired_result(attempts))
+            else:
+                self.redis.hset(self._key("task", task_id), mapping={"status": "ready", "owner": ""})
+                self.redis.rpush(self._key("ready"), task_id)
+
+    def lease(self, worker_id, lease_seconds):
+        self._requeue_expired()
+        member = self.redis.rpop(self._key("ready"))
+        if member is None:
+            return None
+        task_id = int(member)
+        key = self._key("task", task_id)
+        attempts = self.redis.hincrby(key, "attempts", 1)
+        self.redis.hset(key, mapping={"status": "leased", "owner": worker_id})
+        self.redis.zadd(self._key("leases"), {task_id: time.time() + lease_seconds})
+        return Task(task_id, self._get(task_id, "job"), json.loads(self._get(task_id, "payload")), attempts)
+
+    def _owns(self, task_id, worker_id):
+        return self._get(task_id, "owner") == worker_id and self._get(task_id, "status") == "leased"
+
+    def heartbeat(self, task_id, worker_id, lease_seconds):
+        if not self._owns(task_id, worker_id):
+            return False
+        # xx: never bring back a lease that was requeued in the meantime
+        self.redis.zadd(self._key("leases"), {task_id: time.time() + lease_seconds}, xx=True)
+        return True
+
+    def complete(self, task_id, worker_id, result):
+        return self._settle(task_id, worker_id, "done", result)
+
+    def fail(self, task_id, worker_id, result):
+        return self._settle(task_id, worker_id, "failed", result)
+
+    def _settle(self, task_id, worker_id, status, result):
+        # The lease may have expired and been requeued since the check
+        if not self._owns(task_id, worker_id) or not self.redis.zrem(self._key("leases"), task_id):
+            return False
+        attempts = int(self._get(task_id, "attempts") or 0)
+        if status == "failed" and attempts < self.max_attempts:
+            self.redis.hset(self._key("task", task_id), mapping={"status": "ready", "owner": ""})
+            self.redis.rpush(self._key("ready"), task_id)
+        else:
+            self._finish(task_id, status, result)
+        return True
+
+    def finished(self, job, cursor=0):
+        ids = self.redis.lrange(self._key("finished", job), cursor, -1)
+        items = []
+        for member in ids:
+            task_id = int(member)
+            items.append((
+                task_id, json.loads(self._get(task_id, "payload")), json.loads(self._get(task_id, "result")),
+            ))
+        return items, cursor + len(ids)
+
+    def progress(self, job):
+        return self.redis.llen(self._key("finished", job)), int(self.redis.get(self._key("total", job)) or 0)
@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+import ai_client
+from ai_cache import AICache
+from ai_client import AIClient
+from ai_optimizer import AIOptimizer
+from config import Config
+from metrics import REGISTRY
+
+
+class FakeOpenAI:
+    """
+    Minimal local stand-in for the chat completions endpoint.
+    The first `failures` requests get the given error status.
+    """
+
+    def __init__(self, failures=0, status=429, delay=0.0, reply=None):
+        self.failures = failures
+        self.status = status
+        self.delay = delay
+        self.reply = reply or (lambda body: "House")
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake.lock:
+                    fake.requests += 1
+                    fail = fake.requests <= fake.failures
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                time.sleep(fake.delay)
+                with fake.lock:
+                    fake.in_flight -= 1
+
+                if fail:
+                    payload = {"error": {"message": "slow down", "type": "rate_limit"}}
+                    self._send(fake.status, payload, {"retry-after": "0"})
+                    return
+                payload = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": fake.reply(body)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }
+                self._send(200, payload)
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def fake_openai():
+    servers = []
+
+    def start(**kwargs):
+        server = FakeOpenAI(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _ask(client):
+    return client.complete(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}], max_tokens=5)
+
+
+def test_retries_rate_limited_requests(fake_openai):
+    server = fake_openai(failures=2, status=429)
+    client = AIClient("test", base_url=server.base_url, max_retries=3)
+    calls, retries = REGISTRY.counter("ai_calls"), REGISTRY.counter("ai_retries")
+
+    response = _ask(client)
+
+    assert response.choices[0].message.content == "House"
+    assert server.requests == 3
+    assert client.stats() == {"calls": 3, "retries": 2}
+    # Counted once, at the source, for /metrics
+    assert REGISTRY.counter("ai_calls") - calls == 3
+    assert REGISTRY.counter("ai_retries") - retries == 2
+
+
+def test_gives_up_after_max_retries(fake_openai):
+    server = fake_openai(failures=10, status=503)
+    client = AIClient("test", base_url=server.base_url, max_retries=1, backoff_base=0.01)
+
+    with pytest.raises(openai.InternalServerError):
+        _ask(client)
+    assert server.requests == 2
+
+
+def test_caps_concurrent_requests(fake_openai):
+    server = fake_openai(delay=0.1)
+    client = AIClient("test", base_url=server.base_url, max_concurrency=2)
+
+    futures = [
+        client.submit(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}])
+        for _ in range(6)
+    ]
+    for future in futures:
+        future.result(timeout=10)
+
+    assert server.requests == 6
+    assert server.max_in_flight == 2
+
+
+def test_classify_batch_uses_one_request_per_chunk(fake_openai, tmp_path, monkeypatch):
+    def reply(body):
+        listing = body["messages"][0]["content"].split("Tracks: \n", 1)[1]
+        count = len([line for line in listing.splitlines() if ". " in line and " - " in line])
+        return json.dumps({"results": [{"id": n, "label": "techno"} for n in range(count)]})
+
+    server = fake_openai(reply=reply)
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(Config, "OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(Config, "AI_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(Config, "AI_BATCH_SIZE", 10)
+    monkeypatch.setattr(ai_client, "_shared_client", None)
+
+    ai = AIOptimizer()
+    tracks = [(f"Artist {i}", f"Track {i}") for i in range(25)]
+    hits, misses = REGISTRY.counter("ai_cache", result="hit"), REGISTRY.counter("ai_cache", result="miss")
+
+    assert ai.classify_batch(tracks) == ["Techno"] * 25
+    assert server.requests == 3
+
+    # Second pass is served from the cache
+    assert ai.classify_batch(tracks) == ["Techno"] * 25
+    assert server.requests == 3
+    assert REGISTRY.counter("ai_cache", result="hit") - hits == 25
+    assert REGISTRY.counter("ai_cache", result="miss") - misses == 25
+
+
+def test_batch_and_single_answers_are_cached_apart(fake_openai, tmp_path, monkeypatch):
+    def reply(body):
+        content = body["messages"][0]["content"]
+        if "Tracks: \n" in content:
+            return json.dumps({"results": [{"id": 0, "label": "techno"}]})
+        return "House"
+
+    server = fake_openai(reply=reply)
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(Config, "OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(Config, "AI_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(ai_client, "_shared_client", None)
+
+    ai = AIOptimizer()
+    assert ai.classify_batch([("Artist", "Track")]) == ["Techno"]
+    # The single-track prompt does not reuse the batch prompt's answer
+    assert ai.detect_genre("Artist", "Track") == "House"
+    assert server.requests == 2
+    assert ai.classify_batch([("Artist", "Track")]) == ["Techno"]
+    assert ai.detect_genre("Artist", "Track") == "House"
+    assert server.requests == 2
+
+
+def test_validate_matches_checks_every_candidate_in_one_request(fake_openai, tmp_path, monkeypatch):
+    # Video 1 is rejected, video 2 is left out of the answer
+    server = fake_openai(reply=lambda body: json.dumps(
+        {"results": [{"id": 0, "match": True}, {"id": 1, "match": False}]}
+    ))
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "test")
+    monkeypatch.setattr(Config, "OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(Config, "AI_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(ai_client, "_shared_client", None)
+
+    ai = AIOptimizer()
+    titles = ["Strobe (Extended Mix)", "Strobe (Live at Ultra)", "Strobe 2009"]
+    assert ai.validate_matches("deadmau5 - Strobe", titles) == [True, False, True]
+    assert server.requests == 1
+
+    # Answered videos are cached; only the unanswered one is asked again
+    assert ai.validate_match("deadmau5 - Strobe", "Strobe (Live at Ultra)") is False
+    assert server.requests == 1
+    assert ai.validate_matches("deadmau5 - Strobe", titles) == [True, False, True]
+    assert server.requests == 2
+
+
+def test_cache_evicts_the_least_recently_used_entries(tmp_path):
+    cache = AICache(str(tmp_path / "cache.db"), max_entries=3)
+    for key in "abc":
+        cache.set(key, key)
+        time.sleep(0.01)
+    cache.get("a")
+    cache.set("b", "b2")
+    cache.set("d", "d")
+
+    assert [cache.get(key) for key in "abcd"] == ["a", "b2", None, "d"]
+    assert cache.count == 3
+    # Reopening counts the file again
+    assert AICache(str(tmp_path / "cache.db"), max_entries=3).count == 3
@@ -0,0 +1,131 @@
+import os
+import wave
+
+import pytest
+
+import audio_features
+import downloader as downloader_module
+from audio_features import (
+    SAMPLE_RATE,
+    AudioFeatures,
+    pick_moment,
+    rank_moments,
+    read_cached,
+    write_cached,
+)
+from config import Config
+from conftest import HeadlessApp
+from downloader import SpotifyDownloader
+
+
+def clicks(np, bpm, seconds=40, seed=0):
+    """
+    A noise burst on every beat over a quiet noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(seconds * SAMPLE_RATE) * 0.01).astype(np.float32)
+    burst = (rng.standard_normal(400) * np.exp(-np.arange(400) / 60) * 0.5).astype(np.float32)
+    beat = 60 / bpm * SAMPLE_RATE
+    for n in range(int((len(samples) - 400) / beat)):
+        start = int(n * beat)
+        samples[start:start + 400] += burst
+    return samples
+
+
+@pytest.mark.parametrize("bpm", [100, 124, 128, 174])
+def test_tempo_of_a_click_track(bpm):
+    np = pytest.importorskip("numpy")
+    features = audio_features.features_from_chunks([clicks(np, bpm)])
+    assert abs(features.bpm - bpm) <= 0.5
+    assert features.pulse > 0.5
+
+
+def test_chunking_does_not_change_the_features():
+    np = pytest.importorskip("numpy")
+    samples = clicks(np, 126)
+    whole = audio_features.features_from_chunks([samples])
+    # Uneven chunks, so frames straddle chunk borders
+    chunked = audio_features.features_from_chunks(np.array_split(samples, 37))
+    assert chunked == whole
+
+
+def test_too_little_sound_is_not_analysed():
+    np = pytest.importorskip("numpy")
+    assert audio_features.features_from_chunks([np.zeros(SAMPLE_RATE * 30, dtype=np.float32)]) is None
+    assert audio_features.features_from_chunks([clicks(np, 128, seconds=3)]) is None
+
+
+def test_moments_from_features_and_ai_tiebreak():
+    peak = AudioFeatures(bpm=128.0, energy=-7.5, dynamics=3.0, brightness=2500.0, pulse=0.75, trend=0.0)
+    warmup = AudioFeatures(bpm=116.0, energy=-13.5, dynamics=4.0, brightness=1800.0, pulse=0.45, trend=0.2)
+    assert pick_moment(rank_moments(peak)) == "Peak Time"
+    assert pick_moment(rank_moments(warmup)) == "Warmup"
+
+    # Halfway between Warmup and Closing: the AI's answer decides
+    tie = AudioFeatures(bpm=118.5, energy=-12.5, dynamics=4.0, brightness=2000.0, pulse=0.42, trend=-1.5)
+    ranked = rank_moments(tie)
+    assert audio_features.is_tie(ranked)
+    assert {ranked[0][0], ranked[1][0]} == {"Warmup", "Closing"}
+    assert pick_moment(ranked, lambda: "Closing") == "Closing"
+    assert pick_moment(ranked, lambda: "Warmup") == "Warmup"
+    # An answer outside the two nearest is ignored
+    assert pick_moment(ranked, lambda: "Peak Time") == ranked[0][0]
+
+    # No AI call when the audio is clear
+    assert pick_moment(rank_moments(peak), lambda: pytest.fail("AI asked")) == "Peak Time"
+
+
+def test_features_are_cached_in_the_file_tags(tmp_path, monkeypatch):
+    path = str(tmp_path / "track.wav")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b"\0\0" * 8000)
+    features = AudioFeatures(bpm=127.8, energy=-8.2, dynamics=3.1, brightness=2400.0, pulse=0.71, trend=0.2)
+    monkeypatch.setattr(audio_features, "compute_features", lambda path, ffmpeg: features)
+
+    assert read_cached(path) is None
+    assert audio_features.analyze_file(path) == features
+    assert read_cached(path) == features
+
+    # A later analysis reads the tags instead of decoding again
+    monkeypatch.setattr(audio_features, "compute_features", lambda path, ffmpeg: pytest.fail("decoded again"))
+    assert audio_features.analyze_file(path) == features
+
+    # Tags from an older analysis are recomputed
+    monkeypatch.setattr(audio_features, "FEATURES_VERSION", audio_features.FEATURES_VERSION + 1)
+    assert read_cached(path) is None
+    assert write_cached(path, features)
+    assert read_cached(path) == features
+
+
+def test_set_moments_come_from_the_audio(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "AUDIO_ANALYSIS", True)
+    monkeypatch.setattr(Config, "AUDIO_ANALYSIS_WORKERS", 1)
+    monkeypatch.setattr(downloader_module, "numpy_available", lambda: True)
+
+    peak = AudioFeatures(bpm=128.0, energy=-7.5, dynamics=3.0, brightness=2500.0, pulse=0.75, trend=0.0)
+    warmup = AudioFeatures(bpm=116.0, energy=-13.5, dynamics=4.0, brightness=1800.0, pulse=0.45, trend=0.2)
+
+    def _analyze(path):
+        # Track 4 cannot be decoded
+        name = os.path.basename(path)
+        return None if "Track 4" in name else peak if "Track 0" in name else warmup
+
+    monkeypatch.setattr(audio_features, "analyze_file", _analyze)
+
+    class SetApp(HeadlessApp):
+        def request_storage_mode(self, total_songs=None):
+            return "set"
+
+    folder = tmp_path / "s"
+    app = SetApp()
+    summary = SpotifyDownloader().run("https://open.spotify.com/album/s", str(folder), False, app)
+
+    assert summary["tracks"] == {"done": 5}
+    assert "audio_analysis" in summary["step_seconds"]
+    assert os.listdir(folder / "Peak Time") == ["Artist s - Track 0.mp3"]
+    assert sorted(os.listdir(folder / "Warmup")) == [f"Artist s - Track {i}.mp3" for i in (1, 2, 3)]
+    assert os.listdir(folder / "Set") == ["Artist s - Track 4.mp3"]
+    assert "  > Set moment from audio (128 BPM, -7.5 dB, pulse 0.75): Peak Time" in app.lines
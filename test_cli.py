@@ -0,0 +1,44 @@
+import io
+import threading
+
+from cli import ConsoleListener, read_urls, run_batch
+
+
+def test_read_urls_from_args_and_file(tmp_path):
+    path = tmp_path / "urls.txt"
+    path.write_text("# nightly\nhttps://open.spotify.com/playlist/b\n\nhttps://a https://c\n", encoding="utf-8")
+    assert read_urls(["https://open.spotify.com/playlist/a"], str(path)) == [
+        "https://open.spotify.com/playlist/a",
+        "https://open.spotify.com/playlist/b",
+        "https://a https://c",
+    ]
+
+
+def test_batch_runs_without_prompts_and_summarizes(tmp_path):
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def runner(job):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        mode = job.request_storage_mode(3)
+        if job.url.endswith("bad"):
+            job.log("[Error] Failed to fetch playlist: not found")
+        with lock:
+            running[0] -= 1
+        job.download_finished()
+        return {"tracks": {"done": 3}, "storage_mode": mode}
+
+    stream = io.StringIO()
+    urls = [f"https://open.spotify.com/playlist/{i}" for i in range(5)] + ["https://open.spotify.com/playlist/bad"]
+    summary = run_batch(
+        urls, str(tmp_path), "set", jobs=2, runner=runner, listener=ConsoleListener(stream, quiet=True),
+    )
+
+    assert summary["jobs"] == {"done": 5, "failed": 1}
+    assert peak[0] <= 2
+    assert [result["url"] for result in summary["results"]] == urls
+    assert summary["results"][0]["metrics"] == {"tracks": {"done": 3}, "storage_mode": "set"}
+    assert "[#6] [Error] Failed to fetch playlist: not found" in stream.getvalue()
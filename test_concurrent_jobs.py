@@ -0,0 +1,34 @@
+import os
+import threading
+
+from config import Config
+from conftest import HeadlessApp
+from downloader import SpotifyDownloader
+
+
+def test_two_jobs_in_one_process_keep_their_own_folders(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "DOWNLOAD_WORKERS", 3)
+
+    cwd = os.getcwd()
+    dl = SpotifyDownloader()
+    jobs = {}
+    for name in ("a", "b"):
+        folder = tmp_path / name
+        app = HeadlessApp()
+        thread = threading.Thread(
+            target=dl.run,
+            args=(f"https://open.spotify.com/album/{name}", str(folder), False, app),
+        )
+        jobs[name] = (folder, app, thread)
+
+    for _, _, thread in jobs.values():
+        thread.start()
+    for _, _, thread in jobs.values():
+        thread.join(timeout=30)
+
+    assert os.getcwd() == cwd
+    for name, (folder, app, _) in jobs.items():
+        assert app.finished.is_set()
+        files = sorted(p.name for p in (folder / "Unsorted").iterdir())
+        assert files == [f"Artist {name} - Track {i}.mp3" for i in range(5)]
+        assert not [p for p in folder.iterdir() if p.suffix == ".mp3"]
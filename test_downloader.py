@@ -0,0 +1,22 @@
+import os
+
+from config import Config
+from conftest import HeadlessApp
+from downloader import SpotifyDownloader
+
+
+def test_no_transcode_keeps_m4a_and_dedups_it(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "OUTPUT_FORMAT", "mp3")
+    monkeypatch.setattr(Config, "NO_TRANSCODE", True)
+
+    dl = SpotifyDownloader()
+    settings = dl._downloader_settings(str(tmp_path))
+    assert (settings["format"], settings["bitrate"]) == ("m4a", "disable")
+
+    summary = dl.run("https://open.spotify.com/album/n", str(tmp_path / "n"), False, HeadlessApp())
+    assert summary["tracks"] == {"done": 5}
+    assert sorted(os.listdir(tmp_path / "n" / "Unsorted")) == [f"Artist n - Track {i}.m4a" for i in range(5)]
+
+    # A new process finds them through the library index
+    summary = SpotifyDownloader().run("https://open.spotify.com/album/n", str(tmp_path / "n"), False, HeadlessApp())
+    assert summary["tracks"] == {"skipped": 5}
@@ -0,0 +1,155 @@
+import os
+import random
+from array import array
+
+import downloader as downloader_module
+import fingerprint
+from config import Config
+from conftest import HeadlessApp
+from downloader import SpotifyDownloader
+from fingerprint import (
+    FRAME,
+    SAMPLE_RATE,
+    WINDOW_POSITIONS,
+    WINDOW_SECONDS,
+    Fingerprint,
+    FingerprintIndex,
+    fingerprint_file,
+    same_recording,
+    signature_from_pcm,
+)
+
+
+def synth(envelope, gain=1.0, seed=0, silence=0):
+    """
+    PCM with a loudness level per 250 ms frame. Another seed is another
+    "encode" of the same recording.
+    """
+    rng = random.Random(seed)
+    samples = array("h", [0] * silence)
+    for level in envelope:
+        samples.extend(int(gain * level * rng.uniform(-1, 1)) for _ in range(FRAME))
+    return samples.tobytes()
+
+
+def test_signature_survives_reencode_but_not_another_recording():
+    rng = random.Random(42)
+    song = [rng.randint(2000, 30000) for _ in range(120)]
+    other = [rng.randint(2000, 30000) for _ in range(120)]
+
+    original = Fingerprint(30.0, signature_from_pcm(synth(song)))
+    # Quieter, different noise and half a second of leading silence
+    copy = Fingerprint(30.5, signature_from_pcm(synth(song, gain=0.5, seed=1, silence=FRAME * 2)))
+    different = Fingerprint(30.0, signature_from_pcm(synth(other)))
+
+    assert len(original.bits) == 119
+    assert same_recording(original, copy)
+    assert not same_recording(original, different)
+    # Same audio, but a much longer track (extended mix)
+    assert not same_recording(original, Fingerprint(60.0, original.bits))
+
+
+def test_tracks_sharing_an_intro_are_told_apart(monkeypatch):
+    rng = random.Random(7)
+    intro = [rng.randint(2000, 30000) for _ in range(160)]
+    song = intro + [rng.randint(2000, 30000) for _ in range(320)]
+    remix = intro + [rng.randint(2000, 30000) for _ in range(320)]
+    # 2 minutes each, the first 40 s the same; the copy is a quieter
+    # re-encode with half a second more silence in front
+    files = {
+        "song.mp3": (120.0, synth(song)),
+        "copy.m4a": (120.5, synth(song, gain=0.5, seed=1, silence=FRAME * 2)),
+        "remix.mp3": (120.0, synth(remix, seed=2)),
+    }
+
+    def _decode(path, start, ffmpeg="ffmpeg"):
+        offset = int(start * SAMPLE_RATE) * 2
+        return files[path][1][offset:offset + WINDOW_SECONDS * SAMPLE_RATE * 2]
+
+    monkeypatch.setattr(fingerprint, "audio_duration", lambda path: files[path][0])
+    monkeypatch.setattr(fingerprint, "decode_window", _decode)
+    original, copy, other = (fingerprint_file(name) for name in files)
+
+    assert len(original.bits.split()) == len(WINDOW_POSITIONS)
+    assert same_recording(original, copy)
+    assert not same_recording(original, other)
+
+
+def random_bits(seed, n=160):
+    rng = random.Random(seed)
+    return "".join(rng.choice("01") for _ in range(n))
+
+
+def _touch(path, data=b"ID3"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_index_is_cached_by_size_and_mtime_and_reports_clusters(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    song = Fingerprint(200.0, random_bits(1))
+    fingerprints = {
+        "A - Song.mp3": song,
+        "A feat. B - Song.mp3": Fingerprint(201.0, song.bits[:150] + random_bits(2, 10)),
+        "A - Song_1700000000.m4a": song,
+        "C - Other.mp3": Fingerprint(200.0, random_bits(3)),
+        "broken.mp3": None,
+    }
+    paths = [
+        os.path.join(root, "A - Song.mp3"),
+        os.path.join(root, "House", "A feat. B - Song.mp3"),
+        os.path.join(root, "House", "A - Song_1700000000.m4a"),
+        os.path.join(root, "Techno", "C - Other.mp3"),
+        os.path.join(root, "broken.mp3"),
+    ]
+    for path in paths:
+        _touch(path)
+    decoded = []
+
+    def _fake(path):
+        decoded.append(path)
+        return fingerprints[os.path.basename(path)]
+
+    monkeypatch.setattr(fingerprint, "fingerprint_file", _fake)
+    index = FingerprintIndex(root)
+    assert index.update(paths, workers=1) == 5
+    assert index.update(paths, workers=1) == 0
+
+    _touch(paths[3], b"ID3 retagged")
+    assert index.update(paths[1:], workers=1) == 1
+    assert decoded[-1] == paths[3]
+
+    assert index.clusters() == [sorted(paths[1:3])]
+    assert index.find_duplicate(song) in paths[1:3]
+    assert index.find_duplicate(song, exclude=paths[1:3]) is None
+    assert index.get(paths[4]) is None
+
+
+def test_download_of_a_recording_already_in_the_library_is_not_organized(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "FINGERPRINT_DEDUP", True)
+    monkeypatch.setattr(Config, "FINGERPRINT_WORKERS", 1)
+
+    # Track 0 is already in the library under another name
+    def _fake(path):
+        name = os.path.basename(path)
+        if name == "Someone - Zero (Radio).mp3":
+            name = "Artist f - Track 0.mp3"
+        return Fingerprint(200.0, random_bits(name))
+
+    monkeypatch.setattr(fingerprint, "fingerprint_file", _fake)
+    monkeypatch.setattr(downloader_module, "fingerprint_file", _fake)
+    folder = tmp_path / "f"
+    (folder / "House").mkdir(parents=True)
+    (folder / "House" / "Someone - Zero (Radio).mp3").write_bytes(b"ID3")
+
+    app = HeadlessApp()
+    summary = SpotifyDownloader().run("https://open.spotify.com/album/f", str(folder), False, app)
+
+    assert summary["tracks"] == {"done": 4, "skipped": 1}
+    assert "fingerprint" in summary["step_seconds"]
+    assert ("  > Skipped: same recording as House/Someone - Zero (Radio).mp3, "
+            "left unorganized as Artist f - Track 0.mp3") in app.lines
+    # Kept where spotdl wrote it instead of deleted
+    assert (folder / "Artist f - Track 0.mp3").exists()
+    assert sorted(os.listdir(folder / "Unsorted")) == [f"Artist f - Track {i}.mp3" for i in range(1, 5)]
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from downloader import SpotifyDownloader
+from jobs import JobScheduler
+
+
+class FakeSong:
+    def __init__(self, artist, name):
+        self.artist = artist
+        self.name = name
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_runs_at_most_max_jobs_at_once():
+    release = threading.Event()
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def runner(job):
+        with lock:
+            running.append(job.id)
+            peak.append(len(running))
+        release.wait(5)
+        job.show_playlist([FakeSong("Artist", job.url)])
+        with lock:
+            running.remove(job.id)
+        job.download_finished()
+
+    scheduler = JobScheduler(runner, max_jobs=2)
+    jobs = [scheduler.submit(f"url-{i}", "/tmp", False) for i in range(4)]
+
+    assert _wait_for(lambda: len(running) == 2)
+    assert [job.status for job in jobs[2:]] == ["queued", "queued"]
+    assert scheduler.queue_position(jobs[3]) == 2
+
+    release.set()
+    assert _wait_for(lambda: all(job.status == "done" for job in jobs))
+    assert max(peak) == 2
+    assert jobs[0].details()["playlist"] == ["Artist - url-0"]
+
+
+def test_cancel_queued_and_running_jobs():
+    started = threading.Event()
+
+    def runner(job):
+        started.set()
+        while not job.is_cancelled():
+            time.sleep(0.01)
+        job.log("stopped")
+        job.download_finished()
+
+    scheduler = JobScheduler(runner, max_jobs=1)
+    first = scheduler.submit("url-1", "/tmp", False)
+    second = scheduler.submit("url-2", "/tmp", False)
+    assert started.wait(5)
+
+    scheduler.cancel(second.id)
+    assert second.status == "cancelled"
+    scheduler.cancel(first.id)
+
+    assert _wait_for(lambda: first.status == "cancelled")
+    assert first.details()["logs"] == ["stopped"]
+    assert second.started is None
+
+
+def test_storage_mode_prompt_waits_for_an_answer():
+    modes = {}
+
+    def runner(job):
+        modes[job.id] = job.request_storage_mode(3)
+        job.download_finished()
+
+    scheduler = JobScheduler(runner, max_jobs=2)
+    preset = scheduler.submit("url-1", "/tmp", False, storage_mode="set")
+    asking = scheduler.submit("url-2", "/tmp", False)
+
+    assert _wait_for(lambda: scheduler.awaiting_storage() is asking)
+    asking.choose_storage_mode("genre")
+
+    assert _wait_for(lambda: asking.status == "done" and preset.status == "done")
+    assert modes == {preset.id: "set", asking.id: "genre"}
+
+
+def test_cancelling_at_the_storage_prompt_downloads_nothing(tmp_path, fake_spotdl):
+    dl = SpotifyDownloader()
+    scheduler = JobScheduler(lambda job: dl.run(job.url, job.output_folder, job.use_ai, job), max_jobs=1)
+    job = scheduler.submit("https://open.spotify.com/album/a", str(tmp_path), False)
+
+    assert _wait_for(lambda: scheduler.awaiting_storage() is job)
+    scheduler.cancel(job.id)
+
+    assert _wait_for(lambda: job.status == "cancelled")
+    assert "Job cancelled before a storage mode was chosen." in job.details()["logs"]
+    assert not (tmp_path / "Unsorted").exists()
+    assert not any(p.suffix == ".mp3" for p in tmp_path.rglob("*"))
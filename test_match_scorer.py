@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+from spotdl.types.result import Result as SpotdlResult
+
+import downloader as downloader_module
+from config import Config
+from conftest import FakeDownloader, HeadlessApp
+from downloader import SpotifyDownloader
+from match_scorer import normalize, pick, rejected_summary, score_candidates
+
+Result = namedtuple("Result", ["name", "author", "duration", "url", "isrc_search", "artists"],
+                    defaults=(False, None))
+
+
+def test_normalize_drops_decorations_and_accents():
+    assert normalize("Beyoncé feat. JAY-Z – Crazy in Love (Official Music Video) [HD]") == "beyonce jay z crazy in love"
+    assert normalize("Above & Beyond") == "above and beyond"
+
+
+def test_the_original_wins_and_wrong_versions_are_rejected():
+    candidates = [
+        Result("deadmau5 - Strobe (Live at Ultra 2019)", "Ultra", 650, "live"),
+        Result("Strobe - piano cover", "Some Pianist", 630, "cover"),
+        Result("deadmau5 REACTION strobe", "Reactor", 640, "reaction"),
+        Result("deadmau5 - Strobe (Radio Edit)", "deadmau5", 215, "radio"),
+        Result("Another Song", "deadmau5", 637, "other"),
+        Result("Strobe (Extended Mix)", "deadmau5 - Topic", 637, "original"),
+    ]
+    matches = score_candidates("Strobe - Extended Mix", ["deadmau5"], 637, candidates)
+
+    verdict, match = pick(matches)
+    assert verdict == "accept" and match.candidate.url == "original"
+    assert {m.candidate.url: m.rejected for m in matches if m.rejected} == {
+        "live": "live", "cover": "cover", "reaction": "reaction", "radio": "duration", "other": "other title",
+    }
+    assert rejected_summary(matches) == "1 live, 1 cover, 1 reaction, 1 duration, 1 other title"
+
+
+def test_words_in_the_spotify_title_are_not_rejection_reasons():
+    candidates = [Result("Oasis - Live Forever (Official Video)", "Oasis", 277, "a")]
+    verdict, match = pick(score_candidates("Live Forever", ["Oasis"], 276, candidates))
+    assert verdict == "accept" and match.candidate.url == "a"
+
+
+def test_close_calls_are_ambiguous_and_nothing_plausible_is_none():
+    candidates = [
+        Result("Strobe", "random uploads", 636, "a"),
+        Result("Strobe (Extended)", "someone", 650, "b"),
+    ]
+    verdict, matches = pick(score_candidates("Strobe - Extended Mix", ["deadmau5"], 637, candidates))
+    assert verdict == "ambiguous"
+    assert [m.candidate.url for m in matches] == ["b", "a"]
+
+    only_live = [Result("Strobe (Live)", "deadmau5", 640, "a")]
+    assert pick(score_candidates("Strobe", ["deadmau5"], 637, only_live)) == ("none", None)
+
+
+class FakeProvider:
+    SUPPORTS_ISRC = False
+    GET_RESULTS_OPTS = ({"filter": "songs"}, {"filter": "videos"})
+
+    def get_results(self, query, **options):
+        artist, title = query.split(" - ", 1)
+        if title == "track 0":
+            return [self._result(f"{title} (Live)", artist, f"{title}-live")]
+        # The same upload comes back from both searches
+        return [self._result(f"{artist} - {title} (Official Audio)", artist, title)]
+
+    def _result(self, name, author, video_id):
+        return SpotdlResult(source="youtube-music", url=f"https://youtu.be/{video_id}", verified=False,
+                            name=name, duration=200.0, author=author, result_id=video_id)
+
+
+class ProviderDownloader(FakeDownloader):
+    def __init__(self, settings=None):
+        super().__init__(settings)
+        self.audio_providers = [FakeProvider()]
+
+    def search(self, song):
+        raise AssertionError("spotdl search used")
+
+
+def test_match_scoring_rejects_wrong_versions(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(downloader_module, "Downloader", ProviderDownloader)
+    monkeypatch.setattr(Config, "MATCH_SCORING", True)
+
+    app = HeadlessApp()
+    summary = SpotifyDownloader().run("https://open.spotify.com/album/m", str(tmp_path / "m"), False, app)
+
+    assert summary["tracks"] == {"done": 4, "failed": 1}
+    assert summary["failures"] == {"no_match": 1}
+    assert "  > Rejected candidates: 1 live" in app.lines
+    assert "  > No match: no candidate looks like the original." in app.lines
+    assert "  > Match: artist m - track 1 (Official Audio) (score 0.85)" in app.lines
+    assert not (tmp_path / "m" / "Artist m - Track 0.mp3").exists()
@@ -0,0 +1,63 @@
+from conftest import HeadlessApp
+from downloader import SpotifyDownloader
+from metrics import Metrics
+
+
+def test_job_metrics_add_up_in_the_parent():
+    registry = Metrics()
+    for _ in range(2):
+        job = Metrics(parent=registry)
+        job.inc("tracks", status="done")
+        job.inc("failures", reason="no_file")
+        job.observe("stage", 0.5, stage="download")
+
+    assert job.summary()["tracks"] == {"done": 1}
+    assert registry.by_label("tracks", "status") == {"done": 2}
+    assert registry.by_label("stage", "stage", timers=True) == {"download": 1.0}
+
+    # Values the parent already counts at the source stay in the job
+    job.inc_local("ai_calls", 3)
+    assert job.summary()["ai_calls"] == 3
+    assert registry.counter("ai_calls") == 0
+
+
+def test_render_prometheus_text():
+    metrics = Metrics()
+    metrics.inc("failures", reason='say "no"')
+    metrics.observe("stage", 0.25, stage="match")
+
+    text = metrics.render(gauges={"jobs": {(("status", "running"),): 1}})
+
+    assert '# TYPE spot_downloader_failures_total counter' in text
+    assert 'spot_downloader_failures_total{reason="say \\"no\\""} 1' in text
+    assert 'spot_downloader_stage_seconds_count{stage="match"} 1' in text
+    assert 'spot_downloader_stage_seconds_sum{stage="match"} 0.250000' in text
+    assert 'spot_downloader_jobs{status="running"} 1' in text
+
+
+class StatusApp(HeadlessApp):
+    def __init__(self):
+        super().__init__()
+        self.statuses = {}
+
+    def track_status(self, song, status):
+        self.statuses.setdefault(song.name, []).append(status)
+
+
+def test_run_returns_a_metrics_summary(tmp_path, fake_spotdl):
+    dl = SpotifyDownloader()
+    app = StatusApp()
+    summary = dl.run("https://open.spotify.com/album/m", str(tmp_path / "m"), False, app)
+
+    assert summary["tracks"] == {"done": 5}
+    assert summary["bytes_downloaded"] == 5 * len(b"ID3")
+    assert set(summary["stage_seconds"]) == {"metadata", "match", "download", "classify", "organize"}
+    assert {"spotify_fetch", "dedup", "youtube_search", "download_transcode"} <= set(summary["step_seconds"])
+    assert any(line.startswith("Job metrics:") for line in app.lines)
+    assert app.statuses == {f"Track {i}": ["downloading", "done"] for i in range(5)}
+
+    # A second run skips everything as already downloaded
+    app = StatusApp()
+    summary = dl.run("https://open.spotify.com/album/m", str(tmp_path / "m"), False, app)
+    assert summary["tracks"] == {"skipped": 5}
+    assert app.statuses == {f"Track {i}": ["skipped"] for i in range(5)}
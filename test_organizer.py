@@ -0,0 +1,172 @@
+import os
+
+from config import Config
+from downloader import SpotifyDownloader
+from library_index import LibraryIndex
+from organizer import OrganizePlan, parse_filename, scan_loose_files
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"ID3")
+
+
+def test_plan_resolves_name_clashes_and_applies(tmp_path):
+    root = str(tmp_path)
+    for name in ("A - One.mp3", "B - Two.mp3", "notes.txt"):
+        _touch(os.path.join(root, name))
+    _touch(os.path.join(root, "House", "A - One.mp3"))
+
+    files = scan_loose_files(root)
+    assert files == ["A - One.mp3", "B - Two.mp3"]
+    assert [parse_filename(f) for f in files] == [("A", "One"), ("B", "Two")]
+
+    plan = OrganizePlan.build(root, "genre", files, ["House", "Techno"])
+    assert plan.moves[0]["dst"].startswith(os.path.join("House", "A - One_"))
+    assert plan.moves[1]["dst"] == os.path.join("Techno", "B - Two.mp3")
+    plan.save()
+
+    index = LibraryIndex(root)
+    index.refresh()
+    counts = OrganizePlan.load(root).apply(index, workers=4)
+
+    assert counts["moved"] == 2 and counts["failed"] == 0
+    assert os.path.exists(os.path.join(root, plan.moves[0]["dst"]))
+    assert index.lookup("B", "Two") == os.path.join(root, "Techno", "B - Two.mp3")
+
+
+def test_interrupted_apply_can_run_again(tmp_path):
+    root = str(tmp_path)
+    files = [f"A - Track {i}.mp3" for i in range(10)]
+    for name in files:
+        _touch(os.path.join(root, name))
+    plan = OrganizePlan.build(root, "genre", files, ["Techno"] * 10)
+
+    # Half of the moves happened before the "crash"
+    os.makedirs(os.path.join(root, "Techno"))
+    for move in plan.moves[:5]:
+        os.rename(os.path.join(root, move["src"]), os.path.join(root, move["dst"]))
+
+    counts = plan.apply(workers=3)
+
+    assert (counts["moved"], counts["already"], counts["missing"]) == (5, 5, 0)
+    assert sorted(os.listdir(os.path.join(root, "Techno"))) == sorted(files)
+    assert scan_loose_files(root) == []
+
+
+def test_apply_reports_only_the_files_now_in_place(tmp_path):
+    root = str(tmp_path)
+    files = ["A - One.mp3", "A - Two.mp3", "A - Three.mp3"]
+    for name in files:
+        _touch(os.path.join(root, name))
+    plan = OrganizePlan.build(root, "genre", files, ["Techno"] * 3)
+    os.remove(os.path.join(root, "A - Two.mp3"))
+    # Taken after planning, so the move gets a suffixed name
+    _touch(os.path.join(root, "Techno", "A - Three.mp3"))
+
+    counts = plan.apply(workers=2)
+
+    assert (counts["moved"], counts["missing"]) == (2, 1)
+    placed = dict(counts["placed"])
+    assert sorted(placed) == [os.path.join(root, "A - One.mp3"), os.path.join(root, "A - Three.mp3")]
+    assert placed[os.path.join(root, "A - One.mp3")] == os.path.join(root, "Techno", "A - One.mp3")
+    assert os.path.basename(placed[os.path.join(root, "A - Three.mp3")]).startswith("A - Three_")
+    assert all(os.path.exists(dst) for dst in placed.values())
+
+
+class OrganizeApp:
+    def __init__(self):
+        self.lines = []
+
+    def log(self, message):
+        self.lines.append(message)
+
+    def organization_finished(self):
+        pass
+
+
+def test_saved_plan_is_rebuilt_when_new_files_appear(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "FINGERPRINT_DEDUP", False)
+    root = str(tmp_path)
+    _touch(os.path.join(root, "A - One.mp3"))
+    dl = SpotifyDownloader()
+    dl.organize_existing(root, OrganizeApp(), use_ai=False, dry_run=True)
+    assert [move["src"] for move in OrganizePlan.load(root).moves] == ["A - One.mp3"]
+
+    # Unchanged folder: the saved plan is used as is
+    app = OrganizeApp()
+    dl.organize_existing(root, app, use_ai=False, dry_run=True)
+    assert any(line.startswith("Using the saved plan") for line in app.lines)
+
+    _touch(os.path.join(root, "B - Two.mp3"))
+    app = OrganizeApp()
+    dl.organize_existing(root, app, use_ai=False)
+
+    assert "The saved plan leaves out 1 new files, planning again." in app.lines
+    assert scan_loose_files(root) == []
+    assert sorted(os.listdir(os.path.join(root, "Unsorted"))) == ["A - One.mp3", "B - Two.mp3"]
+
+
+def test_saved_plan_is_rebuilt_with_other_ai_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "FINGERPRINT_DEDUP", False)
+    root = str(tmp_path)
+    _touch(os.path.join(root, "A - One.mp3"))
+    dl = SpotifyDownloader()
+    dl.organize_existing(root, OrganizeApp(), use_ai=False, dry_run=True)
+    assert OrganizePlan.load(root).labeling == {"use_ai": False}
+
+    monkeypatch.setattr(dl.ai, "enabled", True)
+    monkeypatch.setattr(dl.ai, "classify_batch", lambda tracks, kind: ["House"] * len(tracks))
+    app = OrganizeApp()
+    dl.organize_existing(root, app, use_ai=True)
+
+    assert "The saved plan was made with other classification settings, planning again." in app.lines
+    assert os.listdir(os.path.join(root, "House")) == ["A - One.mp3"]
+
+
+def test_index_rescans_when_new_extensions_are_recognized(tmp_path):
+    root = str(tmp_path)
+    _touch(os.path.join(root, "House", "A - One.m4a"))
+    index = LibraryIndex(root)
+    index.refresh()
+    assert index.lookup("A", "One") == os.path.join(root, "House", "A - One.m4a")
+
+    # An index written by a version that only knew .mp3
+    with index.conn:
+        index.conn.execute("DELETE FROM files")
+        index.conn.execute("UPDATE meta SET value = '.mp3' WHERE name = 'extensions'")
+    index.close()
+
+    index = LibraryIndex(root)
+    index.refresh()
+    assert index.lookup("A", "One") == os.path.join(root, "House", "A - One.m4a")
+
+
+def test_lookup_matches_spotdls_sanitized_file_names(tmp_path):
+    root = str(tmp_path)
+    # spotdl writes 'Song: Remix? "Live"' as "Song- Remix 'Live'"
+    _touch(os.path.join(root, "House", "A-ha - Song- Remix 'Live'.mp3"))
+    index = LibraryIndex(root)
+    index.refresh()
+    assert index.lookup("A-ha", 'Song: Remix? "Live"') == os.path.join(root, "House", "A-ha - Song- Remix 'Live'.mp3")
+
+    # Keys stored from metadata by an older version are rebuilt from the names
+    path = os.path.join(root, "Techno", "B - Two- Dub.mp3")
+    _touch(path)
+    with index.conn:
+        index.conn.execute(
+            "INSERT INTO files (path, dir, key) VALUES (?, ?, 'b - two: dub')", (path, os.path.dirname(path))
+        )
+        index.conn.execute("UPDATE meta SET value = '1' WHERE name = 'key_version'")
+    index.close()
+
+    index = LibraryIndex(root)
+    assert index.lookup("B", "Two: Dub") == path
+
+
+def test_shared_library_uses_the_rollback_journal(tmp_path, monkeypatch):
+    assert LibraryIndex(str(tmp_path / "local")).conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    monkeypatch.setattr(Config, "SHARED_LIBRARY", True)
+    index = LibraryIndex(str(tmp_path / "shared"))
+    assert index.conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
@@ -0,0 +1,59 @@
+import threading
+
+from pipeline import Pipeline, Stage
+
+
+def run(stages, items, on_done, on_error=None):
+    pipeline = Pipeline(stages, on_done, on_error, queue_size=2)
+    pipeline.start(items)
+    assert pipeline.wait(timeout=5), "pipeline hung"
+    return pipeline
+
+
+def test_items_pass_through_every_stage():
+    done = []
+    lock = threading.Lock()
+
+    def finish(item):
+        with lock:
+            done.append(item)
+
+    stages = [Stage("double", lambda item: item.append("double") or True, workers=2),
+              Stage("skip_odd", lambda item: item[0] % 2 == 0, workers=2),
+              Stage("last", lambda item: item.append("last") or True)]
+    run(stages, ([n] for n in range(10)), finish)
+
+    assert sorted(item[0] for item in done) == list(range(10))
+    assert all(item[1:] == ["double", "last"] for item in done if item[0] % 2 == 0)
+    assert all(item[1:] == ["double"] for item in done if item[0] % 2)
+
+
+def test_failing_initializer_fails_the_items_and_closes_the_stage():
+    done, errors = [], []
+
+    def broken():
+        raise RuntimeError("no session")
+
+    stages = [Stage("first", lambda item: True),
+              Stage("download", lambda item: True, workers=2, initializer=broken),
+              Stage("after", lambda item: done.append(("after", item)) or True)]
+    pipeline = run(stages, range(5), lambda item: done.append(("done", item)),
+                   lambda stage, item, error: errors.append((stage.name, item, str(error))))
+
+    assert sorted(item for _, item in done) == list(range(5))
+    assert all(where == "done" for where, _ in done)
+    assert sorted(errors) == [("download", n, "no session") for n in range(5)]
+    assert pipeline.stats()[1]["failed"] == 5
+
+
+def test_failing_on_done_does_not_stop_the_workers():
+    finished = []
+
+    def on_done(item):
+        if item == 3:
+            raise ValueError("report failed")
+        finished.append(item)
+
+    run([Stage("only", lambda item: True)], range(6), on_done)
+
+    assert finished == [0, 1, 2, 4, 5]
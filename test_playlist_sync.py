@@ -0,0 +1,202 @@
+import os
+import time
+
+from spotdl.types.song import Song
+
+import downloader as downloader_module
+from config import Config
+from conftest import FakeDownloader, HeadlessApp, make_track
+from downloader import SpotifyDownloader
+from journal import JobJournal
+from playlist_sync import PlaylistCache, sync_playlist, update_tracklist
+
+URL = "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M"
+
+
+def make_song(track_id):
+    return Song.from_missing_data(
+        name=f"Track {track_id}",
+        artist="Artist",
+        artists=["Artist"],
+        song_id=track_id,
+        url=f"https://open.spotify.com/track/{track_id}",
+    )
+
+
+class FakeSpotdl:
+    def __init__(self, playlist_ids):
+        self.playlist_ids = playlist_ids
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(list(query))
+        if query == [URL]:
+            return [make_song(track_id) for track_id in self.playlist_ids]
+        return [make_song(url.rsplit("/", 1)[-1]) for url in query]
+
+
+class FakeSource:
+    def __init__(self, snapshot, ids):
+        self.current_snapshot = snapshot
+        self.ids = ids
+        self.listed = 0
+
+    def snapshot(self, url):
+        return self.current_snapshot
+
+    def track_ids(self, url):
+        self.listed += 1
+        return list(self.ids)
+
+
+def test_first_sync_fetches_everything(tmp_path):
+    spotdl = FakeSpotdl(["a", "b"])
+    result = sync_playlist(spotdl, URL, PlaylistCache(str(tmp_path)), FakeSource("s1", ["a", "b"]))
+
+    assert [s.song_id for s in result.songs] == ["a", "b"]
+    assert [s.song_id for s in result.new_songs] == ["a", "b"]
+    assert not result.cached
+    assert spotdl.queries == [[URL]]
+
+
+def test_unchanged_snapshot_uses_the_cache(tmp_path):
+    cache = PlaylistCache(str(tmp_path))
+    sync_playlist(FakeSpotdl(["a", "b"]), URL, cache, FakeSource("s1", ["a", "b"]))
+
+    spotdl = FakeSpotdl(["a", "b"])
+    source = FakeSource("s1", ["a", "b"])
+    result = sync_playlist(spotdl, URL, cache, source)
+
+    assert result.snapshot_unchanged
+    assert [s.song_id for s in result.songs] == ["a", "b"]
+    assert result.new_songs == []
+    assert spotdl.queries == []
+    assert source.listed == 0
+
+
+def test_changed_snapshot_fetches_only_new_tracks(tmp_path):
+    cache = PlaylistCache(str(tmp_path))
+    sync_playlist(FakeSpotdl(["a", "b", "c"]), URL, cache, FakeSource("s1", ["a", "b", "c"]))
+
+    spotdl = FakeSpotdl([])
+    result = sync_playlist(spotdl, URL, cache, FakeSource("s2", ["a", "c", "d", "e"]))
+
+    assert [s.song_id for s in result.songs] == ["a", "c", "d", "e"]
+    assert [s.song_id for s in result.new_songs] == ["d", "e"]
+    assert [s.song_id for s in result.removed_songs] == ["b"]
+    assert spotdl.queries == [[
+        "https://open.spotify.com/track/d",
+        "https://open.spotify.com/track/e",
+    ]]
+    assert cache.load(URL)["snapshot_id"] == "s2"
+
+
+def test_tracklist_is_updated_in_place(tmp_path):
+    path = tmp_path / "tracklist.txt"
+    songs = [make_song(i) for i in ("a", "b")]
+    update_tracklist(str(path), URL, songs)
+    update_tracklist(
+        str(path), URL, songs[:1] + [make_song("c")],
+        new_songs=[make_song("c")], removed_songs=[songs[1]],
+    )
+
+    assert path.read_text(encoding="utf-8").splitlines()[2:] == [
+        "1. Artist - Track a",
+        "2. Artist - Track b (removed)",
+        "3. Artist - Track c",
+    ]
+
+
+class PagedSource:
+    """
+    Playlist source that hands out pages one at a time. Page 2 is only
+    released once a file from page 1 exists, or it fails when `fail` is set.
+    """
+
+    def __init__(self, folder, fail=False):
+        self.folder = folder
+        self.fail = fail
+
+    def snapshot(self, url):
+        return "s1"
+
+    def playlist_pages(self, url):
+        yield [make_track("a"), make_track("b")], 4
+        for _ in range(500):
+            if os.path.exists(os.path.join(self.folder, "Unsorted", "Artist - Track a.mp3")):
+                break
+            time.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("connection reset")
+        yield [make_track("c"), make_track("d")], 4
+
+
+def test_streaming_fetch_downloads_while_pages_load(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "STREAMING_FETCH", True)
+    url = "https://open.spotify.com/playlist/streamed"
+    folder = tmp_path / "out"
+
+    dl = SpotifyDownloader()
+    dl.playlist_source = PagedSource(str(folder), fail=True)
+    summary = dl.run(url, str(folder), False, HeadlessApp())
+
+    # Page 1 was downloaded before page 2 failed; the job stays resumable
+    assert summary["tracks"] == {"done": 2}
+    journal = JobJournal.for_url(str(folder), url)
+    assert journal.resumable() and not journal.listed
+
+    dl.playlist_source = PagedSource(str(folder))
+    app = HeadlessApp()
+    summary = dl.run(url, str(folder), False, app)
+
+    assert summary["tracks"] == {"done": 2}
+    assert sorted(p.name for p in (folder / "Unsorted").iterdir()) == [
+        f"Artist - Track {t}.mp3" for t in "abcd"
+    ]
+    assert JobJournal.for_url(str(folder), url).finished
+    assert (folder / "tracklist.txt").read_text().count("Artist - Track") == 4
+    assert dl.playlist_cache.has(url)
+
+
+def test_incremental_sync_retries_new_tracks_that_failed(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(Config, "INCREMENTAL_SYNC", True)
+    failures = {"Track c": 1}
+
+    class PlaylistSpotdl:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def search(self, query):
+            if query == [URL]:
+                return [make_track("a"), make_track("b")]
+            return [make_track(url.rsplit("/", 1)[-1]) for url in query]
+
+    class FlakyDownloader(FakeDownloader):
+        def search_and_download(self, song):
+            if failures.get(song.name):
+                failures[song.name] -= 1
+                raise RuntimeError("connection reset")
+            return super().search_and_download(song)
+
+    monkeypatch.setattr(downloader_module, "Spotdl", PlaylistSpotdl)
+    monkeypatch.setattr(downloader_module, "Downloader", FlakyDownloader)
+    folder = tmp_path / "out"
+    dl = SpotifyDownloader()
+    dl.playlist_source = FakeSource("s1", ["a", "b"])
+    assert dl.run(URL, str(folder), False, HeadlessApp())["tracks"] == {"done": 2}
+
+    dl.playlist_source = FakeSource("s2", ["a", "b", "c"])
+    assert dl.run(URL, str(folder), False, HeadlessApp())["tracks"] == {"failed": 1}
+    assert dl.playlist_cache.load(URL)["pending"] == ["c"]
+
+    # Same snapshot: the failed track still counts as new
+    app = HeadlessApp()
+    assert dl.run(URL, str(folder), False, app)["tracks"] == {"done": 1}
+    assert "1 not downloaded by the last sync, trying them again." in app.lines
+    assert (folder / "Unsorted" / "Artist - Track c.mp3").exists()
+    assert dl.playlist_cache.load(URL)["pending"] == []
+    assert (folder / "tracklist.txt").read_text().count("Artist - Track c") == 1
+
+    app = HeadlessApp()
+    assert dl.run(URL, str(folder), False, app) is None
+    assert "Playlist is up to date, nothing new to download." in app.lines
@@ -0,0 +1,44 @@
+from playlist_view import PlaylistModel
+
+
+class FakeSong:
+    def __init__(self, artist, name, song_id=None):
+        self.artist = artist
+        self.name = name
+        self.song_id = song_id
+
+
+def test_status_and_filter_over_a_large_playlist():
+    model = PlaylistModel()
+    model.set_songs([FakeSong(f"Artist {i % 100}", f"Track {i}", f"id{i}") for i in range(10000)])
+    assert len(model) == 10000
+
+    assert model.set_status(FakeSong("Artist 7", "Track 7", "id7"), "downloading") == [7]
+    assert model.set_status(FakeSong("Artist 7", "Track 9999", "id9999"), "done") == [9999]
+    assert model.set_status(FakeSong("Nobody", "Missing", "nope"), "done") == []
+    assert model.counts()["queued"] == 9998
+
+    model.set_filter("artist 42")
+    assert len(model) == 100
+    assert all(model.titles[model.row_at(p)].startswith("Artist 42 ") for p in range(len(model)))
+
+    # Pages appended while filtering show up only when they match
+    model.append_songs([FakeSong("Artist 42", "New"), FakeSong("Other", "New")])
+    assert len(model) == 101
+    assert model.set_status(FakeSong("Other", "New"), "failed") == [10001]
+
+    model.set_filter("")
+    assert len(model) == model.total == 10002
+
+
+def test_a_track_listed_twice_updates_both_rows():
+    model = PlaylistModel()
+    model.set_songs([FakeSong("A", "One", "id1"), FakeSong("B", "Two", "id2"), FakeSong("A", "One", "id1")])
+
+    assert model.set_status(FakeSong("A", "One", "id1"), "done") == [0, 2]
+    assert model.statuses == ["done", "queued", "done"]
+
+    # Also across appended pages
+    model.append_songs([FakeSong("B", "Two", "id2")])
+    assert model.set_status(FakeSong("B", "Two", "id2"), "failed") == [1, 3]
+    assert model.counts()["failed"] == 2
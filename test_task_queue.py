@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+
+import pytest
+
+import downloader as downloader_module
+from conftest import FakeSpotdl, HeadlessApp, make_track
+from distributed import Coordinator, Worker
+from downloader import SpotifyDownloader
+from journal import JobJournal
+from task_queue import RedisTaskQueue, SQLiteTaskQueue
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the redis-py commands RedisTaskQueue uses.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def _bytes(self, value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def incrby(self, key, amount):
+        with self.lock:
+            value = int(self.data.get(key, 0)) + amount
+            self.data[key] = value
+            return value
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            return None if value is None else self._bytes(value)
+
+    def hset(self, key, mapping):
+        with self.lock:
+            self.data.setdefault(key, {}).update({k: self._bytes(v) for k, v in mapping.items()})
+
+    def hget(self, key, field):
+        with self.lock:
+            return self.data.get(key, {}).get(field)
+
+    def hincrby(self, key, field, amount):
+        with self.lock:
+            fields = self.data.setdefault(key, {})
+            value = int(fields.get(field, 0)) + amount
+            fields[field] = self._bytes(value)
+            return value
+
+    def lpush(self, key, value):
+        with self.lock:
+            self.data.setdefault(key, []).insert(0, self._bytes(value))
+
+    def rpush(self, key, value):
+        with self.lock:
+            self.data.setdefault(key, []).append(self._bytes(value))
+
+    def rpop(self, key):
+        with self.lock:
+            items = self.data.get(key)
+            return items.pop() if items else None
+
+    def lrange(self, key, start, end):
+        with self.lock:
+            items = self.data.get(key, [])
+            return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        with self.lock:
+            return len(self.data.get(key, []))
+
+    def zadd(self, key, mapping, xx=False):
+        with self.lock:
+            members = self.data.setdefault(key, {})
+            for member, score in mapping.items():
+                if not xx or self._bytes(member) in members:
+                    members[self._bytes(member)] = float(score)
+
+    def sadd(self, key, member):
+        with self.lock:
+            members = self.data.setdefault(key, set())
+            added = self._bytes(member) not in members
+            members.add(self._bytes(member))
+            return int(added)
+
+    def zrem(self, key, member):
+        with self.lock:
+            return 1 if self.data.get(key, {}).pop(self._bytes(member), None) is not None else 0
+
+    def zrangebyscore(self, key, low, high):
+        with self.lock:
+            low = float(low)
+            return sorted(m for m, score in self.data.get(key, {}).items() if low <= score <= high)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_queue(request, tmp_path):
+    redis = FakeRedis()
+
+    def _make(max_attempts=2):
+        if request.param == "sqlite":
+            return SQLiteTaskQueue(str(tmp_path / "queue.db"), max_attempts=max_attempts)
+        return RedisTaskQueue(redis, max_attempts=max_attempts)
+    return _make
+
+
+def test_lease_heartbeat_and_redelivery(make_queue):
+    queue = make_queue()
+    # A second handle, like another worker process
+    other = make_queue()
+    queue.put("job", [{"index": 1}, {"index": 2}])
+
+    first = queue.lease("w1", 0.2)
+    second = other.lease("w2", 30)
+    assert (first.payload, second.payload) == ({"index": 1}, {"index": 2})
+    assert other.lease("w2", 30) is None
+
+    # w1 stops sending heartbeats; its task goes to w2 when the lease runs out
+    assert queue.heartbeat(first.id, "w1", 0.2)
+    time.sleep(0.3)
+    redelivered = other.lease("w2", 30)
+    assert (redelivered.id, redelivered.attempts) == (first.id, 2)
+    assert not queue.heartbeat(first.id, "w1", 30)
+    assert not queue.complete(first.id, "w1", {"status": "done"})
+
+    assert other.complete(redelivered.id, "w2", {"status": "done", "worker": "w2"})
+    assert other.complete(second.id, "w2", {"status": "skipped"})
+    items, cursor = queue.finished("job")
+    assert [(payload["index"], result["status"]) for _, payload, result in items] == [(1, "done"), (2, "skipped")]
+    assert queue.finished("job", cursor) == ([], cursor)
+    assert queue.progress("job") == (2, 2)
+
+
+def test_failed_tasks_are_retried_then_given_up(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.put("job", [{"index": 1}, {"index": 2}])
+
+    task = queue.lease("w1", 30)
+    assert queue.fail(task.id, "w1", {"status": "failed", "failure": "download_error"})
+    task = queue.lease("w2", 30)
+    assert task.attempts == 2 and task.payload == {"index": 1}
+    assert queue.fail(task.id, "w2", {"status": "failed", "failure": "download_error"})
+
+    # The other task's worker dies on both attempts
+    for _ in range(2):
+        assert queue.lease("w3", 0.01).payload == {"index": 2}
+        time.sleep(0.05)
+    assert queue.lease("w3", 30) is None
+
+    items, _ = queue.finished("job")
+    assert [result["failure"] for _, _, result in items] == ["download_error", "lease_expired"]
+    assert queue.progress("job") == (2, 2)
+
+
+def test_redis_settle_racing_a_requeue_finishes_the_task_once():
+    queue = RedisTaskQueue(FakeRedis())
+    queue.put("job", [{"index": 1}])
+    task = queue.lease("w1", 0.01)
+    time.sleep(0.05)
+
+    owns = queue._owns
+
+    def requeue_after_the_check(task_id, worker_id):
+        # The lease expires between w1's ownership check and its settle
+        found = owns(task_id, worker_id)
+        queue._requeue_expired()
+        return found
+
+    queue._owns = requeue_after_the_check
+    assert not queue.complete(task.id, "w1", {"status": "done"})
+    queue._owns = owns
+
+    retried = queue.lease("w2", 30)
+    assert retried.id == task.id
+    assert not queue.heartbeat(task.id, "w1", 30)
+    assert queue.complete(retried.id, "w2", {"status": "done"})
+    assert queue.lease("w3", 30) is None
+    assert [task_id for task_id, _, _ in queue.finished("job")[0]] == [task.id]
+    assert queue.progress("job") == (1, 1)
+
+
+class SongSpotdl(FakeSpotdl):
+    def search(self, query):
+        return [make_track(str(i)) for i in range(5)]
+
+
+def test_coordinator_and_workers_share_one_library(tmp_path, monkeypatch, fake_spotdl):
+    monkeypatch.setattr(downloader_module, "Spotdl", SongSpotdl)
+    url = "https://open.spotify.com/album/shared"
+    folder = tmp_path / "library"
+    queue_path = str(tmp_path / "queue.db")
+
+    app = HeadlessApp()
+    coordinator = Coordinator(SpotifyDownloader(), SQLiteTaskQueue(queue_path), poll_seconds=0.05)
+    summaries = []
+    thread = threading.Thread(target=lambda: summaries.append(coordinator.run(url, str(folder), False, app)))
+    thread.start()
+
+    # A worker takes a task and dies without finishing it
+    dead = SQLiteTaskQueue(queue_path)
+    while dead.lease("dead", 0.2) is None:
+        time.sleep(0.01)
+
+    stop = threading.Event()
+    workers = []
+    for name in ("w1", "w2"):
+        worker = Worker(SpotifyDownloader(), SQLiteTaskQueue(queue_path), name,
+                        lease_seconds=5, heartbeat_seconds=0.05, log=lambda line: None)
+        workers.append(threading.Thread(target=worker.run, args=(stop, False, 0.05)))
+        workers[-1].start()
+    thread.join(20)
+    stop.set()
+    for worker in workers:
+        worker.join(5)
+
+    assert summaries[0]["tracks"] == {"done": 5}
+    assert sorted(os.listdir(folder / "Unsorted")) == [f"Artist - Track {i}.mp3" for i in range(5)]
+    assert JobJournal.for_url(str(folder), url).finished
+    # Every track, including the dead worker's, was finished by a live worker
+    progress = [line for line in app.lines if "] Artist - Track" in line]
+    assert len(progress) == 5 and all(line.endswith(("(w1)", "(w2)")) for line in progress)
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+import webapp
+
+
+def test_event_stream_wakes_up_on_changes_from_other_threads(monkeypatch):
+    state = webapp.WebState()
+    monkeypatch.setattr(webapp, "state", state)
+    monkeypatch.setattr(webapp, "STREAM_HEARTBEAT", 0.2)
+
+    async def read():
+        events = webapp._stream_events(0)
+        first = await events.__anext__()
+        threading.Timer(0.05, state.add_log, ["hello"]).start()
+        change = await asyncio.wait_for(events.__anext__(), 5)
+        idle = await events.__anext__()
+        await events.aclose()
+        return first, change, idle
+
+    first, change, idle = asyncio.run(read())
+
+    assert first.startswith("id: 0\n")
+    assert change.startswith("id: 1\n") and '"logs": ["hello"]' in change
+    assert idle == ": keep-alive\n\n"
+    assert state.listeners == set()
@@ -1,8 +1,10 @@
 import customtkinter as ctk
+import queue
 import threading
 import os
 import re
 from config import Config
+from playlist_view import PlaylistView
 
 
 class App(ctk.CTk):
@@ -17,7 +19,14 @@ class App(ctk.CTk):
         self.use_ai = bool(Config.OPENAI_API_KEY)
         self.playlist_url = ""
         self.output_folder = ""
+        self.playlist_count = 0
         self.busy = False
+        # Filled from any thread, drained on the Tk thread by _flush_log
+        self.log_queue = queue.SimpleQueue()
+        # Playlist changes, applied in order with the log flush
+        self.playlist_queue = queue.SimpleQueue()
+        self.log_interval_ms = max(1, 1000 // max(1, Config.GUI_LOG_FPS))
+        self.log_max_lines = max(1, Config.GUI_LOG_MAX_LINES)
 
         # Window Setup
         self.title(Config.APP_NAME)
@@ -30,6 +39,7 @@ class App(ctk.CTk):
         self.grid_rowconfigure(4, weight=1)  # Chat log expands
 
         self.setup_ui()
+        self.after(self.log_interval_ms, self._on_frame)
         if self.assistant:
             self.ai_message(self.assistant.initial_message())
         if not (Config.SPOTIFY_CLIENT_ID and Config.SPOTIFY_CLIENT_SECRET):
@@ -69,19 +79,61 @@ class App(ctk.CTk):
         self.label_count = ctk.CTkLabel(self.frame_playlist, text="0 músicas")
         self.label_count.grid(row=0, column=1, sticky="e", padx=10, pady=(0, 10))
 
-        self.textbox_playlist = ctk.CTkTextbox(self.frame_playlist, width=320, font=("Consolas", 12))
-        self.textbox_playlist.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10, pady=(0, 10))
-        self.textbox_playlist.insert("end", "Aguardando playlist...\n")
-        self.textbox_playlist.configure(state="disabled")
+        self.playlist_view = PlaylistView(self.frame_playlist, width=320, fg_color="transparent")
+        self.playlist_view.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10, pady=(0, 10))
 
     def log(self, message):
-        self.textbox_log.insert("end", f"{message}\n")
-        self.textbox_log.see("end")
+        # Safe from worker threads; the textbox is only touched by _flush_log
+        self.log_queue.put(message)
+
+    def _on_frame(self):
+        self._flush_log()
+        self._flush_playlist()
+        self.after(self.log_interval_ms, self._on_frame)
+
+    def _flush_log(self):
+        """
+        Writes everything logged since the last frame in one insert and trims
+        the textbox to log_max_lines.
+        """
+        lines = []
+        try:
+            while True:
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if lines:
+            # Lines that would be trimmed right away are never inserted
+            lines = lines[-self.log_max_lines:]
+            self.textbox_log.insert("end", "".join(f"{line}\n" for line in lines))
+            line_count = int(self.textbox_log.index("end-1c").split(".")[0]) - 1
+            excess = line_count - self.log_max_lines
+            if excess > 0:
+                self.textbox_log.delete("1.0", f"{excess + 1}.0")
+            self.textbox_log.see("end")
+
+    def _flush_playlist(self):
+        try:
+            while True:
+                action, payload, status = self.playlist_queue.get_nowait()
+                if action == "status":
+                    self.playlist_view.set_status(payload, status)
+                    continue
+                if action == "set":
+                    self.playlist_view.set_songs(payload)
+                    self.playlist_count = len(payload)
+                else:
+                    self.playlist_view.append_songs(payload)
+                    self.playlist_count += len(payload)
+                self.label_count.configure(text=f"{self.playlist_count} músicas")
+        except queue.Empty:
+            pass
 
     def ai_message(self, message):
         self.log(f"[AI] {message}")
 
-    def on_organize(self):
+    def on_organize(self, dry_run=False):
         folder = self.output_folder
         use_ai = self.use_ai
 
@@ -90,7 +142,7 @@ class App(ctk.CTk):
             return
 
         self.busy = True
-        thread = threading.Thread(target=self.organize_callback, args=(folder, use_ai, self))
+        thread = threading.Thread(target=self.organize_callback, args=(folder, use_ai, self, dry_run))
         thread.start()
 
     def request_storage_mode(self, total_songs=None):
@@ -115,14 +167,19 @@ class App(ctk.CTk):
         return self.storage_mode_var or "genre"
 
     def show_playlist(self, songs):
-        def _update():
-            self.textbox_playlist.configure(state="normal")
-            self.textbox_playlist.delete("1.0", "end")
-            for i, song in enumerate(songs, 1):
-                self.textbox_playlist.insert("end", f"{i}. {song.artist} - {song.name}\n")
-            self.textbox_playlist.configure(state="disabled")
-            self.label_count.configure(text=f"{len(songs)} músicas")
-        self.after(0, _update)
+        self.playlist_queue.put(("set", list(songs), None))
+
+    def append_playlist(self, songs):
+        """
+        Adds a page of a streamed playlist below what is already shown.
+        """
+        self.playlist_queue.put(("append", list(songs), None))
+
+    def track_status(self, song, status):
+        """
+        queued / downloading / done / skipped / failed, from any thread.
+        """
+        self.playlist_queue.put(("status", song, status))
 
     def _handle_storage_choice(self, text):
         normalized = text.lower()
@@ -167,6 +224,13 @@ class App(ctk.CTk):
             self.log("[AI] Smart Search desligado.")
             return
 
+        if normalized in ("organizar", "organizar prévia", "organizar previa"):
+            if self.busy:
+                self.log("[AI] Já existe um processo em andamento.")
+                return
+            self.on_organize(dry_run=normalized != "organizar")
+            return
+
         if "open.spotify.com" in text:
             self.playlist_url = text.strip()
             if self.assistant:
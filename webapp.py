@@ -1,95 +1,222 @@
+import asyncio
+import json
 import os
 import threading
 from pathlib import Path
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from pydantic import BaseModel
 
 from assistant import AIAssistant
-from downloader import SpotifyDownloader
 from config import Config
-
+from downloader import SpotifyDownloader
+from jobs import STORAGE_MODES, JobScheduler
+from log_buffer import LogBuffer
+from metrics import REGISTRY
 
 app = FastAPI()
 BASE_DIR = Path(__file__).resolve().parent
 INDEX_PATH = BASE_DIR / "web" / "index.html"
+# Seconds between keep-alive comments on an idle event stream
+STREAM_HEARTBEAT = 15
 
 
 class MessageIn(BaseModel):
     text: str
 
 
+class JobIn(BaseModel):
+    url: str
+    output_folder: str | None = None
+    storage_mode: str | None = None
+    use_ai: bool | None = None
+
+
+class StorageModeIn(BaseModel):
+    storage_mode: str
+
+
 class WebState:
     def __init__(self):
         self.lock = threading.Lock()
-        self.logs = []
+        # (loop, asyncio.Event) of each open event stream, set whenever logs,
+        # playlist or storage prompt change
+        self.listeners = set()
+        self.logs = LogBuffer(Config.WEB_LOG_CAPACITY)
         self.playlist = []
+        self.playlist_version = 0
+        # Playlist length at each version since the last full replace, so a
+        # client that is only behind by appends gets just the new entries
+        self.playlist_marks = {0: 0}
         self.count = 0
         self.awaiting_storage = False
-        self.storage_mode = ""
-        self.storage_event = threading.Event()
         self.output_folder = ""
-        self.busy = False
 
     def add_log(self, text):
         with self.lock:
             self.logs.append(text)
+            self._notify()
 
-    def snapshot(self, since=0):
+    def set_playlist(self, playlist):
         with self.lock:
-            new_logs = self.logs[since:]
-            return {
-                "logs": new_logs,
-                "next": len(self.logs),
-                "playlist": self.playlist,
-                "count": self.count,
-                "awaiting_storage": self.awaiting_storage,
-            }
+            self.playlist = playlist
+            self.count = len(playlist)
+            self.playlist_version += 1
+            self.playlist_marks = {self.playlist_version: self.count}
+            self._notify()
 
+    def append_playlist(self, items):
+        with self.lock:
+            self.playlist.extend(items)
+            self.count = len(self.playlist)
+            self.playlist_version += 1
+            self.playlist_marks[self.playlist_version] = self.count
+            self._notify()
+
+    def set_awaiting_storage(self, awaiting):
+        with self.lock:
+            self.awaiting_storage = awaiting
+            self._notify()
+
+    def snapshot(self, since=0, playlist_version=None):
+        """
+        Log lines after `since` plus the playlist, which is left out when the
+        caller already has `playlist_version`.
+        """
+        with self.lock:
+            return self._delta(since, playlist_version)
+
+    def _delta(self, since, playlist_version):
+        new_logs, gap = self.logs.since(since)
+        delta = {
+            "logs": new_logs,
+            "next": self.logs.next_seq,
+            "playlist_version": self.playlist_version,
+            "awaiting_storage": self.awaiting_storage,
+        }
+        if gap:
+            delta["gap"] = gap
+        if playlist_version != self.playlist_version:
+            offset = self.playlist_marks.get(playlist_version)
+            if offset is None:
+                delta["playlist"] = self.playlist
+            else:
+                delta["playlist_append"] = self.playlist[offset:]
+                delta["playlist_offset"] = offset
+            delta["count"] = self.count
+        return delta
+
+    def subscribe(self, loop, event):
+        with self.lock:
+            self.listeners.add((loop, event))
+
+    def unsubscribe(self, loop, event):
+        with self.lock:
+            self.listeners.discard((loop, event))
+
+    def _notify(self):
+        # Called with the lock held, from whichever thread changed the state
+        for loop, event in list(self.listeners):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's loop is closed
+                self.listeners.discard((loop, event))
+
+    def delta_if_changed(self, since, playlist_version, awaiting):
+        """
+        What changed after (since, playlist_version, awaiting), or None.
+        """
+        with self.lock:
+            if (
+                self.logs.next_seq == since
+                and self.playlist_version == playlist_version
+                and self.awaiting_storage == awaiting
+            ):
+                return None
+            return self._delta(since, playlist_version)
 
 state = WebState()
 assistant = AIAssistant()
 
-downloader = SpotifyDownloader()
+# Built on the first job so a fresh worker starts serving right away
+_downloader = None
+_downloader_lock = threading.Lock()
 
 
-class WebAppAdapter:
-    def log(self, message):
-        state.add_log(message)
+def get_downloader():
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = SpotifyDownloader()
+        return _downloader
 
-    def ai_message(self, message):
-        state.add_log(f"[AI] {message}")
 
-    def show_playlist(self, songs):
-        with state.lock:
-            state.playlist = [f"{s.artist} - {s.name}" for s in songs]
-            state.count = len(songs)
+class JobListener:
+    """
+    Mirrors every job into the shared chat view: log lines are prefixed with
+    the job ID and the playlist panel shows the job that reported last.
+    """
 
-    def request_storage_mode(self, total_songs=None):
-        state.awaiting_storage = True
-        state.storage_mode = ""
-        state.storage_event.clear()
-        prompt = assistant.ask_storage_mode(total_songs)
-        self.ai_message(prompt)
-        state.storage_event.wait()
-        state.awaiting_storage = False
-        return state.storage_mode or "genre"
+    def __init__(self):
+        self.shown = None
 
-    def download_finished(self):
-        state.busy = False
-        state.add_log("Task Completed.")
+    def job_log(self, job, message):
+        state.add_log(f"[#{job.id}] {message}")
 
-    def organization_finished(self):
-        state.busy = False
-        state.add_log("Organization Task Completed.")
+    def job_playlist(self, job):
+        self.shown = job.id
+        state.set_playlist(list(job.playlist))
 
+    def job_playlist_append(self, job, lines):
+        if self.shown != job.id:
+            self.job_playlist(job)
+        else:
+            state.append_playlist(lines)
 
-adapter = WebAppAdapter()
+    def job_status(self, job):
+        state.set_awaiting_storage(scheduler.awaiting_storage() is not None)
+        if job.status in ("done", "failed", "cancelled"):
+            state.add_log(f"[#{job.id}] Task {job.status}.")
 
+    def job_storage_prompt(self, job, total_songs):
+        state.set_awaiting_storage(True)
+        job.ai_message(assistant.ask_storage_mode(total_songs))
 
-def start_download(url, use_ai):
-    output_folder = state.output_folder
-    downloader.run(url, output_folder, use_ai, adapter)
+
+scheduler = JobScheduler(
+    lambda job: get_downloader().run(job.url, job.output_folder, job.use_ai, job),
+    max_jobs=Config.MAX_JOBS,
+    listener=JobListener(),
+    log_capacity=Config.WEB_LOG_CAPACITY,
+)
+
+
+def _output_folder():
+    if not state.output_folder:
+        default_folder = os.path.expanduser("~/Music/spot-downloader")
+        os.makedirs(default_folder, exist_ok=True)
+        state.output_folder = default_folder
+        state.add_log(f"[AI] Pasta de saída definida: {state.output_folder}")
+    return state.output_folder
+
+
+def _submit(url, output_folder=None, storage_mode=None, use_ai=None):
+    if use_ai is None:
+        use_ai = bool(Config.OPENAI_API_KEY)
+    job = scheduler.submit(url, output_folder or _output_folder(), use_ai, storage_mode)
+    position = scheduler.queue_position(job)
+    if position:
+        state.add_log(f"[AI] Job #{job.id} na fila (posição {position}).")
+    else:
+        state.add_log(f"[AI] Job #{job.id} iniciado.")
+    return job
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -106,17 +233,18 @@ def message(payload: MessageIn):
     state.add_log(f"[You] {text}")
     normalized = text.lower().strip()
 
-    if state.awaiting_storage:
+    waiting_job = scheduler.awaiting_storage()
+    if waiting_job:
         if "gen" in normalized:
-            state.storage_mode = "genre"
+            mode = "genre"
         elif "set" in normalized or "momento" in normalized:
-            state.storage_mode = "set"
+            mode = "set"
         else:
-            adapter.ai_message("Escolha uma opção: gênero ou momentos do SET.")
+            state.add_log("[AI] Escolha uma opção: gênero ou momentos do SET.")
             return JSONResponse({"ok": True})
 
-        assistant.add_event("user", f"Storage mode: {state.storage_mode}")
-        state.storage_event.set()
+        assistant.add_event("user", f"Storage mode: {mode}")
+        waiting_job.choose_storage_mode(mode)
         return JSONResponse({"ok": True})
 
     if normalized in ("ai on", "ai ligado", "ai ativado"):
@@ -137,22 +265,8 @@ def message(payload: MessageIn):
             )
             return JSONResponse({"ok": True})
 
-        if state.busy:
-            state.add_log("[AI] Já existe um processo em andamento.")
-            return JSONResponse({"ok": True})
-
         assistant.user_message(f"Playlist URL: {text}")
-
-        if not state.output_folder:
-            default_folder = os.path.expanduser("~/Music/spot-downloader")
-            os.makedirs(default_folder, exist_ok=True)
-            state.output_folder = default_folder
-            state.add_log(f"[AI] Pasta de saída definida: {state.output_folder}")
-
-        state.busy = True
-        use_ai = bool(Config.OPENAI_API_KEY)
-        thread = threading.Thread(target=start_download, args=(text, use_ai), daemon=True)
-        thread.start()
+        _submit(text)
         return JSONResponse({"ok": True})
 
     if os.path.isdir(text):
@@ -163,11 +277,121 @@ def message(payload: MessageIn):
 
     if assistant:
         reply = assistant.respond(text)
-        adapter.ai_message(reply)
+        state.add_log(f"[AI] {reply}")
 
     return JSONResponse({"ok": True})
 
 
+@app.post("/api/jobs")
+def submit_job(payload: JobIn):
+    if "open.spotify.com" not in payload.url:
+        raise HTTPException(400, "Not a Spotify URL")
+    if not (Config.SPOTIFY_CLIENT_ID and Config.SPOTIFY_CLIENT_SECRET):
+        raise HTTPException(400, "SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET are not configured")
+    if payload.storage_mode and payload.storage_mode not in STORAGE_MODES:
+        raise HTTPException(400, f"storage_mode must be one of {', '.join(STORAGE_MODES)}")
+    if payload.output_folder and not os.path.isdir(payload.output_folder):
+        raise HTTPException(400, "output_folder does not exist")
+
+    job = _submit(payload.url, payload.output_folder, payload.storage_mode, payload.use_ai)
+    return JSONResponse(job.summary())
+
+
+@app.get("/api/jobs")
+def list_jobs():
+    return JSONResponse({"jobs": scheduler.list()})
+
+
+def _job_or_404(job_id):
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def job_details(job_id: str, since: int = 0):
+    return JSONResponse(_job_or_404(job_id).details(since))
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = _job_or_404(job_id)
+    job.cancel()
+    return JSONResponse(job.summary())
+
+
+@app.post("/api/jobs/{job_id}/storage-mode")
+def choose_storage_mode(job_id: str, payload: StorageModeIn):
+    job = _job_or_404(job_id)
+    if payload.storage_mode not in STORAGE_MODES:
+        raise HTTPException(400, f"storage_mode must be one of {', '.join(STORAGE_MODES)}")
+    job.choose_storage_mode(payload.storage_mode)
+    return JSONResponse(job.summary())
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint: totals across every job since the server
+    started, plus the current number of jobs per status.
+    """
+    jobs = {}
+    for job in scheduler.list():
+        key = (("status", job["status"]),)
+        jobs[key] = jobs.get(key, 0) + 1
+    return PlainTextResponse(
+        REGISTRY.render(gauges={"jobs": jobs}),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 @app.get("/api/poll")
-def poll(since: int = 0):
-    return JSONResponse(state.snapshot(since=since))
+def poll(since: int = 0, playlist_version: int | None = None):
+    return JSONResponse(state.snapshot(since=since, playlist_version=playlist_version))
+
+
+async def _stream_events(since):
+    """
+    Server-Sent Events: one event per change with only the new log lines and,
+    when it changed, the playlist. The event id is the log cursor so a
+    reconnecting browser resumes where it stopped. Waiting happens on the
+    event loop, so an idle stream does not hold a worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    state.subscribe(loop, changed)
+    try:
+        playlist_version = -1
+        awaiting = None
+        while True:
+            # Cleared before reading the state, so a change made meanwhile
+            # sets it again and is not missed
+            changed.clear()
+            delta = state.delta_if_changed(since, playlist_version, awaiting)
+            if delta is None:
+                waiter = asyncio.ensure_future(changed.wait())
+                try:
+                    done, _ = await asyncio.wait({waiter}, timeout=STREAM_HEARTBEAT)
+                finally:
+                    waiter.cancel()
+                if not done:
+                    yield ": keep-alive\n\n"
+                continue
+            since = delta["next"]
+            playlist_version = delta["playlist_version"]
+            awaiting = delta["awaiting_storage"]
+            yield f"id: {since}\ndata: {json.dumps(delta)}\n\n"
+    finally:
+        state.unsubscribe(loop, changed)
+
+
+@app.get("/api/stream")
+def stream(since: int = 0, last_event_id: str | None = Header(default=None)):
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        _stream_events(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )